@@ -1,56 +1,614 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, JSONResponse
+from pydantic import ValidationError
+from sqlmodel import Session
+import asyncio
 import base64
+import io
+import json
+import zipfile
+from urllib.parse import urlencode
 
-from app.schemas.schemas import PathRenderRequest, PathRenderResponse
-from app.services.path_renderer import PathRenderer
+from app.core.config import settings
+from app.db.session import get_session
+from app.models.models import Match, PathRecord, Team
+from app.schemas.schemas import (
+    PathRenderRequest, PathRenderResponse, PathBatchRenderRequest, PathBatchRenderResponse,
+    PathBulkRenderRequest, PathBulkRenderResponse, PathThumbnail, PathThumbnailSpec, PathReplayRequest,
+    PathRecordCreate, PathRecordRead, SimilarRoute, SimilarRoutesResponse,
+    PathInterferenceRequest, PathInterferenceResponse
+)
+from app.services.field_heatmap import field_heatmap_store, record_points_json
+from app.services.path_arrays import PathArrays, as_path_arrays
+from app.services.path_binary import PATH_BINARY_MEDIA_TYPE, decode_path_body
+from app.services.image_encoding import normalize_format, media_type
+from app.services.render_executor import (
+    render_executor, render_job, render_batch_job, render_thumbnail_job, render_replay_job,
+    render_heatmap_job, interference_job, RenderQueueFull
+)
+from app.services.replay import REPLAY_MEDIA_TYPES, normalize_replay_format
+from app.services.route_similarity import route_index
+from app.services.renderer_registry import get_renderer
+from app.services.map_tiles import TilePyramid
+from app.services.render_cache import (
+    render_cache, render_cache_key, batch_render_cache_key, heatmap_cache_key, make_etag, etag_matches
+)
 
 router = APIRouter(prefix="/path", tags=["path"])
 
+RENDER_OUTPUTS = ("raster", "vector")
+SVG_MEDIA_TYPE = "image/svg+xml"
+# Versioned tile URLs never change content; unversioned ones may after a map edit
+TILE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+TILE_CACHE_CONTROL_UNVERSIONED = "public, max-age=300"
 
-@router.post("/render", response_model=PathRenderResponse)
-async def render_path(request: PathRenderRequest):
+
+def _inline_schema(model) -> Dict[str, Any]:
+    """JSON schema of a model with its $defs references inlined"""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(defs[node["$ref"].split("/")[-1]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+
+    return resolve(schema)
+
+
+# Render endpoints accept JSON (default) or the compact binary path body
+RENDER_REQUEST_BODY = {
+    "requestBody": {
+        "content": {
+            "application/json": {
+                "schema": _inline_schema(PathRenderRequest)
+            },
+            PATH_BINARY_MEDIA_TYPE: {
+                "schema": {"type": "string", "format": "binary"}
+            },
+        },
+        "required": True,
+    }
+}
+
+
+async def _parse_render_request(http_request: Request) -> Tuple[PathRenderRequest, Optional[PathArrays]]:
+    """Parse a JSON PathRenderRequest or a binary path body
+    
+    Binary bodies are decoded straight into PathArrays, so per-point
+    PathPoint models are never built for long telemetry paths.
+    """
+    content_type = http_request.headers.get("content-type", "")
+    try:
+        if content_type.startswith(PATH_BINARY_MEDIA_TYPE):
+            try:
+                fields, path = decode_path_body(await http_request.body())
+            except (ValueError, KeyError, TypeError) as e:
+                raise HTTPException(status_code=400, detail=f"Invalid binary path body: {e}")
+            fields.pop("points", None)
+            request = PathRenderRequest(points=[], **fields)
+        else:
+            body = await http_request.json()
+            if not isinstance(body, dict):
+                raise HTTPException(status_code=400, detail="Request body must be a JSON object")
+            request, path = PathRenderRequest(**body), None
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+
+    if request.output not in RENDER_OUTPUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown output mode: {request.output}")
+    if request.viewport is not None and request.output != "raster":
+        raise HTTPException(status_code=400, detail="Viewport rendering requires raster output")
+    try:
+        normalize_format(request.image_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return request, path
+
+
+def _cache_key(request: PathRenderRequest, path: Optional[PathArrays] = None) -> str:
+    """Content address of a render, including its output encoding"""
+    if request.output == "vector":
+        return render_cache_key(request, path=path, output="vector")
+    return render_cache_key(
+        request, path=path,
+        image_format=normalize_format(request.image_format),
+        image_quality=request.image_quality,
+        png_compress_level=request.png_compress_level
+    )
+
+
+def _json_etag(key: str, request: Any) -> str:
+    """ETag of a JSON render response, which also depends on the parts it includes"""
+    return make_etag(f"{key}-{int(bool(request.return_image))}{int(bool(request.return_overlay))}")
+
+
+async def _render_cached(request: PathRenderRequest, path: Optional[PathArrays] = None,
+                         with_image: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """Serve a render from the content-addressed cache, rendering on a miss"""
+    key = _cache_key(request, path)
+    entry = render_cache.get(key)
+    if entry is not None and (entry["image"] is not None or not with_image):
+        return key, entry
+
+    result = await render_executor.run(render_job, request.map_filename, dict(
+        method=request.method,
+        points=path if path is not None else request.points,
+        style=request.style,
+        coordinate_system=request.coordinate_system,
+        obstacles=request.obstacles,
+        robot_radius=request.robot_radius,
+        viewport=request.viewport,
+        return_image=with_image,
+        return_overlay=True,
+        image_format=request.image_format,
+        image_quality=request.image_quality,
+        png_compress_level=request.png_compress_level,
+        return_bytes=True,
+        output=request.output
+    ))
+
+    image = result.get("image_bytes")
+    if with_image:
+        render_cache.set(key, image, result.get("overlay_json"))
+    return key, {"image": image, "overlay_json": result.get("overlay_json")}
+
+
+@router.post("/render", response_model=PathRenderResponse, openapi_extra=RENDER_REQUEST_BODY)
+async def render_path(http_request: Request, if_none_match: Optional[str] = Header(None)):
     """Render path on field map"""
+    request, path = await _parse_render_request(http_request)
     try:
-        renderer = PathRenderer(request.map_filename)
-        
-        result = renderer.render(
-            method=request.method,
-            points=request.points,
-            style=request.style,
-            coordinate_system=request.coordinate_system,
-            obstacles=request.obstacles,
-            return_image=request.return_image,
-            return_overlay=request.return_overlay
-        )
-        
-        return PathRenderResponse(**result)
-    
+        etag = _json_etag(_cache_key(request, path), request)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        key, entry = await _render_cached(request, path, with_image=request.return_image)
+
+        result = PathRenderResponse(success=True)
+        if request.return_image and entry["image"] is not None:
+            if request.output == "vector":
+                result.svg = entry["image"].decode("utf-8")
+            else:
+                result.image_base64 = base64.b64encode(entry["image"]).decode()
+        if request.return_overlay:
+            result.overlay_json = entry["overlay_json"]
+        result.points_removed = (entry["overlay_json"] or {}).get("points_removed")
+
+        return JSONResponse(content=result.dict(), headers={"ETag": etag})
+
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/render/image")
-async def render_path_image(request: PathRenderRequest):
-    """Render path and return as PNG image"""
-    try:
-        renderer = PathRenderer(request.map_filename)
-        
-        result = renderer.render(
-            method=request.method,
-            points=request.points,
-            style=request.style,
-            coordinate_system=request.coordinate_system,
-            obstacles=request.obstacles,
-            return_image=True,
-            return_overlay=False
-        )
-        
-        if result.get("image_base64"):
-            image_bytes = base64.b64decode(result["image_base64"])
-            return Response(content=image_bytes, media_type="image/png")
-        else:
-            raise HTTPException(status_code=500, detail="Failed to generate image")
+@router.post("/render/image", openapi_extra=RENDER_REQUEST_BODY)
+async def render_path_image(http_request: Request, if_none_match: Optional[str] = Header(None)):
+    """Render path and return the encoded image bytes (PNG, WebP, JPEG or SVG)"""
+    request, path = await _parse_render_request(http_request)
+    try:
+        etag = make_etag(_cache_key(request, path))
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        key, entry = await _render_cached(request, path)
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if entry["image"]:
+        content_type = SVG_MEDIA_TYPE if request.output == "vector" else media_type(request.image_format)
+        return Response(content=entry["image"], media_type=content_type, headers={"ETag": etag})
+    else:
+        raise HTTPException(status_code=500, detail="Failed to generate image")
+
+
+@router.post("/render/batch", response_model=PathBatchRenderResponse)
+async def render_path_batch(request: PathBatchRenderRequest, if_none_match: Optional[str] = Header(None)):
+    """Render several named robot paths onto one shared field map
     
+    The map is loaded once, every path is drawn with its own method and
+    style, and the canvas is encoded once.
+    """
+    names = [item.name for item in request.paths]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Path names must be unique")
+    try:
+        image_format = normalize_format(request.image_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        key = batch_render_cache_key(request, image_format=image_format,
+                                     image_quality=request.image_quality,
+                                     png_compress_level=request.png_compress_level)
+        etag = _json_etag(key, request)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        entry = render_cache.get(key)
+        if entry is None or (entry["image"] is None and request.return_image):
+            result = await render_executor.run(render_batch_job, request.map_filename, dict(
+                paths=[dict(name=item.name, method=item.method, points=item.points,
+                            style=item.style, robot_radius=item.robot_radius)
+                       for item in request.paths],
+                coordinate_system=request.coordinate_system,
+                obstacles=request.obstacles,
+                return_image=request.return_image,
+                return_overlay=True,
+                image_format=image_format,
+                image_quality=request.image_quality,
+                png_compress_level=request.png_compress_level,
+                return_bytes=True
+            ))
+            entry = {"image": result.get("image_bytes"), "overlay_json": result.get("overlay_json")}
+            if request.return_image:
+                render_cache.set(key, entry["image"], entry["overlay_json"])
+
+        response = PathBatchRenderResponse(success=True)
+        if request.return_image and entry["image"] is not None:
+            response.image_base64 = base64.b64encode(entry["image"]).decode()
+        if request.return_overlay:
+            response.overlay_json = entry["overlay_json"]
+
+        return JSONResponse(content=response.dict(), headers={"ETag": etag})
+
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _render_thumbnail(request: PathBulkRenderRequest, spec: PathThumbnailSpec,
+                            image_format: str, size: int,
+                            slots: asyncio.Semaphore) -> Tuple[Optional[bytes], Optional[str]]:
+    """Render one bulk item through the render cache; returns (image, error)"""
+    fields = spec.dict(exclude={"name"})
+    key = render_cache_key(PathRenderRequest(map_filename=request.map_filename, **fields),
+                           thumbnail_size=size, image_format=image_format,
+                           image_quality=request.image_quality)
+    entry = render_cache.get(key)
+    if entry is not None and entry["image"] is not None:
+        return entry["image"], None
+
+    try:
+        async with slots:
+            image = await render_executor.run(render_thumbnail_job, request.map_filename, dict(
+                method=spec.method,
+                points=spec.points,
+                style=spec.style,
+                coordinate_system=spec.coordinate_system,
+                obstacles=spec.obstacles,
+                robot_radius=spec.robot_radius,
+                thumbnail_size=size,
+                image_format=image_format,
+                image_quality=request.image_quality
+            ))
+    except RenderQueueFull:
+        raise
+    except Exception as e:
+        return None, str(e)
+
+    render_cache.set(key, image, None)
+    return image, None
+
+
+@router.post("/render/bulk", response_model=PathBulkRenderResponse)
+async def render_path_bulk(request: PathBulkRenderRequest):
+    """Render many independent paths as small thumbnails
+    
+    Items fan out across the render worker pool (at most one in flight per
+    worker for this request). The map decode and its resize to the
+    thumbnail size are shared through the map cache, fonts and sprites
+    through the renderer registry. Returns JSON, or a zip when ``archive``
+    is set.
+    """
+    if len(request.items) > settings.BULK_RENDER_MAX_ITEMS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {settings.BULK_RENDER_MAX_ITEMS} items per bulk render")
+    names = [item.name for item in request.items]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Item names must be unique")
+    try:
+        image_format = normalize_format(request.image_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    size = request.thumbnail_size or settings.THUMBNAIL_SIZE
+
+    slots = asyncio.Semaphore(render_executor.max_workers)
+    try:
+        results: List[Tuple[Optional[bytes], Optional[str]]] = await asyncio.gather(*(
+            _render_thumbnail(request, spec, image_format, size, slots) for spec in request.items
+        ))
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    errors = {name: error for name, (_, error) in zip(names, results) if error is not None}
+
+    if not request.archive:
+        thumbnails = [
+            PathThumbnail(name=name, error=error,
+                          image_base64=base64.b64encode(image).decode() if image is not None else None)
+            for name, (image, error) in zip(names, results)
+        ]
+        return PathBulkRenderResponse(success=not errors, media_type=media_type(image_format),
+                                      thumbnails=thumbnails)
+
+    extension = "jpg" if image_format == "jpeg" else image_format
+    buffer = io.BytesIO()
+    # Images are already compressed; store them as-is
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, (image, _) in zip(names, results):
+            if image is not None:
+                safe_name = name.replace("/", "_").replace("\\", "_")
+                archive.writestr(f"{safe_name}.{extension}", image)
+        if errors:
+            archive.writestr("errors.json", json.dumps(errors, ensure_ascii=False, indent=2))
+    return Response(content=buffer.getvalue(), media_type="application/zip",
+                    headers={"Content-Disposition": 'attachment; filename="thumbnails.zip"'})
+
+
+@router.get("/render/queue", response_model=Dict[str, Any])
+async def render_queue_status():
+    """Get render worker pool and queue depth"""
+    return render_executor.stats()
+
+
+@router.get("/render/cache", response_model=Dict[str, Any])
+async def render_cache_status():
+    """Get rendered-image cache statistics"""
+    return render_cache.stats()
+
+
+@router.post("/render/replay")
+async def render_path_replay(request: PathReplayRequest, if_none_match: Optional[str] = Header(None)):
+    """Render the path being driven over time as an animated GIF/WebP or a zip of frames"""
+    try:
+        replay_format = normalize_replay_format(request.replay_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    fps = request.fps or settings.REPLAY_FPS
+    duration = request.duration or settings.REPLAY_DURATION
+    key = render_cache_key(request, replay=replay_format, fps=fps, speed=request.speed,
+                           duration=duration, image_quality=request.image_quality)
+    etag = make_etag(key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    entry = render_cache.get(key)
+    if entry is not None and entry["image"] is not None:
+        image = entry["image"]
+    else:
+        try:
+            image = await render_executor.run(render_replay_job, request.map_filename, dict(
+                method=request.method,
+                points=request.points,
+                style=request.style,
+                coordinate_system=request.coordinate_system,
+                obstacles=request.obstacles,
+                robot_radius=request.robot_radius,
+                fps=fps,
+                speed=request.speed,
+                duration=duration,
+                replay_format=replay_format,
+                image_quality=request.image_quality
+            ))
+        except RenderQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        render_cache.set(key, image, None)
+
+    headers = {"ETag": etag}
+    if replay_format == "zip":
+        headers["Content-Disposition"] = 'attachment; filename="replay.zip"'
+    return Response(content=image, media_type=REPLAY_MEDIA_TYPES[replay_format], headers=headers)
+
+
+@router.post("/interference", response_model=PathInterferenceResponse)
+async def path_interference(request: PathInterferenceRequest, if_none_match: Optional[str] = Header(None)):
+    """Check whether robots driving timed paths together come too close
+    
+    Every pair of robots is compared on a shared time grid; each pair
+    reports its first conflict time, minimum separation and the field
+    cells where the robots meet.
+    """
+    names = [item.name for item in request.paths]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Path names must be unique")
+    try:
+        image_format = normalize_format(request.image_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    time_step = request.time_step or settings.INTERFERENCE_TIME_STEP
+    robot_radius = request.robot_radius if request.robot_radius is not None else settings.INTERFERENCE_ROBOT_RADIUS
+    key = batch_render_cache_key(request, interference=True, time_step=time_step, robot_radius=robot_radius,
+                                 return_image=request.return_image, image_format=image_format,
+                                 image_quality=request.image_quality)
+    etag = make_etag(key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    entry = render_cache.get(key)
+    if entry is None:
+        try:
+            result = await render_executor.run(interference_job, request.map_filename, dict(
+                paths=[dict(name=item.name, method=item.method, points=item.points,
+                            style=item.style, robot_radius=item.robot_radius)
+                       for item in request.paths],
+                coordinate_system=request.coordinate_system,
+                obstacles=request.obstacles,
+                robot_radius=robot_radius,
+                time_step=time_step,
+                return_image=request.return_image,
+                image_format=image_format,
+                image_quality=request.image_quality
+            ))
+        except RenderQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        entry = {"image": result.get("image_bytes"), "overlay_json": result["pairs"]}
+        render_cache.set(key, entry["image"], entry["overlay_json"])
+
+    response = PathInterferenceResponse(success=True, time_step=time_step, pairs=entry["overlay_json"])
+    if entry["image"] is not None:
+        response.image_base64 = base64.b64encode(entry["image"]).decode()
+    return JSONResponse(content=response.dict(), headers={"ETag": etag})
+
+
+@router.post("/records", response_model=PathRecordRead)
+def create_path_record(record_data: PathRecordCreate, session: Session = Depends(get_session)):
+    """Store a team's path; points are kept in field millimetres
+    
+    ``t``, ``speed`` and robot states (name and color) are stored with each
+    point; custom state icons are not.
+    """
+    if record_data.coordinate_system not in ("pixel", "field"):
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown coordinate system: {record_data.coordinate_system}")
+    if not session.get(Team, record_data.team_id):
+        raise HTTPException(status_code=404, detail="Team not found")
+    if record_data.match_id is not None and not session.get(Match, record_data.match_id):
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    record = PathRecord(
+        team_id=record_data.team_id,
+        match_id=record_data.match_id,
+        path_name=record_data.path_name,
+        method=record_data.method,
+        points_json=record_points_json(as_path_arrays(record_data.points), record_data.coordinate_system),
+        style_json=json.dumps(record_data.style.dict()) if record_data.style is not None else None
+    )
+    session.add(record)
+    session.commit()
+    session.refresh(record)
+    return record
+
+
+@router.get("/records/{record_id}/similar", response_model=SimilarRoutesResponse)
+def similar_path_records(record_id: int, k: int = Query(10, ge=1, le=100),
+                         include_mirrored: bool = True, other_teams: bool = False,
+                         session: Session = Depends(get_session)):
+    """Find the stored routes closest in shape to a stored route
+    
+    ``include_mirrored`` also matches routes driven from the other
+    alliance's side; ``other_teams`` skips the route's own team.
+    """
+    record = session.get(PathRecord, record_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Path record not found")
+
+    route_index.update(session)
+    signature = route_index.signature(record_id)
+    if signature is None:
+        raise HTTPException(status_code=400, detail="Path record has no readable points")
+
+    matches = route_index.search(signature, k, include_mirrored, exclude_ids=(record_id,),
+                                 exclude_team=record.team_id if other_teams else None)
+    routes = []
+    for match in matches:
+        other = session.get(PathRecord, match["record_id"])
+        if other is not None:
+            routes.append(SimilarRoute(match_id=other.match_id, path_name=other.path_name, **match))
+    return SimilarRoutesResponse(record_id=record_id, routes=routes)
+
+
+@router.get("/heatmap")
+async def field_heatmap(team_id: Optional[int] = None, event_id: Optional[str] = None,
+                        map_filename: Optional[str] = None,
+                        opacity: float = Query(0.7, ge=0, le=1),
+                        image_format: str = "png",
+                        image_quality: Optional[int] = Query(None, ge=0, le=100),
+                        if_none_match: Optional[str] = Header(None),
+                        session: Session = Depends(get_session)):
+    """Render where a team (or every team at an event) spends its time across stored paths
+    
+    The per-scope occupancy grid is updated with only the PathRecords
+    stored since the last request, then colored over the field map.
+    """
+    if team_id is None and event_id is None:
+        raise HTTPException(status_code=400, detail="Give a team_id, an event_id or both")
+    try:
+        image_format = normalize_format(image_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    grid, info = await run_in_threadpool(field_heatmap_store.update, session, team_id, event_id)
+    key = heatmap_cache_key(map_filename, {"team_id": team_id, "event_id": event_id}, info["version"],
+                            opacity=opacity, image_format=image_format, image_quality=image_quality)
+    etag = make_etag(key)
+    headers = {"ETag": etag, "X-Heatmap-Paths": str(info["paths"]),
+               "X-Heatmap-Seconds": f"{info['seconds']:.2f}"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    entry = render_cache.get(key)
+    if entry is not None and entry["image"] is not None:
+        image = entry["image"]
+    else:
+        try:
+            image = await render_executor.run(render_heatmap_job, map_filename, dict(
+                grid=grid,
+                opacity=opacity,
+                image_format=image_format,
+                image_quality=image_quality
+            ))
+        except RenderQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        render_cache.set(key, image, None)
+
+    return Response(content=image, media_type=media_type(image_format), headers=headers)
+
+
+async def _tile_pyramid(map_filename: Optional[str] = None) -> TilePyramid:
+    """Tile pyramid of a map, built off the event loop on first use"""
+    pyramid = get_renderer(map_filename).tile_pyramid()
+    if not pyramid.is_built():
+        await run_in_threadpool(pyramid.build)
+    return pyramid
+
+
+@router.get("/tiles/meta", response_model=Dict[str, Any])
+async def tile_meta(map_filename: Optional[str] = None):
+    """Get the map tile pyramid layout and its versioned tile URL template"""
+    pyramid = await _tile_pyramid(map_filename)
+    params = {"v": pyramid.version}
+    if map_filename:
+        params["map_filename"] = map_filename
+    url = f"{settings.API_V1_PREFIX}/path/tiles/{{z}}/{{x}}/{{y}}?{urlencode(params)}"
+    return {**pyramid.meta, "url": url}
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_tile(z: int, x: int, y: int, map_filename: Optional[str] = None,
+                   v: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """Get one map tile; level ``max_zoom`` is the map at native resolution"""
+    pyramid = await _tile_pyramid(map_filename)
+    etag = make_etag(f"{pyramid.version}-{z}-{x}-{y}")
+    cache_control = TILE_CACHE_CONTROL if v == pyramid.version else TILE_CACHE_CONTROL_UNVERSIONED
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        content = pyramid.tile(z, x, y)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return Response(content=content, media_type=media_type(pyramid.image_format), headers=headers)
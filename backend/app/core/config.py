@@ -42,6 +42,39 @@ class Settings(BaseSettings):
     DEFAULT_MAP_HEIGHT: int = 3600
     FIELD_WIDTH_MM: int = 3600
     FIELD_HEIGHT_MM: int = 3600
+    MAP_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Decoded/resized map canvases kept in memory
+    REPLAY_FPS: float = 10.0  # Animated replay frame rate
+    REPLAY_DURATION: float = 15.0  # Seconds a replay spans when points carry no t (autonomous period)
+    REPLAY_MAX_FRAMES: int = 1000
+    TILE_SIZE: int = 256  # Map tile pyramid tile edge in pixels
+    TILE_CACHE_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "tile_cache")
+    TILE_FORMAT: str = "png"  # png, webp or jpeg
+    HEATMAP_GRID_SIZE: int = 144  # Occupancy heatmap cells across the field width (25 mm at 3600 mm)
+    HEATMAP_CACHE_SIZE: int = 64  # Team/event heatmap grids kept in memory
+    ROUTE_SIGNATURE_POINTS: int = 64  # Arc-length samples per route for similarity search
+    ROUTE_SHORTLIST: int = 50  # Closest routes re-ranked by DTW per similarity query
+    INTERFERENCE_ROBOT_RADIUS: float = 50.8  # Canvas pixels; half an 18-inch robot on the 800 px canvas
+    INTERFERENCE_TIME_STEP: float = 0.05  # Seconds between samples when comparing robot paths
+    INTERFERENCE_MAX_SAMPLES: int = 20000
+    SPRITE_ATLAS_SIZE: int = 512  # State-marker sprites kept per renderer
+    RENDERER_REGISTRY_SIZE: int = 8  # Warm renderers (one per map file) kept in memory
+    LAYER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Rasterized path/state layers kept in memory
+    RENDER_EXECUTOR: str = "thread"  # thread or process
+    RENDER_WORKERS: int = 0  # 0 = one worker per CPU core
+    RENDER_QUEUE_SIZE: int = 32  # Jobs allowed to wait for a worker before 503
+    RENDER_CACHE_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "render_cache")  # Empty = memory only
+    RENDER_CACHE_MEMORY_BYTES: int = 128 * 1024 * 1024
+    RENDER_CACHE_DISK_ENTRIES: int = 5000
+    THUMBNAIL_SIZE: int = 200  # Default bulk render thumbnail edge in pixels
+    BULK_RENDER_MAX_ITEMS: int = 200  # Render specs accepted per bulk request
+    PNG_COMPRESS_LEVEL: int = 6  # 0-9, lower encodes faster
+    JPEG_QUALITY: int = 80  # Default quality for JPEG previews
+    PATHFINDING_MODE: str = "astar"  # astar or jps (Jump Point Search, faster on open fields)
+    CURVE_TOLERANCE: float = 0.25  # Max chord error (pixels) when sampling bezier/spline curves
+    OCCUPANCY_GRID_RESOLUTION: int = 20  # Canvas pixels per pathfinding grid cell
+    OCCUPANCY_CACHE_SIZE: int = 32  # Obstacle sets kept rasterized in memory
+    ROUTE_LEG_CACHE_SIZE: int = 4096  # Memoized waypoint-to-waypoint A* legs
+    ROBOT_RADIUS: float = 0  # Default obstacle clearance in canvas pixels
     
     # SSL
     SSL_CERTFILE: Optional[str] = None
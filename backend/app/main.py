@@ -8,6 +8,8 @@ import os
 from app.core.config import settings
 from app.db.session import init_db
 from app.api.routes import teams, robots, drivers, matches, path, report
+from app.services.render_executor import render_executor
+from app.services.renderer_registry import renderer_registry
 
 # Create FastAPI app
 app = FastAPI(
@@ -88,9 +90,18 @@ else:
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup"""
+    """Initialize database and warm the path renderer on startup"""
     init_db()
     print("Database initialized")
+    renderer_registry.warmup(tiles=True)
+    print("Path renderer warmed up")
+
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop render workers on shutdown"""
+    render_executor.shutdown()
 
 
 # Exception handler
@@ -112,7 +112,7 @@ class PathRecord(SQLModel, table=True):
     match_id: Optional[int] = Field(default=None, foreign_key="matches.id")
     path_name: str
     method: str  # polyline, bezier, spline, astar, heatline
-    points_json: str  # JSON string of points
+    points_json: str  # JSON string of points (field mm)
     style_json: Optional[str] = None  # JSON string of style config
     image_path: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,4 +1,4 @@
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -126,9 +126,13 @@ class MatchRead(MatchBase):
 
 
 # Path Rendering Schemas
+# State names become marker labels, so their length bounds the sprite size
+MAX_STATE_NAME_LENGTH = 64
+
+
 class RobotState(BaseModel):
     """Robot state at a specific point"""
-    state: str  # wingpushing, intaking, releasing, moving, idle
+    state: str = Field(..., max_length=MAX_STATE_NAME_LENGTH)  # wingpushing, intaking, releasing, moving, idle
     color: Optional[str] = None  # Auto-assign if not provided
     icon: Optional[str] = None  # Custom icon name
 
@@ -143,12 +147,24 @@ class PathPoint(BaseModel):
 
 class PathStyle(BaseModel):
     color: str = "#FF0000"
-    width: int = 3
+    width: int = Field(3, gt=0, le=100)
     opacity: float = 0.8
     gradient: Optional[bool] = False
     arrow: Optional[bool] = False
     show_state_labels: bool = True  # Show state text labels
-    state_icon_size: int = 20  # Size of state icons
+    state_icon_size: int = Field(20, gt=0, le=100)  # Size of state icons
+    simplify_tolerance: Optional[float] = Field(None, ge=0)  # RDP tolerance in pixels, None = off
+    curve_tolerance: Optional[float] = Field(None, gt=0)  # bezier/spline chord error in pixels
+
+
+class Viewport(BaseModel):
+    """Region of the canvas to render, in the request's coordinate system"""
+    x: float
+    y: float
+    width: float = Field(..., gt=0)
+    height: float = Field(..., gt=0)
+    output_width: Optional[int] = Field(None, ge=1, le=4096)  # default: viewport size in canvas pixels
+    output_height: Optional[int] = Field(None, ge=1, le=4096)  # default: keeps the viewport aspect
 
 
 class PathRenderRequest(BaseModel):
@@ -158,17 +174,164 @@ class PathRenderRequest(BaseModel):
     style: Optional[PathStyle] = PathStyle()
     coordinate_system: str = "pixel"  # pixel or field
     obstacles: Optional[List[Any]] = None  # for astar
+    robot_radius: Optional[float] = Field(None, ge=0)  # astar clearance in canvas pixels
     return_image: bool = True
     return_overlay: bool = False
+    image_format: str = "png"  # png, webp (lossless) or jpeg
+    image_quality: Optional[int] = Field(None, ge=0, le=100)  # JPEG quality / WebP effort
+    png_compress_level: Optional[int] = Field(None, ge=0, le=9)
+    output: str = "raster"  # raster (map + path) or vector (SVG overlay only)
+    viewport: Optional[Viewport] = None  # render only this region (raster output)
 
 
 class PathRenderResponse(BaseModel):
     success: bool
     message: Optional[str] = None
     image_base64: Optional[str] = None
+    svg: Optional[str] = None  # vector output
+    points_removed: Optional[int] = None  # by style.simplify_tolerance
     overlay_json: Optional[Any] = None
 
 
+class NamedPath(BaseModel):
+    name: str  # e.g. robot or team label, keys the per-path overlay
+    method: str  # polyline, bezier, spline, astar, heatline
+    points: List[PathPoint]
+    style: Optional[PathStyle] = PathStyle()
+    robot_radius: Optional[float] = Field(None, ge=0)  # astar clearance in canvas pixels
+
+
+class PathBatchRenderRequest(BaseModel):
+    map_filename: Optional[str] = None
+    paths: List[NamedPath] = Field(..., min_length=1)
+    coordinate_system: str = "pixel"  # pixel or field
+    obstacles: Optional[List[Any]] = None  # shared by every astar path
+    return_image: bool = True
+    return_overlay: bool = False
+    image_format: str = "png"  # png, webp (lossless) or jpeg
+    image_quality: Optional[int] = Field(None, ge=0, le=100)
+    png_compress_level: Optional[int] = Field(None, ge=0, le=9)
+
+
+class PathBatchRenderResponse(BaseModel):
+    success: bool
+    message: Optional[str] = None
+    image_base64: Optional[str] = None
+    overlay_json: Optional[Dict[str, Any]] = None  # per-path overlay keyed by name
+
+
+class PathThumbnailSpec(BaseModel):
+    name: str  # e.g. "1234A-match12", names the thumbnail in the response or zip
+    method: str  # polyline, bezier, spline, astar, heatline
+    points: List[PathPoint]
+    style: Optional[PathStyle] = PathStyle()
+    coordinate_system: str = "pixel"  # pixel (800x800 canvas) or field
+    obstacles: Optional[List[Any]] = None
+    robot_radius: Optional[float] = Field(None, ge=0)
+
+
+class PathBulkRenderRequest(BaseModel):
+    map_filename: Optional[str] = None
+    items: List[PathThumbnailSpec] = Field(..., min_length=1)
+    thumbnail_size: Optional[int] = Field(None, ge=32, le=800)  # default settings.THUMBNAIL_SIZE
+    image_format: str = "webp"  # webp (lossless) or jpeg; png also accepted
+    image_quality: Optional[int] = Field(None, ge=0, le=100)
+    archive: bool = False  # stream a zip of <name>.<ext> files instead of JSON
+
+
+class PathThumbnail(BaseModel):
+    name: str
+    image_base64: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PathBulkRenderResponse(BaseModel):
+    success: bool
+    media_type: str
+    thumbnails: List[PathThumbnail]
+
+
+class PathReplayRequest(BaseModel):
+    map_filename: Optional[str] = None
+    method: str  # polyline, bezier, spline, astar, heatline
+    points: List[PathPoint] = Field(..., min_length=2)  # timed by t when every point has one
+    style: Optional[PathStyle] = PathStyle()
+    coordinate_system: str = "pixel"  # pixel or field
+    obstacles: Optional[List[Any]] = None  # for astar
+    robot_radius: Optional[float] = Field(None, ge=0)  # astar clearance in canvas pixels
+    fps: Optional[float] = Field(None, gt=0, le=50)  # default settings.REPLAY_FPS
+    speed: float = Field(1.0, gt=0)  # path seconds per playback second
+    duration: Optional[float] = Field(None, gt=0)  # seconds spanned when points carry no t
+    replay_format: str = "gif"  # gif, webp or zip (PNG keyframe plus changed-box patches)
+    image_quality: Optional[int] = Field(None, ge=0, le=100)  # WebP quality
+
+
+class PathRecordCreate(BaseModel):
+    team_id: int
+    match_id: Optional[int] = None
+    path_name: str
+    method: str  # polyline, bezier, spline, astar, heatline
+    points: List[PathPoint] = Field(..., min_length=2)  # stored in field mm
+    style: Optional[PathStyle] = None
+    coordinate_system: str = "pixel"  # pixel (800x800 canvas) or field
+
+
+class PathRecordRead(BaseModel):
+    id: int
+    team_id: int
+    match_id: Optional[int] = None
+    path_name: str
+    method: str
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class SimilarRoute(BaseModel):
+    record_id: int
+    team_id: int
+    match_id: Optional[int] = None
+    path_name: str
+    distance: float  # DTW distance, mm per signature point
+    mirrored: bool  # matched as driven from the other alliance's side
+
+
+class SimilarRoutesResponse(BaseModel):
+    record_id: int
+    routes: List[SimilarRoute]
+
+
+class PathInterferenceRequest(BaseModel):
+    map_filename: Optional[str] = None
+    paths: List[NamedPath] = Field(..., min_length=2)  # every point needs t (seconds)
+    coordinate_system: str = "pixel"  # pixel or field
+    obstacles: Optional[List[Any]] = None  # shared by every astar path
+    robot_radius: Optional[float] = Field(None, ge=0)  # canvas pixels, for paths without their own
+    time_step: Optional[float] = Field(None, gt=0)  # default settings.INTERFERENCE_TIME_STEP
+    return_image: bool = False  # draw the paths with conflicts marked
+    image_format: str = "png"  # png, webp (lossless) or jpeg
+    image_quality: Optional[int] = Field(None, ge=0, le=100)
+
+
+class RobotConflict(BaseModel):
+    a: str
+    b: str
+    first_conflict_time: Optional[float] = None  # None when the robots never get too close
+    min_separation: float  # canvas pixels between robot centers
+    min_separation_time: float
+    conflict_seconds: float
+    conflicts: List[Dict[str, float]]  # start, end and closest-approach time of each conflict
+    contested_cells: List[Dict[str, int]]  # x, y, w, h in canvas pixels (obstacle format)
+
+
+class PathInterferenceResponse(BaseModel):
+    success: bool
+    time_step: float
+    pairs: List[RobotConflict]
+    image_base64: Optional[str] = None
+
+
 # Report Schemas
 class ReportRequest(BaseModel):
     team_id: int
@@ -0,0 +1,50 @@
+import numpy as np
+from typing import Callable
+
+from app.services.path_simplify import segment_distances
+
+
+# Probe positions inside each interval; three probes catch S-shaped pieces
+# whose midpoint happens to sit on the chord
+PROBES = np.array([0.25, 0.5, 0.75])
+
+
+def adaptive_sample(evaluate: Callable[[np.ndarray], np.ndarray], breaks: np.ndarray,
+                    tolerance: float, max_depth: int = 10) -> np.ndarray:
+    """Sample a parametric curve so every chord stays within ``tolerance`` pixels
+
+    ``evaluate`` maps a 1-D parameter array to (N, 2) points and ``breaks``
+    are the parameters of the input points, which are always sampled.
+    Intervals are subdivided at their midpoint, level by level in one
+    vectorized pass, while any probe lies farther than ``tolerance`` from
+    the chord; straight runs therefore stay coarse and tight turns get
+    refined down to ``max_depth`` halvings of an input interval.
+    """
+    breaks = np.unique(np.asarray(breaks, dtype=np.float64))
+    points = evaluate(breaks)
+    params = [breaks]
+    samples = [points]
+
+    a, b = breaks[:-1], breaks[1:]
+    pa, pb = points[:-1], points[1:]
+    for _ in range(max_depth):
+        if not len(a):
+            break
+        probes = a[:, None] + (b - a)[:, None] * PROBES
+        probe_points = evaluate(probes.ravel())
+        errors = segment_distances(probe_points,
+                                   np.repeat(pa, len(PROBES), axis=0),
+                                   np.repeat(pb, len(PROBES), axis=0))
+        split = errors.reshape(-1, len(PROBES)).max(axis=1) > tolerance
+        if not split.any():
+            break
+
+        mid = probes[split, 1]
+        mid_points = probe_points.reshape(-1, len(PROBES), 2)[split, 1]
+        params.append(mid)
+        samples.append(mid_points)
+        a, b = np.concatenate((a[split], mid)), np.concatenate((mid, b[split]))
+        pa, pb = np.concatenate((pa[split], mid_points)), np.concatenate((mid_points, pb[split]))
+
+    order = np.argsort(np.concatenate(params), kind="stable")
+    return np.concatenate(samples)[order]
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.models.models import Match, PathRecord
+from app.services.path_arrays import PathArrays
+from app.services.replay import point_times
+
+
+# Paths in pixel coordinates are stored relative to the frontend canvas
+RECORD_CANVAS_SIZE = (800, 800)
+
+
+def record_points_json(path: PathArrays, coordinate_system: str) -> str:
+    """PathRecord.points_json for a path: points in field millimetres
+
+    ``t``, ``speed`` and the robot state (name and color) are kept as sent;
+    speed is not rescaled with pixel coordinates.
+    """
+    if coordinate_system == "pixel":
+        path = path.scaled(settings.FIELD_WIDTH_MM / RECORD_CANVAS_SIZE[0],
+                           settings.FIELD_HEIGHT_MM / RECORD_CANVAS_SIZE[1])
+    points = []
+    for i in range(len(path)):
+        point = {"x": float(path.x[i]), "y": float(path.y[i])}
+        if not np.isnan(path.t[i]):
+            point["t"] = float(path.t[i])
+        if not np.isnan(path.speed[i]):
+            point["speed"] = float(path.speed[i])
+        state = path.state_name(i)
+        if state is not None:
+            point["robot_state"] = {"state": state}
+            if i in path.state_colors:
+                point["robot_state"]["color"] = path.state_colors[i]
+        points.append(point)
+    return json.dumps(points, separators=(",", ":"))
+
+
+def load_record_points(points_json: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(N, 2) field-millimetre positions and per-point ``t`` (NaN when missing)"""
+    points = json.loads(points_json)
+    xy = np.array([(p["x"], p["y"]) for p in points], dtype=np.float64).reshape(-1, 2)
+    t = np.array([p.get("t") for p in points], dtype=np.float64)
+    return xy, t
+
+
+def dwell_samples(xy: np.ndarray, times: np.ndarray, step: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions along a polyline and the seconds spent at each
+
+    Every segment is split into pieces at most ``step`` long; each piece
+    contributes its share of the segment's time at its midpoint. A segment
+    with no length (the robot standing still) puts all of its time on its
+    start point.
+    """
+    a, b = xy[:-1], xy[1:]
+    pieces = np.maximum(np.ceil(np.hypot(*(b - a).T) / step), 1).astype(np.int64)
+    segment = np.repeat(np.arange(len(a)), pieces)
+    first = np.repeat(np.cumsum(pieces) - pieces, pieces)
+    fraction = (np.arange(len(segment)) - first + 0.5) / pieces[segment]
+    positions = a[segment] + (b[segment] - a[segment]) * fraction[:, None]
+    seconds = (np.diff(times) / pieces)[segment]
+    return positions, seconds
+
+
+class FieldHeatmap:
+    """Seconds spent in each field cell, summed over stored paths
+
+    Cells are ``field width / grid_size`` millimetres square. Paths are
+    added one at a time, so the grid grows with new PathRecords instead of
+    being rebuilt. Recorded points are used as driven; smoothing and
+    routing methods are not applied.
+    """
+
+    def __init__(self, grid_size: Optional[int] = None):
+        self.grid_size = grid_size or settings.HEATMAP_GRID_SIZE
+        self.cell_mm = settings.FIELD_WIDTH_MM / self.grid_size
+        self.shape = (math.ceil(settings.FIELD_HEIGHT_MM / self.cell_mm), self.grid_size)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.grid = np.zeros(self.shape, dtype=np.float64)
+        self.paths = 0  # paths accumulated
+        self.records = 0  # rows seen, including unreadable ones
+        self.last_id = 0  # highest PathRecord id seen
+
+    def add_path(self, xy: np.ndarray, t: np.ndarray):
+        """Accumulate one path (field millimetres) into the grid"""
+        if len(xy) < 2:
+            return
+        times = point_times(t, settings.REPLAY_DURATION)
+        positions, seconds = dwell_samples(xy, times, self.cell_mm / 2)
+        rows, cols = self.shape
+        counts, _, _ = np.histogram2d(
+            positions[:, 1], positions[:, 0], bins=(rows, cols),
+            range=((0, rows * self.cell_mm), (0, cols * self.cell_mm)), weights=seconds
+        )
+        self.grid += counts
+        self.paths += 1
+
+    def add_record(self, record: PathRecord):
+        self.records += 1
+        self.last_id = max(self.last_id, record.id)
+        try:
+            xy, t = load_record_points(record.points_json)
+        except (ValueError, KeyError, TypeError):
+            return
+        self.add_path(xy, t)
+
+    @property
+    def version(self) -> str:
+        """Changes whenever the accumulated grid does
+
+        Row counts alone miss a scope whose rows were replaced by as many
+        new ones, so the grid contents are digested too.
+        """
+        digest = hashlib.sha256(self.grid.tobytes()).hexdigest()[:16]
+        return f"{self.grid_size}:{self.records}:{self.last_id}:{digest}"
+
+
+def _scoped(statement, team_id: Optional[int], event_id: Optional[str]):
+    if team_id is not None:
+        statement = statement.where(PathRecord.team_id == team_id)
+    if event_id is not None:
+        statement = statement.join(Match, PathRecord.match_id == Match.id).where(Match.event_id == event_id)
+    return statement
+
+
+class FieldHeatmapStore:
+    """LRU cache of FieldHeatmaps per (team, event) scope, updated incrementally
+
+    Each heatmap remembers the highest PathRecord id it has folded in, so
+    an update only reads rows added since. When rows it already counted
+    disappear, the heatmap is rebuilt from scratch.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.HEATMAP_CACHE_SIZE
+        self._entries: "OrderedDict[tuple, FieldHeatmap]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.records_added = 0
+
+    def _get(self, key: tuple) -> FieldHeatmap:
+        with self._lock:
+            heatmap = self._entries.get(key)
+            if heatmap is None:
+                heatmap = self._entries[key] = FieldHeatmap()
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return heatmap
+
+    def update(self, session: Session, team_id: Optional[int] = None,
+               event_id: Optional[str] = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Fold new PathRecords of a scope into its heatmap; returns (grid copy, info)"""
+        heatmap = self._get((team_id, event_id))
+        with heatmap.lock:
+            if heatmap.records:
+                counted = session.exec(_scoped(
+                    select(func.count(PathRecord.id)).where(PathRecord.id <= heatmap.last_id),
+                    team_id, event_id
+                )).one()
+                if counted != heatmap.records:
+                    heatmap.reset()
+                    with self._lock:
+                        self.rebuilds += 1
+
+            added = 0
+            statement = _scoped(select(PathRecord).where(PathRecord.id > heatmap.last_id),
+                                team_id, event_id).order_by(PathRecord.id)
+            for record in session.exec(statement):
+                heatmap.add_record(record)
+                added += 1
+            with self._lock:
+                self.records_added += added
+
+            return heatmap.grid.copy(), {
+                "paths": heatmap.paths,
+                "seconds": float(heatmap.grid.sum()),
+                "cell_mm": heatmap.cell_mm,
+                "version": heatmap.version,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "rebuilds": self.rebuilds,
+                    "records_added": self.records_added}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Global heatmap store for this process
+field_heatmap_store = FieldHeatmapStore()
@@ -0,0 +1,52 @@
+import io
+from typing import Optional
+from PIL import Image
+
+from app.core.config import settings
+
+
+IMAGE_MEDIA_TYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+
+def normalize_format(image_format: Optional[str]) -> str:
+    """Canonical output format name (png, webp or jpeg)"""
+    fmt = (image_format or "png").lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in IMAGE_MEDIA_TYPES:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    return fmt
+
+
+def media_type(image_format: Optional[str]) -> str:
+    return IMAGE_MEDIA_TYPES[normalize_format(image_format)]
+
+
+def encode_image(img: Image.Image, image_format: Optional[str] = "png",
+                 quality: Optional[int] = None, compress_level: Optional[int] = None) -> bytes:
+    """Encode a rendered image to bytes
+
+    - png: lossless, ``compress_level`` 0-9 (lower = faster, larger)
+    - webp: lossless, ``quality`` 0-100 trades encode effort for size
+    - jpeg: lossy preview, ``quality`` 1-95
+    """
+    fmt = normalize_format(image_format)
+    buffer = io.BytesIO()
+
+    if fmt == "png":
+        level = compress_level if compress_level is not None else settings.PNG_COMPRESS_LEVEL
+        img.save(buffer, format="PNG", compress_level=level)
+    elif fmt == "webp":
+        img.save(buffer, format="WEBP", lossless=True,
+                 quality=quality if quality is not None else 50, method=4)
+    else:
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(buffer, format="JPEG",
+                 quality=quality if quality is not None else settings.JPEG_QUALITY)
+
+    return buffer.getvalue()
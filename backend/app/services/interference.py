@@ -0,0 +1,74 @@
+import numpy as np
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.services.viewport import segment_runs
+
+
+def path_times(t: np.ndarray, name: str) -> np.ndarray:
+    """Point timestamps of a path that must be time-parameterized"""
+    if len(t) < 2 or np.isnan(t).any():
+        raise ValueError(f"Path '{name}' needs a t (seconds) on every point")
+    if (np.diff(t) < 0).any():
+        raise ValueError(f"Path '{name}' has decreasing t")
+    return t
+
+
+def time_grid(spans: Sequence[Tuple[float, float]], step: float, max_samples: int) -> np.ndarray:
+    """Shared sample times covering every path, ``step`` seconds apart"""
+    start = min(span[0] for span in spans)
+    end = max(span[1] for span in spans)
+    count = int(np.floor((end - start) / step + 1e-9)) + 1
+    if count > max_samples:
+        raise ValueError(f"Analysis needs {count} time samples (max {max_samples}); raise time_step")
+    grid = start + np.arange(count) * step
+    return grid if grid[-1] >= end else np.append(grid, end)
+
+
+def positions_at(curve: np.ndarray, curve_t: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """(T, 2) positions along a timed curve; a robot waits at its ends outside its span"""
+    return np.column_stack((np.interp(grid, curve_t, curve[:, 0]), np.interp(grid, curve_t, curve[:, 1])))
+
+
+def interference_pairs(names: List[str], positions: np.ndarray, radii: np.ndarray,
+                       grid: np.ndarray, cell_size: float) -> List[Dict[str, Any]]:
+    """Conflicts between every pair of robots sampled on a common time grid
+
+    ``positions`` is (R, T, 2) in canvas pixels. Two robots conflict while
+    their centers are closer than the sum of their radii. Separation is
+    computed for all pairs and samples at once. Each pair reports the first
+    conflict time, the minimum separation (and when), the conflict
+    intervals (first and last conflicting sample), the seconds spent in
+    conflict (each conflicting sample lasts until the next one) and the
+    cells of side ``cell_size`` in which the robots meet
+    (around the midpoint between them), in obstacle format.
+    """
+    first, second = np.triu_indices(len(names), 1)
+    offset = positions[first] - positions[second]
+    separation = np.hypot(offset[..., 0], offset[..., 1])  # (P, T)
+    conflict = separation < (radii[first] + radii[second])[:, None]
+    closest = separation.argmin(axis=1)
+
+    pairs = []
+    for p, (a, b) in enumerate(zip(first.tolist(), second.tolist())):
+        runs = segment_runs(conflict[p])
+        hits = np.flatnonzero(conflict[p])
+        meeting = (positions[a, hits] + positions[b, hits]) / 2
+        cells = np.unique(np.floor(meeting / cell_size).astype(np.int64), axis=0)
+        pairs.append({
+            "a": names[a],
+            "b": names[b],
+            "first_conflict_time": float(grid[runs[0][0]]) if runs else None,
+            "min_separation": float(separation[p, closest[p]]),
+            "min_separation_time": float(grid[closest[p]]),
+            "conflict_seconds": float(sum(grid[min(end, len(grid) - 1)] - grid[start] for start, end in runs)),
+            "conflicts": [
+                {"start": float(grid[start]), "end": float(grid[end - 1]),
+                 "time": float(grid[start + separation[p, start:end].argmin()])}
+                for start, end in runs
+            ],
+            "contested_cells": [
+                {"x": int(cx * cell_size), "y": int(cy * cell_size), "w": int(cell_size), "h": int(cell_size)}
+                for cx, cy in cells.tolist()
+            ],
+        })
+    return pairs
@@ -0,0 +1,119 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import cv2
+from PIL import Image
+
+from app.core.config import settings
+
+
+# A rasterized layer: RGBA image cropped to its content, and its (x, y) offset
+Layer = Tuple[Image.Image, Tuple[int, int]]
+
+
+def layer_key(kind: str, **inputs: Any) -> str:
+    """Content address of a layer from exactly the inputs that affect it"""
+    encoded = json.dumps({"kind": kind, **inputs}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def array_digest(*arrays: np.ndarray) -> str:
+    """Short digest of array contents for use inside layer keys"""
+    digest = hashlib.sha1()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def mask_layer(mask: np.ndarray, origin: Tuple[int, int],
+               rgba: Tuple[int, int, int, int]) -> Layer:
+    """Solid-color layer whose alpha is an 8-bit coverage mask scaled by rgba's alpha"""
+    if rgba[3] < 255:
+        mask = cv2.convertScaleAbs(mask, alpha=rgba[3] / 255.0)
+    layer = Image.new("RGBA", (mask.shape[1], mask.shape[0]), tuple(rgba[:3]) + (0,))
+    layer.putalpha(Image.fromarray(mask))
+    return layer, origin
+
+
+def crop_layer(img: Image.Image) -> Optional[Layer]:
+    """Trim a full-canvas RGBA layer to the bounding box of its visible pixels"""
+    bbox = img.getchannel("A").getbbox()
+    if bbox is None:
+        return None
+    return img.crop(bbox), (bbox[0], bbox[1])
+
+
+def composite(base: Image.Image, layers: Iterable[Optional[Layer]]) -> Image.Image:
+    """Alpha-composite layers over an opaque base image in place, bottom to top"""
+    for layer in layers:
+        if layer is not None:
+            img, (x, y) = layer
+            base.paste(img, (x, y), img)
+    return base
+
+
+class LayerCache:
+    """Thread-safe LRU of rasterized layers bounded by pixel memory
+
+    Every entry is also charged a fixed ``ENTRY_BYTES``, so empty (None)
+    layers still count towards the bound and get evicted.
+    """
+
+    ENTRY_BYTES = 256
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.LAYER_CACHE_MAX_BYTES
+        self._entries: "OrderedDict[str, Optional[Layer]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, render: Callable[[], Optional[Layer]]) -> Optional[Layer]:
+        """Cached layer for key, rasterizing it with ``render`` on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        layer = render()
+        size = (layer[0].width * layer[0].height * 4 if layer is not None else 0) + self.ENTRY_BYTES
+        if size > self.max_bytes:
+            return layer
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = layer
+                self._sizes[key] = size
+                self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+        return layer
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+
+# Global cache instance
+layer_cache = LayerCache()
@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
+from PIL import Image
+
+from app.core.config import settings
+
+
+MapKey = Tuple[str, Optional[float], Tuple[int, int]]
+
+
+def resolve_map_path(map_path: str) -> Optional[str]:
+    """Absolute path of a map file, trying known locations; None if missing"""
+    # Convert to absolute path if it's relative
+    abs_path = os.path.abspath(map_path)
+    if os.path.exists(abs_path):
+        return abs_path
+
+    # Try alternative locations
+    alternatives = [
+        os.path.join(os.getcwd(), "pushback_map.png"),
+        os.path.join(os.path.dirname(os.getcwd()), "pushback_map.png"),
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "..", "pushback_map.png")
+    ]
+    for alt_path in alternatives:
+        alt_path = os.path.abspath(alt_path)
+        if os.path.exists(alt_path):
+            return alt_path
+    return None
+
+
+class MapCache:
+    """Process-wide LRU cache of decoded, pre-resized field maps.
+
+    Entries are keyed by (absolute map path, file mtime, canvas size) so an
+    edited map file is picked up on the next render. Memory is bounded by the
+    total pixel bytes of the cached canvases; the least recently used canvas is
+    evicted first. Cached images are shared and must never be drawn on -
+    callers always work on a ``copy()``.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.MAP_CACHE_MAX_BYTES
+        self._entries: "OrderedDict[MapKey, Image.Image]" = OrderedDict()
+        self._size_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(map_path: str, canvas_size: Tuple[int, int]) -> MapKey:
+        abs_path = os.path.abspath(map_path)
+        try:
+            mtime = os.path.getmtime(abs_path)
+        except OSError:
+            mtime = None
+        return (abs_path, mtime, (int(canvas_size[0]), int(canvas_size[1])))
+
+    def get(self, map_path: str, canvas_size: Tuple[int, int],
+            loader: Callable[[], Image.Image]) -> Image.Image:
+        """Return the shared resized canvas, decoding it with ``loader`` on a miss"""
+        key = self.make_key(map_path, canvas_size)
+
+        with self._lock:
+            img = self._entries.get(key)
+            if img is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return img
+            self.misses += 1
+
+        # Decode and resize outside the lock so other maps stay available
+        img = loader().resize(key[2], Image.Resampling.LANCZOS)
+        img.load()
+        self._put(key, img)
+        return img
+
+    def _put(self, key: MapKey, img: Image.Image):
+        nbytes = self._image_bytes(img)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size_bytes -= self._image_bytes(old)
+
+            # Images larger than the whole budget are returned but never cached
+            if nbytes > self.max_bytes:
+                return
+
+            self._entries[key] = img
+            self._size_bytes += nbytes
+            while self._size_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size_bytes -= self._image_bytes(evicted)
+
+    @staticmethod
+    def _image_bytes(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+
+# Global cache instance
+map_cache = MapCache()
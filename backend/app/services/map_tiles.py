@@ -0,0 +1,161 @@
+import os
+import io
+import json
+import math
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.image_encoding import encode_image, normalize_format
+from app.services.map_cache import MapCache
+
+
+class TilePyramid:
+    """Multi-resolution tiles of a field map, built once and stored on disk
+
+    Level ``max_zoom`` is the map at native resolution and each lower level
+    halves it, down to level 0 which fits in a single tile. Tiles live in
+    ``<TILE_CACHE_DIR>/<version>/<z>/<x>/<y>.<ext>``; ``version`` hashes the
+    map path, mtime, tile size and format, so an edited map gets a fresh
+    pyramid and old tile URLs stay cacheable forever. Edge tiles are
+    cropped to the map instead of padded.
+    """
+
+    def __init__(self, map_path: str, loader: Callable[[], Image.Image],
+                 tile_size: Optional[int] = None, cache_dir: Optional[str] = None,
+                 image_format: Optional[str] = None):
+        self.map_path = map_path
+        self.loader = loader
+        self.tile_size = tile_size or settings.TILE_SIZE
+        self.cache_dir = cache_dir or settings.TILE_CACHE_DIR
+        self.image_format = normalize_format(image_format or settings.TILE_FORMAT)
+        self.extension = "jpg" if self.image_format == "jpeg" else self.image_format
+
+        abs_path, mtime, _ = MapCache.make_key(map_path, (0, 0))
+        ident = f"{abs_path}:{mtime}:{self.tile_size}:{self.image_format}"
+        self.version = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+        self.directory = os.path.join(self.cache_dir, self.version)
+        self._meta: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        """Pyramid layout (map size, tile size, zoom levels), building tiles if needed"""
+        if self._meta is None:
+            self.build()
+        return self._meta
+
+    def is_built(self) -> bool:
+        return self._meta is not None or os.path.exists(os.path.join(self.directory, "meta.json"))
+
+    def build(self) -> Dict[str, Any]:
+        """Write every tile of every level (no-op when already on disk)"""
+        with self._lock:
+            if self._meta is not None:
+                return self._meta
+            meta_path = os.path.join(self.directory, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    self._meta = json.load(f)
+                return self._meta
+
+            img = self.loader()
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGB")
+            width, height = img.size
+            max_zoom = max(0, math.ceil(math.log2(max(width, height) / self.tile_size)))
+
+            levels = []
+            level = img
+            for z in range(max_zoom, -1, -1):
+                scale = 2 ** (max_zoom - z)
+                size = (math.ceil(width / scale), math.ceil(height / scale))
+                if level.size != size:
+                    level = level.resize(size, Image.Resampling.BOX)
+                self._write_level(z, level)
+                levels.append({"z": z, "width": size[0], "height": size[1],
+                               "cols": math.ceil(size[0] / self.tile_size),
+                               "rows": math.ceil(size[1] / self.tile_size)})
+
+            meta = {
+                "version": self.version,
+                "width": width,
+                "height": height,
+                "tile_size": self.tile_size,
+                "format": self.image_format,
+                "max_zoom": max_zoom,
+                "levels": sorted(levels, key=lambda entry: entry["z"]),
+            }
+            self._atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+            self._meta = meta
+            return meta
+
+    def _write_level(self, z: int, level: Image.Image):
+        t = self.tile_size
+        for x in range(math.ceil(level.width / t)):
+            for y in range(math.ceil(level.height / t)):
+                tile = level.crop((x * t, y * t, min((x + 1) * t, level.width), min((y + 1) * t, level.height)))
+                self._atomic_write(self.tile_path(z, x, y), encode_image(tile, self.image_format))
+
+    def _atomic_write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def level(self, z: int) -> Dict[str, Any]:
+        levels = self.meta["levels"]
+        if not 0 <= z < len(levels):
+            raise KeyError(f"Zoom level out of range: {z}")
+        return levels[z]
+
+    def tile_path(self, z: int, x: int, y: int) -> str:
+        return os.path.join(self.directory, str(z), str(x), f"{y}.{self.extension}")
+
+    def tile(self, z: int, x: int, y: int) -> bytes:
+        """Encoded tile bytes; KeyError when (z, x, y) is outside the pyramid"""
+        level = self.level(z)
+        if not (0 <= x < level["cols"] and 0 <= y < level["rows"]):
+            raise KeyError(f"Tile out of range: {z}/{x}/{y}")
+        with open(self.tile_path(z, x, y), "rb") as f:
+            return f.read()
+
+    def zoom_for_scale(self, scale: float) -> int:
+        """Lowest level whose resolution is at least ``scale`` times the native map"""
+        max_zoom = self.meta["max_zoom"]
+        if scale >= 1.0:
+            return max_zoom
+        return max(0, max_zoom - int(math.floor(math.log2(1.0 / scale))))
+
+    def region(self, z: int, box: Tuple[int, int, int, int]) -> Image.Image:
+        """Composite only the tiles covering ``box`` (level pixels, x0, y0, x1, y1)"""
+        level = self.level(z)
+        t = self.tile_size
+        x0, y0 = max(box[0], 0), max(box[1], 0)
+        x1, y1 = min(box[2], level["width"]), min(box[3], level["height"])
+        img = Image.new("RGB", (max(box[2] - box[0], 1), max(box[3] - box[1], 1)), "white")
+        if x0 >= x1 or y0 >= y1:
+            return img
+        for tx in range(x0 // t, (x1 - 1) // t + 1):
+            for ty in range(y0 // t, (y1 - 1) // t + 1):
+                tile = Image.open(io.BytesIO(self.tile(z, tx, ty)))
+                img.paste(tile, (tx * t - box[0], ty * t - box[1]))
+        return img
+
+
+_pyramids: Dict[str, TilePyramid] = {}
+_pyramids_lock = threading.Lock()
+
+
+def get_tile_pyramid(map_path: str, loader: Callable[[], Image.Image]) -> TilePyramid:
+    """Shared pyramid for a map file, replaced when the file changes"""
+    pyramid = TilePyramid(map_path, loader)
+    with _pyramids_lock:
+        current = _pyramids.get(pyramid.directory)
+        if current is None:
+            _pyramids[pyramid.directory] = current = pyramid
+        return current
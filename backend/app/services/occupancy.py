@@ -0,0 +1,212 @@
+import json
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+from app.core.config import settings
+from app.services.pathfinding import Cell, GridSearch
+
+
+def obstacles_key(obstacles: Optional[List[Any]]) -> str:
+    """Stable digest of an obstacle list (order-insensitive)"""
+    normalized = sorted(json.dumps(o, sort_keys=True, default=str) for o in (obstacles or []))
+    return hashlib.sha1("\n".join(normalized).encode("utf-8")).hexdigest()
+
+
+class OccupancyGrid:
+    """Rasterized obstacle set for grid pathfinding
+
+    Built once per (obstacle set, canvas size, resolution) and shared across
+    requests. The clearance field (pixel distance from each free cell to the
+    nearest obstacle) is computed lazily with a Euclidean distance transform,
+    so inflating by any robot radius is a threshold, not a re-rasterization.
+    """
+
+    def __init__(self, grid: np.ndarray, resolution: int, key: str = ""):
+        self.grid = grid.astype(np.uint8)
+        self.resolution = resolution
+        self.key = key
+        self._clearance: Optional[np.ndarray] = None
+        self._search: Optional[GridSearch] = None
+        self._inflated: Dict[int, "OccupancyGrid"] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_obstacles(cls, obstacles: Optional[List[Any]], canvas_size: Tuple[int, int],
+                       resolution: int) -> "OccupancyGrid":
+        img_w, img_h = canvas_size
+        grid = np.zeros((img_h // resolution, img_w // resolution), dtype=np.uint8)
+
+        # Mark obstacles on grid
+        for obstacle in obstacles or []:
+            if isinstance(obstacle, dict):
+                x, y, w, h = obstacle.get('x', 0), obstacle.get('y', 0), obstacle.get('w', 20), obstacle.get('h', 20)
+                gx1, gy1 = int(x / resolution), int(y / resolution)
+                gx2, gy2 = int((x + w) / resolution), int((y + h) / resolution)
+                grid[gy1:gy2, gx1:gx2] = 1
+
+        key = f"{obstacles_key(obstacles)}:{img_w}x{img_h}:{resolution}"
+        return cls(grid, resolution, key)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.grid.shape
+
+    @property
+    def clearance(self) -> np.ndarray:
+        """Pixel distance from each cell to the nearest obstacle cell"""
+        if self._clearance is None:
+            if self.grid.any():
+                self._clearance = distance_transform_edt(self.grid == 0) * self.resolution
+            else:
+                self._clearance = np.full(self.grid.shape, np.inf)
+        return self._clearance
+
+    @property
+    def search(self) -> GridSearch:
+        if self._search is None:
+            self._search = GridSearch(self.grid)
+        return self._search
+
+    def inflated(self, radius: float) -> "OccupancyGrid":
+        """Grid with every cell closer than ``radius`` pixels to an obstacle blocked
+
+        The radius is rounded up to whole cells (and capped at the grid
+        diagonal, beyond which every free cell is blocked anyway), so the
+        grids cached per radius stay few whatever radii requests send.
+        """
+        if not radius or radius <= 0:
+            return self
+        cells = min(math.ceil(radius / self.resolution), math.ceil(math.hypot(*self.grid.shape)) + 1)
+        with self._lock:
+            grid = self._inflated.get(cells)
+            if grid is None:
+                blocked = (self.clearance < cells * self.resolution).astype(np.uint8)
+                grid = OccupancyGrid(blocked, self.resolution, f"{self.key}:r{cells}")
+                self._inflated[cells] = grid
+            return grid
+
+    def to_cell(self, point) -> Tuple[int, int]:
+        """Pixel (x, y) to grid (row, col)"""
+        return (int(point[1] / self.resolution), int(point[0] / self.resolution))
+
+    def is_free(self, point) -> bool:
+        """Whether a pixel position falls on a free cell"""
+        return self.search.is_free(self.to_cell(point))
+
+    def to_pixels(self, cells: List[Tuple[int, int]]) -> np.ndarray:
+        """Grid (row, col) cells back to pixel (x, y) coordinates"""
+        return np.array(cells, dtype=np.float64)[:, ::-1] * self.resolution
+
+    def find_path(self, start, goal, jump_points: bool = False) -> Optional[np.ndarray]:
+        """Pixel route between two pixel positions, or None"""
+        cells = self.search.find_path(self.to_cell(start), self.to_cell(goal), jump_points=jump_points)
+        return self.to_pixels(cells) if cells else None
+
+    def route(self, waypoints, robot_radius: float = 0,
+              jump_points: bool = False) -> Optional[np.ndarray]:
+        """Pixel route through every waypoint in order, or None if no leg is routable
+
+        Each leg is looked up in the shared leg cache, so moving one waypoint
+        only recomputes the two legs touching it. A leg uses the grid
+        inflated by ``robot_radius`` unless one of its endpoints lies inside
+        the inflated zone; legs with no route are drawn straight.
+        """
+        inflated = self.inflated(robot_radius)
+        cells: List[Cell] = []
+        routed = False
+        for start, goal in zip(waypoints[:-1], waypoints[1:]):
+            grid = inflated if inflated.is_free(start) and inflated.is_free(goal) else self
+            start_cell, goal_cell = grid.to_cell(start), grid.to_cell(goal)
+            leg = route_leg_cache.get(grid, start_cell, goal_cell, jump_points)
+            if leg is None:
+                leg = (start_cell, goal_cell) if start_cell != goal_cell else (start_cell,)
+            else:
+                routed = True
+            # Consecutive legs share their joining cell
+            cells.extend(leg[1:] if cells and cells[-1] == leg[0] else leg)
+        return self.to_pixels(cells) if routed else None
+
+
+class OccupancyGridCache:
+    """LRU cache of OccupancyGrids keyed by obstacle set, canvas size and resolution"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.OCCUPANCY_CACHE_SIZE
+        self._entries: "OrderedDict[str, OccupancyGrid]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, obstacles: Optional[List[Any]], canvas_size: Tuple[int, int],
+            resolution: int) -> OccupancyGrid:
+        key = f"{obstacles_key(obstacles)}:{canvas_size[0]}x{canvas_size[1]}:{resolution}"
+        with self._lock:
+            grid = self._entries.get(key)
+            if grid is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return grid
+            self.misses += 1
+
+        grid = OccupancyGrid.from_obstacles(obstacles, canvas_size, resolution)
+        with self._lock:
+            self._entries[key] = grid
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return grid
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RouteLegCache:
+    """LRU memo of single-leg grid routes keyed by (grid id, start cell, goal cell)"""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.ROUTE_LEG_CACHE_SIZE
+        self._entries: "OrderedDict[tuple, Optional[Tuple[Cell, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, grid: OccupancyGrid, start: Cell, goal: Cell,
+            jump_points: bool = False) -> Optional[Tuple[Cell, ...]]:
+        key = (grid.key, start, goal, jump_points)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        path = grid.search.find_path(start, goal, jump_points=jump_points)
+        leg = tuple(path) if path else None
+        with self._lock:
+            self._entries[key] = leg
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return leg
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Global cache instances
+occupancy_cache = OccupancyGridCache()
+route_leg_cache = RouteLegCache()
@@ -0,0 +1,102 @@
+import numpy as np
+from typing import List, Dict, Optional, Sequence
+
+
+class PathArrays:
+    """Columnar path representation used inside the renderer
+
+    Built once per request from the incoming points. Coordinates, time and
+    speed are contiguous float64 arrays (NaN where a point omits ``t`` or
+    ``speed``); robot states are stored as int16 codes into ``state_names``
+    (-1 = no state), with sparse per-point custom colors.
+    """
+
+    NO_STATE = -1
+
+    def __init__(self, x: np.ndarray, y: np.ndarray,
+                 t: Optional[np.ndarray] = None, speed: Optional[np.ndarray] = None,
+                 state: Optional[np.ndarray] = None, state_names: Optional[List[str]] = None,
+                 state_colors: Optional[Dict[int, str]] = None):
+        n = len(x)
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.t = np.ascontiguousarray(t, dtype=np.float64) if t is not None else np.full(n, np.nan)
+        self.speed = (np.ascontiguousarray(speed, dtype=np.float64) if speed is not None
+                      else np.full(n, np.nan))
+        self.state = (np.ascontiguousarray(state, dtype=np.int16) if state is not None
+                      else np.full(n, self.NO_STATE, dtype=np.int16))
+        self.state_names = state_names or []
+        self.state_colors = state_colors or {}
+
+    @classmethod
+    def from_points(cls, points: Sequence) -> "PathArrays":
+        """Build from a list of PathPoint models in a single pass"""
+        n = len(points)
+        x = np.empty(n)
+        y = np.empty(n)
+        t = np.full(n, np.nan)
+        speed = np.full(n, np.nan)
+        state = np.full(n, cls.NO_STATE, dtype=np.int16)
+        state_names: List[str] = []
+        state_codes: Dict[str, int] = {}
+        state_colors: Dict[int, str] = {}
+
+        for i, p in enumerate(points):
+            x[i] = p.x
+            y[i] = p.y
+            if p.t is not None:
+                t[i] = p.t
+            if p.speed is not None:
+                speed[i] = p.speed
+            if p.robot_state:
+                name = p.robot_state.state.lower()
+                code = state_codes.get(name)
+                if code is None:
+                    code = state_codes[name] = len(state_names)
+                    state_names.append(name)
+                state[i] = code
+                if p.robot_state.color:
+                    state_colors[i] = p.robot_state.color
+
+        return cls(x, y, t, speed, state, state_names, state_colors)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @property
+    def xy(self) -> np.ndarray:
+        """(N, 2) array of coordinates"""
+        return np.column_stack((self.x, self.y))
+
+    def scaled(self, scale_x: float, scale_y: float) -> "PathArrays":
+        """Copy with scaled coordinates; other columns are shared"""
+        return PathArrays(self.x * scale_x, self.y * scale_y, self.t, self.speed,
+                          self.state, self.state_names, self.state_colors)
+
+    def take(self, indices: np.ndarray) -> "PathArrays":
+        """Subset of points (sorted indices) with custom state colors remapped"""
+        indices = np.asarray(indices)
+        positions = {int(old): new for new, old in enumerate(indices.tolist())}
+        state_colors = {positions[i]: color for i, color in self.state_colors.items() if i in positions}
+        return PathArrays(self.x[indices], self.y[indices], self.t[indices], self.speed[indices],
+                          self.state[indices], self.state_names, state_colors)
+
+    def state_indices(self) -> np.ndarray:
+        """Indices of points that carry a robot state"""
+        return np.flatnonzero(self.state != self.NO_STATE)
+
+    def state_name(self, i: int) -> Optional[str]:
+        code = int(self.state[i])
+        return self.state_names[code] if code != self.NO_STATE else None
+
+    def speed_or_time(self, default: float = 1.0) -> np.ndarray:
+        """Per-point ``speed or t or default`` as used by the heatline"""
+        values = np.where(np.isnan(self.speed) | (self.speed == 0), self.t, self.speed)
+        return np.where(np.isnan(values) | (values == 0), default, values)
+
+
+def as_path_arrays(points) -> PathArrays:
+    """Accept PathArrays or a list of PathPoint models"""
+    if isinstance(points, PathArrays):
+        return points
+    return PathArrays.from_points(points)
@@ -0,0 +1,99 @@
+import io
+import json
+import struct
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.schemas import MAX_STATE_NAME_LENGTH
+from app.services.path_arrays import PathArrays
+
+
+# Compact binary render body:
+#   b"RSXP" | uint32 LE header length | UTF-8 JSON header | payload
+# The header carries the usual PathRenderRequest fields (minus points) plus
+# "columns" (subset of x, y, t, speed, state), "count" and "encoding":
+#   "f32le" - packed little-endian float32 columns, one after another
+#   "npy"   - a .npy array of shape (count, len(columns))
+# A "state" column holds integer codes into the header's "state_names"
+# list (-1 = no state); NaN in t/speed means the value is absent.
+PATH_BINARY_MEDIA_TYPE = "application/vnd.rscoutx.path"
+MAGIC = b"RSXP"
+COLUMNS = ("x", "y", "t", "speed", "state")
+MAX_HEADER_BYTES = 64 * 1024
+
+
+def decode_path_body(body: bytes) -> Tuple[Dict[str, Any], PathArrays]:
+    """Decode a binary render body into (request fields, PathArrays)"""
+    if len(body) < 8 or body[:4] != MAGIC:
+        raise ValueError("Binary path body must start with RSXP magic")
+    (header_len,) = struct.unpack_from("<I", body, 4)
+    if header_len > MAX_HEADER_BYTES or 8 + header_len > len(body):
+        raise ValueError("Invalid binary path header length")
+
+    header = json.loads(body[8:8 + header_len].decode("utf-8"))
+    if not isinstance(header, dict):
+        raise ValueError("Binary path header must be a JSON object")
+    payload = memoryview(body)[8 + header_len:]
+
+    columns: List[str] = header.pop("columns", ["x", "y"])
+    encoding = header.pop("encoding", "f32le")
+    state_names = header.pop("state_names", None) or []
+    if any(len(str(name)) > MAX_STATE_NAME_LENGTH for name in state_names):
+        raise ValueError(f"State names must be at most {MAX_STATE_NAME_LENGTH} characters")
+    if "x" not in columns or "y" not in columns:
+        raise ValueError("Binary path must include x and y columns")
+    unknown = set(columns) - set(COLUMNS)
+    if unknown or len(set(columns)) != len(columns):
+        raise ValueError(f"Invalid binary path columns: {columns}")
+
+    if encoding == "f32le":
+        count = int(header.pop("count"))
+        expected = count * len(columns) * 4
+        if len(payload) != expected:
+            raise ValueError(f"Expected {expected} payload bytes, got {len(payload)}")
+        data = np.frombuffer(payload, dtype="<f4").reshape(len(columns), count)
+        values = {name: data[i] for i, name in enumerate(columns)}
+    elif encoding == "npy":
+        header.pop("count", None)
+        data = np.load(io.BytesIO(payload), allow_pickle=False)
+        if data.ndim != 2 or data.shape[1] != len(columns):
+            raise ValueError(f"npy payload must have shape (N, {len(columns)})")
+        values = {name: data[:, i] for i, name in enumerate(columns)}
+    else:
+        raise ValueError(f"Unknown binary path encoding: {encoding}")
+
+    if not (np.isfinite(values["x"]).all() and np.isfinite(values["y"]).all()):
+        raise ValueError("Binary path x and y must be finite")
+
+    state = None
+    if "state" in values:
+        state = np.nan_to_num(values["state"], nan=PathArrays.NO_STATE).astype(np.int16)
+        if state.size and (state.max() >= len(state_names) or state.min() < PathArrays.NO_STATE):
+            raise ValueError("State code outside state_names")
+
+    path = PathArrays(values["x"], values["y"], values.get("t"), values.get("speed"),
+                      state, [str(name).lower() for name in state_names])
+    return header, path
+
+
+def encode_path_body(path: PathArrays, fields: Optional[Dict[str, Any]] = None,
+                     columns: Optional[List[str]] = None, encoding: str = "f32le") -> bytes:
+    """Encode a PathArrays and request fields as a binary render body"""
+    columns = list(columns or ("x", "y"))
+    header = dict(fields or {})
+    header.update({"columns": columns, "count": len(path), "encoding": encoding})
+    if "state" in columns:
+        header["state_names"] = path.state_names
+
+    data = np.stack([getattr(path, name).astype(np.float32) for name in columns])
+    if encoding == "f32le":
+        payload = data.astype("<f4").tobytes()
+    elif encoding == "npy":
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(data.T))
+        payload = buffer.getvalue()
+    else:
+        raise ValueError(f"Unknown binary path encoding: {encoding}")
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    return MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes + payload
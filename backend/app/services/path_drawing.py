@@ -0,0 +1,121 @@
+import numpy as np
+import cv2
+from PIL import Image
+from typing import List, Tuple, Optional
+
+
+# Fixed-point bits for sub-pixel vertex positions in cv2 drawing calls
+SHIFT = 4
+_SCALE = 1 << SHIFT
+
+# Strokes are drawn solid at this many times the output resolution and
+# area-averaged down, so a width-N stroke covers N pixels like PIL's and
+# the SVG output (cv2's own LINE_AA strokes come out ~2 px wider, and
+# even widths round up to the next odd one)
+SUPERSAMPLE = 4
+# Largest supersampled mask (pixels); big viewport outputs use a lower factor
+MAX_SUPERSAMPLED_PIXELS = 16 * 1024 * 1024
+
+ARROW_ANGLE = np.pi / 6
+
+
+def to_fixed(points: np.ndarray) -> np.ndarray:
+    """Convert float pixel coordinates to cv2 fixed-point int32 vertices"""
+    return np.round(np.asarray(points, dtype=np.float64) * _SCALE).astype(np.int32)
+
+
+def arrow_heads(points: np.ndarray, length: float) -> np.ndarray:
+    """Compute arrow-head polylines for every segment end in one pass
+
+    Returns an (N-1, 3, 2) array of [wing1, tip, wing2] triples.
+    """
+    start = points[:-1]
+    end = points[1:]
+    delta = end - start
+    angle = np.arctan2(delta[:, 1], delta[:, 0])
+
+    heads = np.empty((len(end), 3, 2), dtype=np.float64)
+    heads[:, 0, 0] = end[:, 0] - length * np.cos(angle - ARROW_ANGLE)
+    heads[:, 0, 1] = end[:, 1] - length * np.sin(angle - ARROW_ANGLE)
+    heads[:, 1] = end
+    heads[:, 2, 0] = end[:, 0] - length * np.cos(angle + ARROW_ANGLE)
+    heads[:, 2, 1] = end[:, 1] - length * np.sin(angle + ARROW_ANGLE)
+    return heads
+
+
+def _bounds(points: np.ndarray, pad: float, shape: Tuple[int, int]) -> Optional[Tuple[int, int, int, int]]:
+    """Padded, clipped integer bounding box (x0, y0, x1, y1) of the points"""
+    h, w = shape
+    x0 = max(int(np.floor(points[:, 0].min() - pad)), 0)
+    y0 = max(int(np.floor(points[:, 1].min() - pad)), 0)
+    x1 = min(int(np.ceil(points[:, 0].max() + pad)) + 1, w)
+    y1 = min(int(np.ceil(points[:, 1].max() + pad)) + 1, h)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return x0, y0, x1, y1
+
+
+def polyline_mask(points: np.ndarray, width: int, shape: Tuple[int, int],
+                  arrow: bool = False) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+    """Rasterize a whole polyline (and optional arrow heads) into a coverage mask
+
+    All segments go through a single supersampled ``cv2.polylines`` call, so
+    joints are continuous and overlapping segments are not blended twice.
+    Returns (mask, (x0, y0)) for the clipped bounding box, or None when the
+    path is entirely off-canvas.
+    """
+    return polylines_mask([points], width, shape, arrow)
+
+
+def polylines_mask(runs: List[np.ndarray], width: int, shape: Tuple[int, int],
+                   arrow: bool = False) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+    """Rasterize disjoint polylines (e.g. the visible runs of a clipped path) into one mask"""
+    runs = [np.asarray(run, dtype=np.float64) for run in runs if len(run) >= 2]
+    if not runs:
+        return None
+
+    width = max(int(width), 1)
+    arrow_length = width * 3
+    bounds = _bounds(np.concatenate(runs), width + arrow_length + 2, shape)
+    if bounds is None:
+        return None
+    x0, y0, x1, y1 = bounds
+    area = (x1 - x0) * (y1 - y0)
+    factor = min(SUPERSAMPLE, max(int(np.sqrt(MAX_SUPERSAMPLED_PIXELS / area)), 1))
+    # Output pixel centers map to the centers of their supersampled blocks
+    offset = np.array([x0, y0], dtype=np.float64) - (factor - 1) / (2 * factor)
+
+    fine = np.zeros(((y1 - y0) * factor, (x1 - x0) * factor), dtype=np.uint8)
+    cv2.polylines(fine, [to_fixed((run - offset) * factor) for run in runs], False, 255,
+                  thickness=width * factor, lineType=cv2.LINE_8, shift=SHIFT)
+
+    if arrow:
+        heads = np.concatenate([arrow_heads(run, arrow_length) for run in runs]) - offset
+        cv2.polylines(fine, list(to_fixed(heads * factor)), False, 255,
+                      thickness=width * factor, lineType=cv2.LINE_8, shift=SHIFT)
+
+    mask = cv2.resize(fine, (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA)
+    return mask, (x0, y0)
+
+
+def paste_mask(img: Image.Image, mask: np.ndarray, origin: Tuple[int, int],
+               rgba: Tuple[int, int, int, int]):
+    """Blend a solid color into an RGB PIL image through a coverage mask
+
+    Uses PIL's C paste-with-mask so the canvas never round-trips through NumPy.
+    """
+    if rgba[3] < 255:
+        mask = cv2.convertScaleAbs(mask, alpha=rgba[3] / 255.0)
+    x0, y0 = origin
+    h, w = mask.shape
+    img.paste(rgba[:3], (x0, y0, x0 + w, y0 + h), Image.fromarray(mask))
+    return img
+
+
+def draw_polyline_image(img: Image.Image, points: np.ndarray, rgba: Tuple[int, int, int, int],
+                        width: int, arrow: bool = False) -> Image.Image:
+    """Draw a whole polyline onto an RGB PIL image in place"""
+    rasterized = polyline_mask(points, width, (img.height, img.width), arrow)
+    if rasterized is not None:
+        paste_mask(img, rasterized[0], rasterized[1], rgba)
+    return img
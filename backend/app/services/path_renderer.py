@@ -1,15 +1,44 @@
 import os
-import io
 import base64
+from functools import lru_cache
 import numpy as np
-from typing import List, Tuple, Optional, Any, Dict
+from typing import List, Tuple, Optional, Any, Dict, Union
 from PIL import Image, ImageDraw, ImageFont
 from scipy import interpolate
 from scipy.spatial.distance import euclidean
 import cv2
 
 from app.core.config import settings
-from app.schemas.schemas import PathPoint, PathStyle, RobotState
+from app.schemas.schemas import PathPoint, PathStyle, RobotState, Viewport
+from app.services.map_cache import map_cache, resolve_map_path
+from app.services.map_tiles import TilePyramid, get_tile_pyramid
+from app.services.path_drawing import draw_polyline_image, polylines_mask
+from app.services.path_arrays import PathArrays, as_path_arrays
+from app.services.path_simplify import rdp_mask
+from app.services.curve_sampling import adaptive_sample
+from app.services.state_sprites import Sprite, SpriteAtlas, stamp
+from app.services.layers import Layer, layer_cache, layer_key, array_digest, mask_layer, crop_layer, composite
+from app.services.image_encoding import encode_image
+from app.services import path_svg
+from app.services.path_drawing import arrow_heads
+from app.services.occupancy import occupancy_cache
+from app.services.viewport import ViewportFrame, integer_box, segment_runs, visible_segments
+from app.services.interference import interference_pairs, path_times, positions_at, time_grid
+from app.services.replay import (
+    ReplayCanvas, curve_times, encode_replay, frame_times, gif_palette,
+    normalize_replay_format, point_times, replay_pieces
+)
+
+
+@lru_cache(maxsize=1)
+def load_fonts() -> Tuple[ImageFont.ImageFont, ImageFont.ImageFont]:
+    """Label and icon fonts, resolved once per process"""
+    try:
+        # Try to load a font, fallback to default if not available
+        return ImageFont.truetype("arial.ttf", 14), ImageFont.truetype("arial.ttf", 20)
+    except OSError:
+        default = ImageFont.load_default()
+        return default, default
 
 
 class PathRenderer:
@@ -33,328 +62,861 @@ class PathRenderer:
         'idle': '○'          # Empty circle
     }
     
+    # Conflict markers in interference overlays (magenta stands out from path colors)
+    CONFLICT_RGBA = (255, 0, 255, 255)
+    
     def __init__(self, map_path: Optional[str] = None):
         self.map_path = map_path or settings.MAP_IMAGE_PATH
         self.field_width = settings.FIELD_WIDTH_MM
         self.field_height = settings.FIELD_HEIGHT_MM
-        try:
-            # Try to load a font, fallback to default if not available
-            self.font = ImageFont.truetype("arial.ttf", 14)
-            self.font_large = ImageFont.truetype("arial.ttf", 20)
-        except:
-            self.font = ImageFont.load_default()
-            self.font_large = ImageFont.load_default()
-        
+        self.font, self.font_large = load_fonts()
+        self.sprites = SpriteAtlas(self.font, self.font_large)
+        # Marker colors resolved once instead of parsing hex per state point
+        self.state_rgba = {state: self._hex_to_rgba(color, 0.9) for state, color in self.STATE_COLORS.items()}
+        # 256-entry RGB heatline colormap (blue=slow, red=fast)
+        self.heat_lut = np.array([self._speed_to_color(i / 255.0)[::-1] for i in range(256)], dtype=np.uint8)
+    
+    def warm_sprites(self, marker_size: int = 20):
+        """Pre-build marker sprites for every known state, with and without labels"""
+        for state, rgba in self.state_rgba.items():
+            for label in (state.replace('_', ' ').title(), None):
+                self.sprites.get(self.STATE_ICONS.get(state, '●'), rgba, marker_size, label)
+        
+    def resolve_map_path(self) -> Optional[str]:
+        """Absolute path of the map file, trying known locations; None if missing"""
+        map_path = resolve_map_path(self.map_path)
+        if map_path is not None:
+            self.map_path = map_path
+        return map_path
+    
     def load_map(self) -> Image.Image:
         """Load the field map image"""
-        # Convert to absolute path if it's relative
-        map_path = os.path.abspath(self.map_path)
+        configured_path = self.map_path
+        map_path = self.resolve_map_path()
         
-        if not os.path.exists(map_path):
-            print(f"⚠️  警告: 地图文件未找到: {map_path}")
+        if map_path is None:
+            print(f"⚠️  警告: 地图文件未找到: {os.path.abspath(configured_path)}")
             print(f"   当前工作目录: {os.getcwd()}")
-            print(f"   配置路径: {self.map_path}")
-            # Try alternative locations
-            alternatives = [
-                os.path.join(os.getcwd(), "pushback_map.png"),
-                os.path.join(os.path.dirname(os.getcwd()), "pushback_map.png"),
-                os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "..", "pushback_map.png")
-            ]
-            for alt_path in alternatives:
-                alt_path = os.path.abspath(alt_path)
-                if os.path.exists(alt_path):
-                    print(f"✅ 找到地图文件: {alt_path}")
-                    self.map_path = alt_path
-                    return Image.open(alt_path).convert('RGB')
-            
+            print(f"   配置路径: {configured_path}")
             # Create blank map if not exists
             print("   使用默认空白地图")
             img = Image.new('RGB', (settings.DEFAULT_MAP_WIDTH, settings.DEFAULT_MAP_HEIGHT), 'white')
             return img
+        if map_path != os.path.abspath(configured_path):
+            print(f"✅ 找到地图文件: {map_path}")
         return Image.open(map_path).convert('RGB')
     
-    def convert_coordinates(self, points: List[PathPoint], 
+    def tile_pyramid(self) -> TilePyramid:
+        """On-disk tile pyramid of this renderer's map"""
+        return get_tile_pyramid(self.resolve_map_path() or self.map_path, self.load_map)
+    
+    def load_canvas(self, canvas_size: Tuple[int, int]) -> Image.Image:
+        """Get a private copy of the map resized to canvas_size
+        
+        The decoded and resized map is shared through the process-wide
+        map cache, so only the first render per (map, mtime, size) pays for
+        the PNG decode and LANCZOS resize.
+        """
+        return map_cache.get(self.resolve_map_path() or self.map_path, canvas_size, self.load_map).copy()
+    
+    def viewport_frame(self, viewport: Viewport, coordinate_system: str,
+                       canvas_size: Tuple[int, int]) -> ViewportFrame:
+        """Canvas-pixel frame of a requested viewport"""
+        x0, y0 = viewport.x, viewport.y
+        x1, y1 = x0 + viewport.width, y0 + viewport.height
+        if coordinate_system != "pixel":
+            scale_x = canvas_size[0] / self.field_width
+            scale_y = canvas_size[1] / self.field_height
+            x0, x1, y0, y1 = x0 * scale_x, x1 * scale_x, y0 * scale_y, y1 * scale_y
+        return ViewportFrame.fit((x0, y0, x1, y1), viewport.output_width, viewport.output_height)
+    
+    def load_viewport(self, frame: ViewportFrame, canvas_size: Tuple[int, int]) -> Image.Image:
+        """Map pixels under a viewport, resampled straight to the output size
+        
+        Reads only the tiles covering the viewport from the coarsest
+        pyramid level that still has enough detail, so zooming in never
+        decodes or resizes the whole map.
+        """
+        pyramid = self.tile_pyramid()
+        meta = pyramid.meta
+        box = frame.source_box(meta["width"], meta["height"], canvas_size)
+        scale = min(frame.size[0] / (box[2] - box[0]), frame.size[1] / (box[3] - box[1]))
+        z = pyramid.zoom_for_scale(scale)
+        level = pyramid.level(z)
+        k = level["width"] / meta["width"]
+        box = tuple(v * k for v in box)
+        # Margin for the LANCZOS kernel, so edge pixels resample like interior ones
+        pad = 3 * max(1.0, (box[2] - box[0]) / frame.size[0])
+        tiles_box = integer_box((box[0] - pad, box[1] - pad, box[2] + pad, box[3] + pad))
+        region = pyramid.region(z, tiles_box)
+        crop = (box[0] - tiles_box[0], box[1] - tiles_box[1],
+                box[2] - tiles_box[0], box[3] - tiles_box[1])
+        return region.resize(frame.size, Image.Resampling.LANCZOS, box=crop)
+    
+    def convert_coordinates(self, points: Union[PathArrays, List[PathPoint]], 
                           coordinate_system: str, 
-                          img_size: Tuple[int, int]) -> List[Tuple[float, float]]:
-        """Convert field coordinates to pixel coordinates"""
+                          img_size: Tuple[int, int]) -> np.ndarray:
+        """Convert field coordinates to pixel coordinates
+        
+        Returns an (N, 2) float array of pixel positions.
+        """
+        path = as_path_arrays(points)
         if coordinate_system == "pixel":
-            return [(p.x, p.y) for p in points]
+            return path.xy
         
         # Convert from field coordinates (mm) to pixels
         img_w, img_h = img_size
         scale_x = img_w / self.field_width
         scale_y = img_h / self.field_height
         
-        converted = []
-        for p in points:
-            px = p.x * scale_x
-            py = p.y * scale_y
-            converted.append((px, py))
-        return converted
+        return np.column_stack((path.x * scale_x, path.y * scale_y))
     
-    def render_polyline(self, img: Image.Image, points: List[Tuple[float, float]], 
+    def simplify(self, path: PathArrays, style: PathStyle, coordinate_system: str,
+                 canvas_size: Tuple[int, int]) -> Tuple[PathArrays, int]:
+        """Drop points within style.simplify_tolerance pixels of the simplified line
+        
+        Points carrying a robot state are always kept. Returns the simplified
+        path and the number of points removed.
+        """
+        if not style.simplify_tolerance or len(path) < 3:
+            return path, 0
+        pixel_points = self.convert_coordinates(path, coordinate_system, canvas_size)
+        keep = rdp_mask(pixel_points, style.simplify_tolerance, anchors=path.state_indices())
+        removed = len(path) - int(keep.sum())
+        if not removed:
+            return path, 0
+        return path.take(np.flatnonzero(keep)), removed
+    
+    def render_polyline(self, img: Image.Image, points: np.ndarray, 
                        style: PathStyle) -> Image.Image:
         """Draw polyline connecting points"""
-        draw = ImageDraw.Draw(img, 'RGBA')
-        
         if len(points) < 2:
             return img
         
         # Convert color with opacity
         color = self._hex_to_rgba(style.color, style.opacity)
         
-        for i in range(len(points) - 1):
-            draw.line([points[i], points[i + 1]], fill=color, width=style.width)
-        
-        # Draw arrows if requested
-        if style.arrow:
-            for i in range(len(points) - 1):
-                self._draw_arrow(draw, points[i], points[i + 1], color, style.width)
-        
-        return img
+        # Whole polyline and arrow heads are submitted in one batched draw
+        return draw_polyline_image(img, np.asarray(points, dtype=np.float64), color,
+                                   style.width, arrow=bool(style.arrow))
     
-    def render_bezier(self, img: Image.Image, points: List[Tuple[float, float]], 
-                     style: PathStyle) -> Image.Image:
-        """Draw smooth Bezier curve through points"""
-        if len(points) < 2:
-            return img
+    def smooth_bezier(self, points: np.ndarray, tolerance: Optional[float] = None) -> np.ndarray:
+        """Sample a smooth interpolating curve through points
         
-        # Use scipy to create Bezier curve
-        points_array = np.array(points)
-        
-        if len(points) == 2:
-            # Simple line for 2 points
-            return self.render_polyline(img, points, style)
+        Samples adaptively so the drawn chords stay within ``tolerance``
+        pixels of the curve (default settings.CURVE_TOLERANCE).
+        """
+        points_array = np.asarray(points, dtype=np.float64)
+        if len(points_array) <= 2:
+            return points_array
         
         # Create parameter array
-        t = np.linspace(0, 1, len(points))
-        t_smooth = np.linspace(0, 1, len(points) * 20)
+        t = np.linspace(0, 1, len(points_array))
         
         # Interpolate x and y separately
         from scipy.interpolate import make_interp_spline
-        spl_x = make_interp_spline(t, points_array[:, 0], k=min(3, len(points) - 1))
-        spl_y = make_interp_spline(t, points_array[:, 1], k=min(3, len(points) - 1))
-        
-        x_smooth = spl_x(t_smooth)
-        y_smooth = spl_y(t_smooth)
+        spl_x = make_interp_spline(t, points_array[:, 0], k=min(3, len(points_array) - 1))
+        spl_y = make_interp_spline(t, points_array[:, 1], k=min(3, len(points_array) - 1))
         
-        smooth_points = list(zip(x_smooth, y_smooth))
-        return self.render_polyline(img, smooth_points, style)
+        return adaptive_sample(lambda u: np.column_stack((spl_x(u), spl_y(u))), t,
+                               tolerance or settings.CURVE_TOLERANCE)
     
-    def render_spline(self, img: Image.Image, points: List[Tuple[float, float]], 
-                     style: PathStyle) -> Image.Image:
-        """Draw Catmull-Rom spline through points"""
-        if len(points) < 3:
-            return self.render_polyline(img, points, style)
+    def smooth_spline(self, points: np.ndarray, tolerance: Optional[float] = None) -> np.ndarray:
+        """Sample a parametric B-spline through points
         
-        points_array = np.array(points)
+        Samples adaptively so the drawn chords stay within ``tolerance``
+        pixels of the curve (default settings.CURVE_TOLERANCE).
+        """
+        points_array = np.asarray(points, dtype=np.float64)
+        if len(points_array) < 3:
+            return points_array
         
         # Catmull-Rom spline using scipy
-        tck, u = interpolate.splprep([points_array[:, 0], points_array[:, 1]], s=0, k=min(3, len(points) - 1))
-        u_fine = np.linspace(0, 1, len(points) * 20)
-        x_fine, y_fine = interpolate.splev(u_fine, tck)
+        tck, u = interpolate.splprep([points_array[:, 0], points_array[:, 1]], s=0, k=min(3, len(points_array) - 1))
         
-        smooth_points = list(zip(x_fine, y_fine))
-        return self.render_polyline(img, smooth_points, style)
+        return adaptive_sample(lambda u_fine: np.column_stack(interpolate.splev(u_fine, tck)), u,
+                               tolerance or settings.CURVE_TOLERANCE)
     
-    def render_astar(self, img: Image.Image, points: List[Tuple[float, float]], 
-                    style: PathStyle, obstacles: Optional[List[Any]] = None) -> Image.Image:
-        """A* pathfinding and rendering"""
+    def route_astar(self, points: np.ndarray, canvas_size: Tuple[int, int],
+                    obstacles: Optional[List[Any]] = None,
+                    robot_radius: Optional[float] = None,
+                    tolerance: Optional[float] = None) -> np.ndarray:
+        """Route through every point in order around obstacles
+        
+        Obstacles are rasterized once per (obstacle set, canvas size,
+        resolution) by the shared occupancy cache, and each waypoint-to-
+        waypoint leg is memoized. ``robot_radius`` (canvas pixels) keeps the
+        route that far from obstacles where the waypoints allow it, and
+        ``tolerance`` is the chord error of the spline smoothing the route.
+        
+        Returns the smoothed route, or straight lines through the points when
+        there are no obstacles or no leg can be routed.
+        """
+        points = np.asarray(points, dtype=np.float64)
         if len(points) < 2:
-            return img
-        
-        start = points[0]
-        end = points[-1]
+            return points
         
-        # Simple implementation: if no obstacles, use straight line
+        # Simple implementation: if no obstacles, use straight lines
         if not obstacles:
-            return self.render_polyline(img, [start, end], style)
-        
-        # Create grid for A*
-        img_w, img_h = img.size
-        grid_resolution = 20
-        grid = np.zeros((img_h // grid_resolution, img_w // grid_resolution), dtype=int)
-        
-        # Mark obstacles on grid
-        for obstacle in obstacles:
-            if isinstance(obstacle, dict):
-                x, y, w, h = obstacle.get('x', 0), obstacle.get('y', 0), obstacle.get('w', 20), obstacle.get('h', 20)
-                gx1, gy1 = int(x / grid_resolution), int(y / grid_resolution)
-                gx2, gy2 = int((x + w) / grid_resolution), int((y + h) / grid_resolution)
-                grid[gy1:gy2, gx1:gx2] = 1
-        
-        # Run A* algorithm
-        path = self._astar_path(grid, 
-                               (int(start[1] / grid_resolution), int(start[0] / grid_resolution)),
-                               (int(end[1] / grid_resolution), int(end[0] / grid_resolution)))
-        
-        if path:
-            # Convert grid path back to pixel coordinates
-            pixel_path = [(p[1] * grid_resolution, p[0] * grid_resolution) for p in path]
-            return self.render_spline(img, pixel_path, style)
+            return points
+        
+        grid = occupancy_cache.get(obstacles, canvas_size, settings.OCCUPANCY_GRID_RESOLUTION)
+        if robot_radius is None:
+            robot_radius = settings.ROBOT_RADIUS
+        
+        # Run A* (or Jump Point Search) leg by leg on the occupancy grid
+        pixel_path = grid.route(points, robot_radius, jump_points=settings.PATHFINDING_MODE == "jps")
+        
+        if pixel_path is not None:
+            return self.smooth_spline(pixel_path, tolerance)
         else:
-            # Fallback to direct line if no path found
-            return self.render_polyline(img, [start, end], style)
+            # Fallback to direct lines if no route found
+            return points
     
-    def render_heatline(self, img: Image.Image, points: List[PathPoint], 
-                       style: PathStyle) -> Image.Image:
-        """Draw heatmap-style line with varying thickness/color based on speed"""
-        if len(points) < 2:
-            return img
+    def path_geometry(self, method: str, pixel_points: np.ndarray,
+                      canvas_size: Tuple[int, int],
+                      obstacles: Optional[List[Any]] = None,
+                      robot_radius: Optional[float] = None,
+                      tolerance: Optional[float] = None) -> np.ndarray:
+        """Polyline actually drawn for a method (smoothed or routed)"""
+        if method == "polyline":
+            return np.asarray(pixel_points, dtype=np.float64)
+        elif method == "bezier":
+            return self.smooth_bezier(pixel_points, tolerance)
+        elif method == "spline":
+            return self.smooth_spline(pixel_points, tolerance)
+        elif method == "astar":
+            return self.route_astar(pixel_points, canvas_size, obstacles, robot_radius, tolerance)
+        raise ValueError(f"Unknown rendering method: {method}")
+    
+    def heatline_levels(self, path: PathArrays, style: PathStyle) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-segment colormap level (0-255) and stroke thickness of a heatline"""
+        # Use speed or default to create heat effect (blue=slow, red=fast)
+        normalized_speed = np.clip(path.speed_or_time(1.0)[:-1] / 10.0, 0.0, 1.0)
+        levels = np.rint(normalized_speed * 255).astype(np.intp)
+        thicknesses = np.maximum((style.width * (0.5 + levels / 255.0)).astype(int), 1)
+        return levels, thicknesses
+    
+    def heatline_runs(self, path: PathArrays, pixel_points: np.ndarray, style: PathStyle,
+                      visible: Optional[np.ndarray] = None):
+        """Heatline as runs of consecutive segments sharing a color level
+        
+        Speeds are normalized in one pass and quantized to the 256-entry
+        colormap; a segment's thickness follows from its level, so every run
+        is one stroke. Segments outside an optional ``visible`` mask are
+        dropped. Returns [(points, level, thickness)].
+        """
+        points = np.floor(pixel_points).astype(np.int32)
+        levels, thicknesses = self.heatline_levels(path, style)
+        
+        # Split where the level changes; each run keeps its end point
+        split = levels if visible is None else np.where(visible, levels, -1)
+        starts = np.flatnonzero(np.diff(split, prepend=-2) != 0)
+        ends = np.append(starts[1:], len(levels))
+        return [(points[a:b + 1], int(levels[a]), int(thicknesses[a]))
+                for a, b in zip(starts.tolist(), ends.tolist()) if split[a] >= 0]
+    
+    def heatline_layer(self, path: PathArrays, pixel_points: np.ndarray, style: PathStyle,
+                       canvas_size: Tuple[int, int],
+                       frame: Optional[ViewportFrame] = None,
+                       visible: Optional[np.ndarray] = None) -> Optional[Layer]:
+        """Rasterize a heatline onto a transparent layer
+        
+        Runs are bucketed by level, so each (color, thickness) pair is one
+        ``cv2.polylines`` call, drawn straight into an RGBA array covering
+        only the path's bounding box. With a viewport ``frame`` only the
+        segments that reach it are drawn, at output resolution; a ``visible``
+        segment mask restricts drawing the same way on the canvas.
+        """
+        if len(path) < 2:
+            return None
+        
+        if frame is not None:
+            visible = frame.visible(pixel_points, style.width * 1.5 + 2)
+            pixel_points = frame.to_output(pixel_points)
+            canvas_size = frame.size
+        runs = self.heatline_runs(path, pixel_points, style, visible)
+        if not runs:
+            return None
+        pad = max(thickness for _, _, thickness in runs) + 1
+        img_w, img_h = canvas_size
+        points = np.concatenate([run for run, _, _ in runs])
+        x0 = max(int(points[:, 0].min()) - pad, 0)
+        y0 = max(int(points[:, 1].min()) - pad, 0)
+        x1 = min(int(points[:, 0].max()) + pad + 1, img_w)
+        y1 = min(int(points[:, 1].max()) + pad + 1, img_h)
+        if x0 >= x1 or y0 >= y1:
+            return None
         
-        # Convert to numpy array for OpenCV
-        img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+        offset = np.array([x0, y0], dtype=np.int32)
+        buckets: Dict[Tuple[int, int], List[np.ndarray]] = {}
+        for run, level, thickness in runs:
+            buckets.setdefault((thickness, level), []).append(run - offset)
         
-        for i in range(len(points) - 1):
-            p1 = (int(points[i].x), int(points[i].y))
-            p2 = (int(points[i + 1].x), int(points[i + 1].y))
-            
-            # Use speed or default to create heat effect
-            speed = points[i].speed or points[i].t or 1.0
-            
-            # Map speed to color (blue=slow, red=fast)
-            normalized_speed = min(max(speed / 10.0, 0), 1)
-            color_bgr = self._speed_to_color(normalized_speed)
-            
-            # Vary thickness based on speed
-            thickness = int(style.width * (0.5 + normalized_speed))
-            
-            cv2.line(img_cv, p1, p2, color_bgr, thickness)
+        # Thinner (slower) strokes first, as faster segments are drawn wider
+        layer = np.zeros((y1 - y0, x1 - x0, 4), dtype=np.uint8)
+        for (thickness, level), bucket in sorted(buckets.items()):
+            color = tuple(int(c) for c in self.heat_lut[level]) + (255,)
+            cv2.polylines(layer, bucket, False, color, thickness)
         
-        # Convert back to PIL
-        img_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-        return Image.fromarray(img_rgb)
+        cropped = crop_layer(Image.fromarray(layer))
+        if cropped is None:
+            return None
+        img, (x, y) = cropped
+        return img, (x + x0, y + y0)
     
-    def draw_robot_states(self, img: Image.Image, points: List[PathPoint], 
-                         pixel_points: List[Tuple[float, float]], 
+    def draw_robot_states(self, img: Image.Image, path: PathArrays, 
+                         pixel_points: np.ndarray, 
                          style: PathStyle) -> Image.Image:
-        """Draw robot state markers and labels on the path"""
-        draw = ImageDraw.Draw(img, 'RGBA')
+        """Draw robot state markers and labels on the path
         
-        for i, (point, pixel_pos) in enumerate(zip(points, pixel_points)):
-            if not point.robot_state:
-                continue
-            
-            state = point.robot_state.state.lower()
-            px, py = int(pixel_pos[0]), int(pixel_pos[1])
-            
-            # Get state color (use custom color or default)
-            if point.robot_state.color:
-                state_color = point.robot_state.color
-            else:
-                state_color = self.STATE_COLORS.get(state, '#808080')
-            
-            rgba_color = self._hex_to_rgba(state_color, 0.9)
-            
-            # Draw state marker (larger circle with border)
-            marker_size = style.state_icon_size
-            draw.ellipse(
-                [px - marker_size, py - marker_size, 
-                 px + marker_size, py + marker_size],
-                fill=rgba_color,
-                outline=(255, 255, 255, 255),
-                width=2
-            )
-            
-            # Draw icon in the center
-            icon = self.STATE_ICONS.get(state, '●')
-            # Calculate text size
-            bbox = draw.textbbox((px, py), icon, font=self.font_large)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            # Draw icon centered on the marker
-            draw.text(
-                (px - text_width // 2, py - text_height // 2),
-                icon,
-                fill=(255, 255, 255, 255),
-                font=self.font_large
-            )
-            
-            # Draw state label if enabled
-            if style.show_state_labels:
-                label_text = state.replace('_', ' ').title()
-                label_bbox = draw.textbbox((0, 0), label_text, font=self.font)
-                label_width = label_bbox[2] - label_bbox[0]
-                label_height = label_bbox[3] - label_bbox[1]
-                
-                # Position label above the marker
-                label_x = px - label_width // 2
-                label_y = py - marker_size - label_height - 5
-                
-                # Draw label background
-                padding = 3
-                draw.rectangle(
-                    [label_x - padding, label_y - padding,
-                     label_x + label_width + padding, label_y + label_height + padding],
-                    fill=(0, 0, 0, 180)
-                )
-                
-                # Draw label text
-                draw.text(
-                    (label_x, label_y),
-                    label_text,
-                    fill=(255, 255, 255, 255),
-                    font=self.font
-                )
+        Each marker is stamped from the sprite atlas, so cost per marker is
+        one composite regardless of how many states the path carries.
+        """
+        state_indices = path.state_indices()
+        if len(state_indices) == 0:
+            return img
+        
+        marker_positions = pixel_points[state_indices].astype(int).tolist()
+        
+        for i, (px, py) in zip(state_indices.tolist(), marker_positions):
+            stamp(img, self.state_sprite(path, i, style), px, py)
         
         return img
     
-    def render(self, method: str, points: List[PathPoint], style: PathStyle,
+    def state_sprite(self, path: PathArrays, i: int, style: PathStyle) -> Sprite:
+        """Marker sprite for the robot state carried by point i"""
+        state = path.state_name(i)
+        
+        # Get state color (use custom color or default)
+        custom_color = path.state_colors.get(i)
+        if custom_color:
+            rgba = self._hex_to_rgba(custom_color, 0.9)
+        else:
+            rgba = self.state_rgba.get(state) or self._hex_to_rgba('#808080', 0.9)
+        label = state.replace('_', ' ').title() if style.show_state_labels else None
+        
+        return self.sprites.get(self.STATE_ICONS.get(state, '●'), rgba, style.state_icon_size, label)
+    
+    def polyline_layer(self, points: Union[np.ndarray, List[np.ndarray]], style: PathStyle,
+                       canvas_size: Tuple[int, int]) -> Optional[Layer]:
+        """Rasterize a polyline, or disjoint runs of one, (and optional arrows) onto a transparent layer"""
+        runs = [points] if isinstance(points, np.ndarray) else points
+        rasterized = polylines_mask(runs, style.width, (canvas_size[1], canvas_size[0]), bool(style.arrow))
+        if rasterized is None:
+            return None
+        return mask_layer(rasterized[0], rasterized[1], self._hex_to_rgba(style.color, style.opacity))
+    
+    def path_layer(self, method: str, path: PathArrays, pixel_points: np.ndarray,
+                   style: PathStyle, canvas_size: Tuple[int, int],
+                   obstacles: Optional[List[Any]] = None,
+                   robot_radius: Optional[float] = None,
+                   frame: Optional[ViewportFrame] = None) -> Optional[Layer]:
+        """Cached path layer, keyed only by the inputs that change its pixels
+        
+        With a viewport ``frame`` the geometry is still computed on the full
+        canvas, then clipped to the frame and drawn at output resolution.
+        """
+        viewport = frame.key() if frame is not None else None
+        if method == "heatline":
+            key = layer_key("heatline", canvas_size=canvas_size, width=style.width, viewport=viewport,
+                            path=array_digest(pixel_points, path.speed_or_time(1.0)))
+            return layer_cache.get(key, lambda: self.heatline_layer(path, pixel_points, style,
+                                                                    canvas_size, frame))
+        if method not in ("polyline", "bezier", "spline", "astar"):
+            raise ValueError(f"Unknown rendering method: {method}")
+        
+        inputs = dict(
+            method=method, canvas_size=canvas_size, viewport=viewport, points=array_digest(pixel_points),
+            color=style.color, opacity=style.opacity, width=style.width, arrow=bool(style.arrow)
+        )
+        if method in ("bezier", "spline", "astar"):
+            inputs["curve_tolerance"] = style.curve_tolerance or settings.CURVE_TOLERANCE
+        if method == "astar":
+            inputs.update(
+                obstacles=obstacles or None,
+                robot_radius=robot_radius if robot_radius is not None else settings.ROBOT_RADIUS,
+                grid=[settings.OCCUPANCY_GRID_RESOLUTION, settings.PATHFINDING_MODE]
+            )
+        
+        def draw() -> Optional[Layer]:
+            curve = self.path_geometry(method, pixel_points, canvas_size, obstacles,
+                                       robot_radius, style.curve_tolerance)
+            if frame is not None:
+                return self.polyline_layer(frame.clip(curve, style.width * 4 + 2), style, frame.size)
+            return self.polyline_layer(curve, style, canvas_size)
+        
+        return layer_cache.get(layer_key("path", **inputs), draw)
+    
+    def state_layer(self, path: PathArrays, pixel_points: np.ndarray, style: PathStyle,
+                    canvas_size: Tuple[int, int],
+                    frame: Optional[ViewportFrame] = None) -> Optional[Layer]:
+        """Cached robot-state marker layer (in output pixels for a viewport ``frame``)"""
+        state_indices = path.state_indices()
+        if len(state_indices) == 0:
+            return None
+        if frame is not None:
+            pixel_points = frame.to_output(pixel_points)
+            canvas_size = frame.size
+        
+        positions = pixel_points[state_indices].astype(int)
+        states = [path.state_name(i) for i in state_indices.tolist()]
+        colors = [path.state_colors.get(i) for i in state_indices.tolist()]
+        key = layer_key("states", canvas_size=canvas_size, positions=positions.tolist(),
+                        states=states, colors=colors,
+                        show_state_labels=style.show_state_labels,
+                        state_icon_size=style.state_icon_size)
+        
+        def draw() -> Optional[Layer]:
+            layer = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+            return crop_layer(self.draw_robot_states(layer, path, pixel_points, style))
+        
+        return layer_cache.get(key, draw)
+    
+    def render(self, method: str, points: Union[PathArrays, List[PathPoint]], style: PathStyle,
                coordinate_system: str = "pixel", obstacles: Optional[List[Any]] = None,
                return_image: bool = True, return_overlay: bool = False,
-               canvas_size: Tuple[int, int] = (800, 800)) -> Dict[str, Any]:
+               canvas_size: Tuple[int, int] = (800, 800), image_format: str = "png",
+               image_quality: Optional[int] = None, png_compress_level: Optional[int] = None,
+               return_bytes: bool = False, output: str = "raster",
+               robot_radius: Optional[float] = None,
+               viewport: Optional[Viewport] = None) -> Dict[str, Any]:
         """Main rendering method
         
         Args:
+            points: PathPoint list or a prebuilt PathArrays
             canvas_size: Target canvas size (default 800x800 to match frontend)
+            image_format: png, webp (lossless) or jpeg
+            return_bytes: Return encoded bytes as "image_bytes" instead of base64
+            output: "raster" draws onto the map; "vector" returns an SVG overlay
+            robot_radius: A* obstacle clearance in canvas pixels (default settings.ROBOT_RADIUS)
+            viewport: Render only this region of the canvas (raster output); the
+                image and overlay points are in viewport output pixels
         """
-        
-        # Load map and resize to match frontend canvas
-        img = self.load_map()
-        img = img.resize(canvas_size, Image.Resampling.LANCZOS)
-        img_size = canvas_size
+        # Build the columnar path once; every stage below works on arrays
+        path = as_path_arrays(points)
+        
+        # Optional RDP simplification before smoothing and drawing
+        path, points_removed = self.simplify(path, style, coordinate_system, canvas_size)
+        
+        if viewport is not None and output != "raster":
+            raise ValueError("Viewport rendering requires raster output")
+        if output == "vector":
+            result = self.render_vector(method, path, style, coordinate_system, obstacles,
+                                        return_image, return_overlay, canvas_size, return_bytes,
+                                        robot_radius)
+            return self._report_simplification(result, style, points_removed)
+        if output != "raster":
+            raise ValueError(f"Unknown output mode: {output}")
         
         # Convert coordinates - points are already in pixel coordinates relative to canvas_size
-        pixel_points = self.convert_coordinates(points, coordinate_system, img_size)
+        pixel_points = self.convert_coordinates(path, coordinate_system, canvas_size)
+        frame = self.viewport_frame(viewport, coordinate_system, canvas_size) if viewport else None
         
-        # Render based on method
-        if method == "polyline":
-            img = self.render_polyline(img, pixel_points, style)
-        elif method == "bezier":
-            img = self.render_bezier(img, pixel_points, style)
-        elif method == "spline":
-            img = self.render_spline(img, pixel_points, style)
-        elif method == "astar":
-            img = self.render_astar(img, pixel_points, style, obstacles)
-        elif method == "heatline":
-            img = self.render_heatline(img, points, style)
-        else:
-            raise ValueError(f"Unknown rendering method: {method}")
+        # Path and state layers are cached separately, so a style change
+        # only re-rasterizes the layer it affects
+        layers = [
+            self.path_layer(method, path, pixel_points, style, canvas_size, obstacles, robot_radius, frame),
+            self.state_layer(path, pixel_points, style, canvas_size, frame),
+        ]
         
-        # Draw robot states on top of the path
-        img = self.draw_robot_states(img, points, pixel_points, style)
+        # Composite over a copy of the cached map, resized to match frontend canvas,
+        # or over just the map region under the viewport
+        base = self.load_canvas(canvas_size) if frame is None else self.load_viewport(frame, canvas_size)
+        img = composite(base, layers)
         
         result = {"success": True}
         
-        # Return image as base64
+        # Return encoded image as raw bytes or base64
         if return_image:
-            buffer = io.BytesIO()
-            img.save(buffer, format="PNG")
-            img_base64 = base64.b64encode(buffer.getvalue()).decode()
-            result["image_base64"] = img_base64
+            image_bytes = self.encode(img, image_format, image_quality, png_compress_level)
+            if return_bytes:
+                result["image_bytes"] = image_bytes
+            else:
+                result["image_base64"] = base64.b64encode(image_bytes).decode()
         
         # Return overlay JSON
         if return_overlay:
+            overlay_points = pixel_points if frame is None else frame.to_output(pixel_points)
             overlay = {
                 "method": method,
-                "points": [{"x": p[0], "y": p[1]} for p in pixel_points],
+                "points": [{"x": x, "y": y} for x, y in overlay_points.tolist()],
                 "style": style.dict()
             }
+            if frame is not None:
+                overlay["viewport"] = {"box": list(frame.box), "size": list(frame.size)}
             result["overlay_json"] = overlay
         
+        return self._report_simplification(result, style, points_removed)
+    
+    def render_batch(self, paths: List[Dict[str, Any]], coordinate_system: str = "pixel",
+                     obstacles: Optional[List[Any]] = None,
+                     return_image: bool = True, return_overlay: bool = False,
+                     canvas_size: Tuple[int, int] = (800, 800), image_format: str = "png",
+                     image_quality: Optional[int] = None, png_compress_level: Optional[int] = None,
+                     return_bytes: bool = False) -> Dict[str, Any]:
+        """Render several named paths onto one shared canvas with a single encode
+        
+        Args:
+            paths: dicts with name, method, points, style and optional robot_radius
+        
+        Path layers are composited in order and every path's state markers
+        go on top, so markers are never hidden by another robot's path.
+        Layers come from the same cache as single renders.
+        """
+        path_layers = []
+        state_layers = []
+        overlays = {}
+        
+        for item in paths:
+            method = item["method"]
+            style = item.get("style") or PathStyle()
+            path = as_path_arrays(item["points"])
+            path, points_removed = self.simplify(path, style, coordinate_system, canvas_size)
+            pixel_points = self.convert_coordinates(path, coordinate_system, canvas_size)
+            
+            path_layers.append(self.path_layer(method, path, pixel_points, style, canvas_size,
+                                               obstacles, item.get("robot_radius")))
+            state_layers.append(self.state_layer(path, pixel_points, style, canvas_size))
+            
+            if return_overlay:
+                overlay = {
+                    "method": method,
+                    "points": [{"x": x, "y": y} for x, y in pixel_points.tolist()],
+                    "style": style.dict()
+                }
+                if style.simplify_tolerance:
+                    overlay["points_removed"] = points_removed
+                overlays[item["name"]] = overlay
+        
+        result = {"success": True}
+        
+        if return_image:
+            img = composite(self.load_canvas(canvas_size), path_layers + state_layers)
+            image_bytes = self.encode(img, image_format, image_quality, png_compress_level)
+            if return_bytes:
+                result["image_bytes"] = image_bytes
+            else:
+                result["image_base64"] = base64.b64encode(image_bytes).decode()
+        
+        if return_overlay:
+            result["overlay_json"] = overlays
+        
         return result
     
+    def render_thumbnail(self, method: str, points: Union[PathArrays, List[PathPoint]],
+                         style: PathStyle, coordinate_system: str = "pixel",
+                         obstacles: Optional[List[Any]] = None, robot_radius: Optional[float] = None,
+                         thumbnail_size: int = 200, canvas_size: Tuple[int, int] = (800, 800),
+                         image_format: str = "webp", image_quality: Optional[int] = None) -> bytes:
+        """Render a small preview and return its encoded bytes
+        
+        Geometry and layers are computed at the full ``canvas_size`` (so
+        pixel coordinates, obstacles and stroke widths keep their meaning)
+        on a transparent overlay, which is downscaled and composited over
+        the map already resized to the thumbnail size by the map cache.
+        """
+        path = as_path_arrays(points)
+        path, _ = self.simplify(path, style, coordinate_system, canvas_size)
+        pixel_points = self.convert_coordinates(path, coordinate_system, canvas_size)
+        
+        overlay = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+        for layer in (self.path_layer(method, path, pixel_points, style, canvas_size, obstacles, robot_radius),
+                      self.state_layer(path, pixel_points, style, canvas_size)):
+            if layer is not None:
+                overlay.alpha_composite(layer[0], layer[1])
+        
+        size = (thumbnail_size, thumbnail_size)
+        img = self.load_canvas(size)
+        overlay = overlay.resize(size, Image.Resampling.BOX)
+        img.paste(overlay, (0, 0), overlay)
+        return self.encode(img, image_format, image_quality)
+    
+    def render_replay(self, method: str, points: Union[PathArrays, List[PathPoint]],
+                      style: PathStyle, coordinate_system: str = "pixel",
+                      obstacles: Optional[List[Any]] = None, robot_radius: Optional[float] = None,
+                      canvas_size: Tuple[int, int] = (800, 800), fps: Optional[float] = None,
+                      speed: float = 1.0, duration: Optional[float] = None,
+                      replay_format: str = "gif", image_quality: Optional[int] = None) -> bytes:
+        """Render the path being driven over time as an animation and return its bytes
+        
+        Args:
+            fps: Frames per second (default settings.REPLAY_FPS)
+            speed: Path seconds shown per playback second
+            duration: Seconds to spread the path over when points carry no ``t``
+                (default settings.REPLAY_DURATION)
+            replay_format: gif, webp or zip (PNG keyframe plus changed-box patches)
+        
+        Each frame updates only the box around the piece of the path reached
+        since the previous frame, rasterized from the few segments that reach
+        it, so the last frame matches a full render pixel for pixel. State
+        markers are stamped as they are reached and a head marker moves along
+        the path. Frames are encoded as they are produced. Arrows are not
+        drawn; the head shows direction.
+        """
+        fps = fps or settings.REPLAY_FPS
+        fmt = normalize_replay_format(replay_format)
+        path = as_path_arrays(points)
+        path, _ = self.simplify(path, style, coordinate_system, canvas_size)
+        if len(path) < 2:
+            raise ValueError("Replay needs at least two points")
+        pixel_points = self.convert_coordinates(path, coordinate_system, canvas_size)
+        times = point_times(path.t, duration or settings.REPLAY_DURATION)
+        shown = frame_times(times, fps, speed, settings.REPLAY_MAX_FRAMES)
+        
+        rgba = self._hex_to_rgba(style.color, style.opacity)
+        line_style = PathStyle(**{**style.dict(), "arrow": False})
+        if method == "heatline":
+            curve, curve_t = pixel_points, times
+            stroke_colors = [tuple(c) for c in self.heat_lut[::8]]
+        else:
+            curve = self.path_geometry(method, pixel_points, canvas_size, obstacles,
+                                       robot_radius, style.curve_tolerance)
+            curve_t = curve_times(curve, pixel_points, times)
+            stroke_colors = [rgba[:3]]
+        
+        state_indices = path.state_indices()
+        state_t = times[state_indices]
+        head_sprite = self.sprites.get('●', rgba[:3] + (255,), max(style.width * 2, 6))
+        
+        palette = None
+        if fmt == "gif":
+            # Palette from the finished picture, so every frame maps to it
+            preview = composite(self.load_canvas(canvas_size), [
+                self.path_layer(method, path, pixel_points, style, canvas_size, obstacles, robot_radius),
+                self.state_layer(path, pixel_points, style, canvas_size),
+            ])
+            palette = gif_palette(preview, stroke_colors + [(255, 255, 255)])
+        
+        canvas = ReplayCanvas(self.load_canvas(canvas_size))
+        pad = style.width * 4 + 2
+        
+        def path_so_far(reached: int, head: np.ndarray, box: Tuple[int, int, int, int]) -> Optional[Layer]:
+            """The path up to the head, rasterized from just the segments that reach box
+            
+            Whole segments are drawn in canvas coordinates (never clipped by
+            cv2 at a scratch border), so the pixels match a full render.
+            """
+            drawn = curve[:reached]
+            if not np.array_equal(head, drawn[-1]):
+                drawn = np.vstack((drawn, [head]))
+            visible = visible_segments(drawn, (box[0] - pad, box[1] - pad, box[2] + pad, box[3] + pad))
+            if method == "heatline":
+                n = len(drawn)
+                prefix = PathArrays(drawn[:, 0], drawn[:, 1], path.t[:n], path.speed[:n])
+                return self.heatline_layer(prefix, drawn, style, canvas_size, visible=visible)
+            runs = [drawn[a:b + 1] for a, b in segment_runs(visible)]
+            return self.polyline_layer(runs, line_style, canvas_size)
+        
+        def frames():
+            marked = 0
+            for (piece, reached, head), t in zip(replay_pieces(curve, curve_t, shown), shown.tolist()):
+                box = canvas.clip((piece[:, 0].min() - pad, piece[:, 1].min() - pad,
+                                   piece[:, 0].max() + pad, piece[:, 1].max() + pad))
+                if box is not None and len(piece) > 1 and np.ptp(piece, axis=0).any():
+                    canvas.draw_path(box, path_so_far(reached, head, box))
+                while marked < len(state_indices) and state_t[marked] <= t:
+                    i = int(state_indices[marked])
+                    marked += 1
+                    px, py = pixel_points[i].astype(int).tolist()
+                    canvas.mark(self.state_sprite(path, i, style), px, py)
+                yield canvas.frame((head_sprite, int(head[0]), int(head[1])))
+        
+        return encode_replay(frames(), fmt, fps, canvas_size, palette, image_quality)
+    
+    def analyze_interference(self, paths: List[Dict[str, Any]], coordinate_system: str = "pixel",
+                             obstacles: Optional[List[Any]] = None, robot_radius: Optional[float] = None,
+                             time_step: Optional[float] = None, return_image: bool = False,
+                             canvas_size: Tuple[int, int] = (800, 800), image_format: str = "png",
+                             image_quality: Optional[int] = None) -> Dict[str, Any]:
+        """Find when and where robots driving timed paths at the same time get too close
+        
+        Args:
+            paths: dicts with name, method, points (every point with ``t``),
+                style and optional robot_radius (canvas pixels, also the
+                astar clearance)
+            robot_radius: Radius of robots without their own
+                (default settings.INTERFERENCE_ROBOT_RADIUS)
+            time_step: Seconds between samples (default settings.INTERFERENCE_TIME_STEP)
+        
+        Each robot follows the polyline its method draws, timed by matching
+        distance along it to its timed points, and is sampled on a time
+        grid shared by all robots. Distances are in canvas pixels. With
+        ``return_image`` the paths are drawn with contested cells shaded and
+        every conflict marked at its closest approach; the image is
+        returned as bytes under "image_bytes".
+        """
+        time_step = time_step or settings.INTERFERENCE_TIME_STEP
+        default_radius = robot_radius if robot_radius is not None else settings.INTERFERENCE_ROBOT_RADIUS
+        names, curves, radii, layers = [], [], [], []
+        for item in paths:
+            method = item["method"]
+            style = item.get("style") or PathStyle()
+            path = as_path_arrays(item["points"])
+            times = path_times(path.t, item["name"])
+            pixel_points = self.convert_coordinates(path, coordinate_system, canvas_size)
+            item_radius = item.get("robot_radius")
+            if method == "heatline":
+                curve, curve_t = pixel_points, times
+            else:
+                curve = self.path_geometry(method, pixel_points, canvas_size, obstacles,
+                                           item_radius, style.curve_tolerance)
+                curve_t = curve_times(curve, pixel_points, times)
+            names.append(item["name"])
+            curves.append((curve, curve_t))
+            radii.append(item_radius if item_radius is not None else default_radius)
+            if return_image:
+                layers.append(self.path_layer(method, path, pixel_points, style, canvas_size,
+                                              obstacles, item_radius))
+        
+        grid = time_grid([(t[0], t[-1]) for _, t in curves], time_step, settings.INTERFERENCE_MAX_SAMPLES)
+        positions = np.stack([positions_at(curve, curve_t, grid) for curve, curve_t in curves])
+        pairs = interference_pairs(names, positions, np.asarray(radii, dtype=np.float64), grid,
+                                   settings.OCCUPANCY_GRID_RESOLUTION)
+        result = {"success": True, "time_step": time_step, "pairs": pairs}
+        
+        if return_image:
+            index = {name: i for i, name in enumerate(names)}
+            overlay = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(overlay)
+            for pair in pairs:
+                for cell in pair["contested_cells"]:
+                    draw.rectangle([cell["x"], cell["y"], cell["x"] + cell["w"] - 1, cell["y"] + cell["h"] - 1],
+                                   fill=self.CONFLICT_RGBA[:3] + (80,))
+            for pair in pairs:
+                a, b = index[pair["a"]], index[pair["b"]]
+                reach = (radii[a] + radii[b]) / 2
+                for conflict in pair["conflicts"]:
+                    at = np.array([conflict["time"]])
+                    (ax, ay), = positions_at(*curves[a], at).tolist()
+                    (bx, by), = positions_at(*curves[b], at).tolist()
+                    mx, my = (ax + bx) / 2, (ay + by) / 2
+                    draw.line([ax, ay, bx, by], fill=self.CONFLICT_RGBA, width=2)
+                    draw.ellipse([mx - reach, my - reach, mx + reach, my + reach],
+                                 outline=self.CONFLICT_RGBA, width=3)
+                    label = f"{conflict['time']:.1f}s"
+                    box = draw.textbbox((mx + reach + 6, my - 7), label, font=self.font)
+                    draw.rectangle([box[0] - 3, box[1] - 3, box[2] + 3, box[3] + 3], fill=(0, 0, 0, 180))
+                    draw.text((mx + reach + 6, my - 7), label, fill=(255, 255, 255, 255), font=self.font)
+            layers.append(crop_layer(overlay))
+            img = composite(self.load_canvas(canvas_size), layers)
+            result["image_bytes"] = self.encode(img, image_format, image_quality)
+        
+        return result
+    
+    def render_heatmap(self, grid: np.ndarray, opacity: float = 0.7,
+                       canvas_size: Tuple[int, int] = (800, 800), image_format: str = "png",
+                       image_quality: Optional[int] = None) -> bytes:
+        """Draw a field occupancy grid over the map and return the encoded image
+        
+        Cell values are normalized to the busiest cell with a square root, so
+        rarely visited areas stay visible, and colored with the heatline
+        colormap (blue = little time, red = most). Empty cells are left
+        transparent.
+        """
+        img = self.load_canvas(canvas_size)
+        peak = float(grid.max()) if grid.size else 0.0
+        if peak <= 0:
+            return self.encode(img, image_format, image_quality)
+        
+        # Smooth across neighbouring cells, then stretch the grid over the canvas;
+        # square cells span the field width, so the last row may overhang
+        level = np.sqrt(np.maximum(grid, 0) / peak).astype(np.float32)
+        level = cv2.GaussianBlur(level, (0, 0), 0.8)
+        cell_mm = self.field_width / grid.shape[1]
+        height = int(round(grid.shape[0] * cell_mm * canvas_size[1] / self.field_height))
+        level = cv2.resize(level, (canvas_size[0], height), interpolation=cv2.INTER_LINEAR)[:canvas_size[1]]
+        
+        index = np.clip(level * 255, 0, 255).astype(np.uint8)
+        rgba = np.zeros(level.shape + (4,), dtype=np.uint8)
+        rgba[..., :3] = self.heat_lut[index]
+        rgba[..., 3] = np.where(level > 0.02, np.clip(opacity * 255 * (0.35 + 0.65 * level), 0, 255), 0)
+        overlay = Image.fromarray(rgba, "RGBA")
+        img.paste(overlay, (0, 0), overlay)
+        return self.encode(img, image_format, image_quality)
+    
+    def _report_simplification(self, result: Dict[str, Any], style: PathStyle,
+                               points_removed: int) -> Dict[str, Any]:
+        """Record removed point count in the result and overlay when simplifying"""
+        if style.simplify_tolerance:
+            result["points_removed"] = points_removed
+            if result.get("overlay_json") is not None:
+                result["overlay_json"]["points_removed"] = points_removed
+        return result
+    
+    def render_vector(self, method: str, path: PathArrays, style: PathStyle,
+                      coordinate_system: str = "pixel", obstacles: Optional[List[Any]] = None,
+                      return_image: bool = True, return_overlay: bool = False,
+                      canvas_size: Tuple[int, int] = (800, 800),
+                      return_bytes: bool = False,
+                      robot_radius: Optional[float] = None) -> Dict[str, Any]:
+        """Render the path as a transparent SVG overlay
+        
+        Produces the same curves, arrows and state markers as the raster
+        output, but never touches the map bitmap or a PNG encoder; the
+        client composites the SVG over its cached pushback_map.png.
+        """
+        pixel_points = self.convert_coordinates(path, coordinate_system, canvas_size)
+        elements = []
+        curve = None
+        
+        if method == "heatline":
+            for run, level, thickness in self.heatline_runs(path, pixel_points, style):
+                color = tuple(int(c) for c in self.heat_lut[level]) + (255,)
+                elements.append(path_svg.polyline(run, color, thickness))
+        else:
+            curve = self.path_geometry(method, pixel_points, canvas_size, obstacles, robot_radius,
+                                       style.curve_tolerance)
+            if len(curve) >= 2:
+                color = self._hex_to_rgba(style.color, style.opacity)
+                elements.append(path_svg.polyline(curve, color, style.width))
+                if style.arrow:
+                    heads = arrow_heads(curve, style.width * 3)
+                    elements.append(path_svg.arrow_path(heads, color, style.width))
+        
+        states = []
+        state_indices = path.state_indices()
+        marker_positions = pixel_points[state_indices].astype(int).tolist()
+        for i, (px, py) in zip(state_indices.tolist(), marker_positions):
+            state = path.state_name(i)
+            state_color = path.state_colors.get(i) or self.STATE_COLORS.get(state, '#808080')
+            label_text = state.replace('_', ' ').title() if style.show_state_labels else None
+            label_size = (0, 0)
+            if label_text:
+                bbox = self.font.getbbox(label_text)
+                label_size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+            elements.append(path_svg.state_marker(
+                px, py, self._hex_to_rgba(state_color, 0.9), style.state_icon_size,
+                self.STATE_ICONS.get(state, '●'), label_text, label_size
+            ))
+            states.append({"x": px, "y": py, "state": state, "color": state_color})
+        
+        result = {"success": True}
+        
+        if return_image:
+            svg = path_svg.document(canvas_size, elements, title=method)
+            if return_bytes:
+                result["image_bytes"] = svg.encode("utf-8")
+            else:
+                result["svg"] = svg
+        
+        if return_overlay:
+            result["overlay_json"] = {
+                "method": method,
+                "canvas_size": list(canvas_size),
+                "points": [{"x": x, "y": y} for x, y in pixel_points.tolist()],
+                "curve": np.round(curve, 2).tolist() if curve is not None else None,
+                "states": states,
+                "style": style.dict()
+            }
+        
+        return result
+    
+    def encode(self, img: Image.Image, image_format: str = "png",
+               quality: Optional[int] = None, compress_level: Optional[int] = None) -> bytes:
+        """Encode a rendered image (png, webp or jpeg) to bytes"""
+        return encode_image(img, image_format, quality, compress_level)
+    
     def _hex_to_rgba(self, hex_color: str, opacity: float) -> Tuple[int, int, int, int]:
         """Convert hex color to RGBA tuple"""
         hex_color = hex_color.lstrip('#')
@@ -376,79 +938,3 @@ class PathRenderer:
             g = int(255 * (2 - normalized_speed * 2))
             r = int(255 * (normalized_speed - 0.5) * 2)
         return (b, g, r)
-    
-    def _draw_arrow(self, draw: ImageDraw.Draw, start: Tuple[float, float], 
-                   end: Tuple[float, float], color: Tuple, width: int):
-        """Draw arrow head at the end of a line"""
-        # Calculate arrow head
-        angle = np.arctan2(end[1] - start[1], end[0] - start[0])
-        arrow_length = width * 3
-        arrow_angle = np.pi / 6
-        
-        # Arrow points
-        p1 = (
-            end[0] - arrow_length * np.cos(angle - arrow_angle),
-            end[1] - arrow_length * np.sin(angle - arrow_angle)
-        )
-        p2 = (
-            end[0] - arrow_length * np.cos(angle + arrow_angle),
-            end[1] - arrow_length * np.sin(angle + arrow_angle)
-        )
-        
-        draw.line([end, p1], fill=color, width=width)
-        draw.line([end, p2], fill=color, width=width)
-    
-    def _astar_path(self, grid: np.ndarray, start: Tuple[int, int], 
-                   end: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
-        """A* pathfinding algorithm"""
-        from heapq import heappush, heappop
-        
-        rows, cols = grid.shape
-        
-        if not (0 <= start[0] < rows and 0 <= start[1] < cols):
-            return None
-        if not (0 <= end[0] < rows and 0 <= end[1] < cols):
-            return None
-        if grid[start] == 1 or grid[end] == 1:
-            return None
-        
-        # Directions: up, down, left, right, and diagonals
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-        
-        open_set = []
-        heappush(open_set, (0, start))
-        came_from = {}
-        g_score = {start: 0}
-        
-        def heuristic(a, b):
-            return abs(a[0] - b[0]) + abs(a[1] - b[1])
-        
-        while open_set:
-            current = heappop(open_set)[1]
-            
-            if current == end:
-                # Reconstruct path
-                path = []
-                while current in came_from:
-                    path.append(current)
-                    current = came_from[current]
-                path.append(start)
-                return path[::-1]
-            
-            for d in directions:
-                neighbor = (current[0] + d[0], current[1] + d[1])
-                
-                if not (0 <= neighbor[0] < rows and 0 <= neighbor[1] < cols):
-                    continue
-                if grid[neighbor] == 1:
-                    continue
-                
-                tentative_g = g_score[current] + 1
-                
-                if neighbor not in g_score or tentative_g < g_score[neighbor]:
-                    came_from[neighbor] = current
-                    g_score[neighbor] = tentative_g
-                    f_score = tentative_g + heuristic(neighbor, end)
-                    heappush(open_set, (f_score, neighbor))
-        
-        return None
@@ -0,0 +1,52 @@
+import numpy as np
+from typing import Optional
+
+
+def segment_distances(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance from each point to its segment a-b (all (N, 2) arrays)"""
+    ab = b - a
+    ap = points - a
+    length_sq = np.einsum("ij,ij->i", ab, ab)
+    t = np.divide(np.einsum("ij,ij->i", ap, ab), length_sq,
+                  out=np.zeros(len(points)), where=length_sq > 0)
+    nearest = a + np.clip(t, 0.0, 1.0)[:, None] * ab
+    return np.hypot(*(points - nearest).T)
+
+
+def rdp_mask(points: np.ndarray, tolerance: float,
+             anchors: Optional[np.ndarray] = None) -> np.ndarray:
+    """Ramer-Douglas-Peucker simplification as a keep mask
+
+    Vectorized level by level: every pass measures all points against the
+    segment between their surrounding kept points, then keeps the farthest
+    point of each segment that exceeds ``tolerance`` (pixels). Endpoints and
+    ``anchors`` (e.g. points carrying a robot state) are always kept.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[[0, n - 1]] = True
+    if anchors is not None and len(anchors):
+        keep[anchors] = True
+    if n < 3 or tolerance is None or tolerance <= 0:
+        keep[:] = True
+        return keep
+
+    positions = np.arange(n)
+    while True:
+        kept = np.flatnonzero(keep)
+        # Segment each point falls in, by the kept point at or before it
+        segment = np.minimum(np.searchsorted(kept, positions, side="right") - 1, len(kept) - 2)
+        distances = segment_distances(points, points[kept[segment]], points[kept[segment + 1]])
+        distances[keep] = 0.0
+
+        segment_max = np.maximum.reduceat(distances, kept[:-1])
+        split = (distances > tolerance) & (distances == segment_max[segment])
+        if not split.any():
+            return keep
+        # One split per segment: the first farthest point
+        candidates = np.flatnonzero(split)
+        _, first = np.unique(segment[candidates], return_index=True)
+        keep[candidates[first]] = True
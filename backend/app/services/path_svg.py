@@ -0,0 +1,75 @@
+import numpy as np
+from typing import List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+
+def _rgb_hex(rgba: Tuple[int, ...]) -> str:
+    return "#{:02X}{:02X}{:02X}".format(*rgba[:3])
+
+
+def _opacity(rgba: Tuple[int, ...]) -> str:
+    return f"{rgba[3] / 255.0:.3g}" if len(rgba) > 3 else "1"
+
+
+def format_points(points: np.ndarray) -> str:
+    """SVG points list ("x,y x,y ...") with 0.1px precision"""
+    points = np.round(np.asarray(points, dtype=np.float64), 1)
+    return " ".join(f"{x:g},{y:g}" for x, y in points.tolist())
+
+
+def polyline(points: np.ndarray, rgba: Tuple[int, int, int, int], width: float) -> str:
+    return (
+        f'<polyline points="{format_points(points)}" fill="none" '
+        f'stroke="{_rgb_hex(rgba)}" stroke-opacity="{_opacity(rgba)}" stroke-width="{width}" '
+        f'stroke-linejoin="round" stroke-linecap="round"/>'
+    )
+
+
+def arrow_path(heads: np.ndarray, rgba: Tuple[int, int, int, int], width: float) -> str:
+    """All arrow heads ((N, 3, 2) wing/tip/wing triples) as one <path>"""
+    heads = np.round(heads, 1).tolist()
+    d = "".join(f"M{a[0]:g} {a[1]:g}L{b[0]:g} {b[1]:g}L{c[0]:g} {c[1]:g}" for a, b, c in heads)
+    return (
+        f'<path d="{d}" fill="none" stroke="{_rgb_hex(rgba)}" '
+        f'stroke-opacity="{_opacity(rgba)}" stroke-width="{width}" stroke-linecap="round"/>'
+    )
+
+
+def state_marker(px: int, py: int, rgba: Tuple[int, int, int, int], marker_size: int,
+                 icon: str, label: Optional[str] = None, label_size: Tuple[int, int] = (0, 0)) -> str:
+    """Marker circle, centered icon and optional label box, mirroring the raster markers"""
+    parts = [
+        '<g class="state">',
+        f'<circle cx="{px}" cy="{py}" r="{marker_size}" fill="{_rgb_hex(rgba)}" '
+        f'fill-opacity="{_opacity(rgba)}" stroke="#FFFFFF" stroke-width="2"/>',
+        f'<text x="{px}" y="{py}" fill="#FFFFFF" font-size="20" text-anchor="middle" '
+        f'dominant-baseline="central">{escape(icon)}</text>',
+    ]
+    if label:
+        label_width, label_height = label_size
+        label_x = px - label_width // 2
+        label_y = py - marker_size - label_height - 5
+        padding = 3
+        parts.append(
+            f'<rect x="{label_x - padding}" y="{label_y - padding}" '
+            f'width="{label_width + 2 * padding}" height="{label_height + 2 * padding}" '
+            f'fill="#000000" fill-opacity="0.706"/>'
+        )
+        parts.append(
+            f'<text x="{label_x}" y="{label_y}" fill="#FFFFFF" font-size="14" '
+            f'dominant-baseline="hanging">{escape(label)}</text>'
+        )
+    parts.append('</g>')
+    return "".join(parts)
+
+
+def document(canvas_size: Tuple[int, int], elements: List[str], title: Optional[str] = None) -> str:
+    """Transparent SVG sized to the canvas, meant to sit over the field map"""
+    w, h = canvas_size
+    head = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" '
+        f'viewBox="0 0 {w} {h}">'
+    )
+    if title:
+        head += f"<title>{escape(title)}</title>"
+    return head + "".join(elements) + "</svg>"
@@ -0,0 +1,275 @@
+import math
+from heapq import heappush, heappop
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+Cell = Tuple[int, int]  # (row, col)
+
+SQRT2 = math.sqrt(2.0)
+INF = float("inf")
+
+
+def octile(dr: int, dc: int) -> float:
+    """Octile distance: exact cost of an unobstructed 8-connected move sequence"""
+    dr, dc = abs(dr), abs(dc)
+    return (dr + dc) + (SQRT2 - 2.0) * min(dr, dc)
+
+
+def path_cost(path: List[Cell]) -> float:
+    """Total octile cost of a cell path"""
+    return sum(octile(b[0] - a[0], b[1] - a[1]) for a, b in zip(path, path[1:]))
+
+
+class GridSearch:
+    """A* / Jump Point Search on an 8-connected occupancy grid
+
+    The grid is padded with a one-cell wall so neighbor lookups need no
+    bounds checks, and g-scores, parents and the closed set live in flat
+    arrays indexed by padded cell id. Diagonal moves may not cut obstacle
+    corners (both orthogonal neighbors must be free), so the octile
+    heuristic is admissible and consistent and results are optimal.
+    """
+
+    def __init__(self, grid: np.ndarray):
+        grid = np.asarray(grid)
+        self.rows, self.cols = grid.shape
+        self.width = self.cols + 2
+        padded = np.zeros((self.rows + 2, self.width), dtype=np.uint8)
+        padded[1:-1, 1:-1] = (grid == 0)
+        self.free = bytearray(padded.tobytes())
+        self.size = len(self.free)
+
+        w = self.width
+        # (offset, cost, orthogonal offsets that must be free for diagonals)
+        self.moves = [
+            (-w, 1.0, None), (w, 1.0, None), (-1, 1.0, None), (1, 1.0, None),
+            (-w - 1, SQRT2, (-w, -1)), (-w + 1, SQRT2, (-w, 1)),
+            (w - 1, SQRT2, (w, -1)), (w + 1, SQRT2, (w, 1)),
+        ]
+
+    def _id(self, cell: Cell) -> int:
+        return (cell[0] + 1) * self.width + (cell[1] + 1)
+
+    def _cell(self, idx: int) -> Cell:
+        r, c = divmod(idx, self.width)
+        return (r - 1, c - 1)
+
+    def is_free(self, cell: Cell) -> bool:
+        return (0 <= cell[0] < self.rows and 0 <= cell[1] < self.cols
+                and bool(self.free[self._id(cell)]))
+
+    def find_path(self, start: Cell, goal: Cell, jump_points: bool = False) -> Optional[List[Cell]]:
+        """Shortest cell path from start to goal (inclusive), or None"""
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        if not (self.is_free(start) and self.is_free(goal)):
+            return None
+        if start == goal:
+            return [start]
+
+        if jump_points:
+            return self._jps(start, goal)
+        return self._astar(start, goal)
+
+    def _heuristic_table(self, goal: Cell) -> List[float]:
+        """Octile distance to goal for every padded cell, computed in one NumPy pass"""
+        rows = np.abs(np.arange(self.rows + 2) - (goal[0] + 1))[:, None]
+        cols = np.abs(np.arange(self.width) - (goal[1] + 1))[None, :]
+        table = (rows + cols) + (SQRT2 - 2.0) * np.minimum(rows, cols)
+        return table.ravel().tolist()
+
+    def _astar(self, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+        free = self.free
+        moves = self.moves
+        g = [INF] * self.size
+        parent = [-1] * self.size
+        closed = bytearray(self.size)
+        heuristic = self._heuristic_table(goal)
+
+        start_id, goal_id = self._id(start), self._id(goal)
+        g[start_id] = 0.0
+        h0 = heuristic[start_id]
+        open_heap = [(h0, h0, start_id)]
+
+        while open_heap:
+            _, _, current = heappop(open_heap)
+            if closed[current]:
+                continue
+            if current == goal_id:
+                return self._reconstruct(parent, goal_id)
+            closed[current] = 1
+            g_current = g[current]
+
+            for offset, cost, corner in moves:
+                neighbor = current + offset
+                if not free[neighbor] or closed[neighbor]:
+                    continue
+                if corner is not None and not (free[current + corner[0]] and free[current + corner[1]]):
+                    continue
+                tentative = g_current + cost
+                if tentative < g[neighbor]:
+                    g[neighbor] = tentative
+                    parent[neighbor] = current
+                    h = heuristic[neighbor]
+                    # Ties on f prefer the node closer to the goal
+                    heappush(open_heap, (tentative + h, h, neighbor))
+
+        return None
+
+    def _reconstruct(self, parent: List[int], goal_id: int) -> List[Cell]:
+        path = []
+        current = goal_id
+        while current != -1:
+            path.append(self._cell(current))
+            current = parent[current]
+        return path[::-1]
+
+    # Jump Point Search (diagonal moves only when both orthogonals are free)
+
+    def _jump_straight(self, idx: int, step: int, side: int, goal_id: int) -> int:
+        """Scan straight from idx; ``side`` is the perpendicular offset"""
+        free = self.free
+        while True:
+            if not free[idx]:
+                return -1
+            if idx == goal_id:
+                return idx
+            # Forced neighbor: a side cell opens up past an obstacle behind us
+            if ((free[idx - side] and not free[idx - side - step])
+                    or (free[idx + side] and not free[idx + side - step])):
+                return idx
+            idx += step
+
+    def _jump_diagonal(self, idx: int, vstep: int, hstep: int, goal_id: int) -> int:
+        """Scan diagonally from idx, stopping where a straight scan finds a jump point"""
+        free = self.free
+        width = self.width
+        while True:
+            if not free[idx]:
+                return -1
+            if idx == goal_id:
+                return idx
+            if (self._jump_straight(idx + vstep, vstep, 1, goal_id) >= 0
+                    or self._jump_straight(idx + hstep, hstep, width, goal_id) >= 0):
+                return idx
+            if not (free[idx + vstep] and free[idx + hstep]):
+                return -1
+            idx += vstep + hstep
+
+    def _jps_directions(self, idx: int, parent_idx: int) -> List[Tuple[int, int]]:
+        """Pruned (vstep, hstep) search directions from idx reached from parent_idx"""
+        free = self.free
+        w = self.width
+        if parent_idx < 0:
+            dirs = [(v, 0) for v in (-w, w) if free[idx + v]]
+            dirs += [(0, h) for h in (-1, 1) if free[idx + h]]
+            dirs += [(v, h) for v in (-w, w) for h in (-1, 1)
+                     if free[idx + v] and free[idx + h] and free[idx + v + h]]
+            return dirs
+
+        r, c = divmod(idx, w)
+        pr, pc = divmod(parent_idx, w)
+        v = ((r > pr) - (r < pr)) * w
+        h = (c > pc) - (c < pc)
+        dirs = []
+        if v and h:
+            if free[idx + v]:
+                dirs.append((v, 0))
+            if free[idx + h]:
+                dirs.append((0, h))
+            if free[idx + v] and free[idx + h]:
+                dirs.append((v, h))
+        elif h:
+            ahead, up, down = free[idx + h], free[idx - w], free[idx + w]
+            if ahead:
+                dirs.append((0, h))
+                if up:
+                    dirs.append((-w, h))
+                if down:
+                    dirs.append((w, h))
+            if up:
+                dirs.append((-w, 0))
+            if down:
+                dirs.append((w, 0))
+        else:
+            ahead, left, right = free[idx + v], free[idx - 1], free[idx + 1]
+            if ahead:
+                dirs.append((v, 0))
+                if left:
+                    dirs.append((v, -1))
+                if right:
+                    dirs.append((v, 1))
+            if left:
+                dirs.append((0, -1))
+            if right:
+                dirs.append((0, 1))
+        return dirs
+
+    def _jps(self, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+        width = self.width
+        start_id, goal_id = self._id(start), self._id(goal)
+        goal_r, goal_c = divmod(goal_id, width)
+        g = {start_id: 0.0}
+        parent = {start_id: -1}
+        closed = bytearray(self.size)
+
+        h0 = octile(start[0] - goal[0], start[1] - goal[1])
+        open_heap = [(h0, h0, start_id)]
+
+        while open_heap:
+            _, _, current = heappop(open_heap)
+            if closed[current]:
+                continue
+            if current == goal_id:
+                return self._expand_jump_path(parent, goal_id)
+            closed[current] = 1
+
+            r, c = divmod(current, width)
+            g_current = g[current]
+            for vstep, hstep in self._jps_directions(current, parent[current]):
+                if vstep and hstep:
+                    jump = self._jump_diagonal(current + vstep + hstep, vstep, hstep, goal_id)
+                elif vstep:
+                    jump = self._jump_straight(current + vstep, vstep, 1, goal_id)
+                else:
+                    jump = self._jump_straight(current + hstep, hstep, width, goal_id)
+                if jump < 0 or closed[jump]:
+                    continue
+                jr, jc = divmod(jump, width)
+                tentative = g_current + octile(jr - r, jc - c)
+                if tentative < g.get(jump, INF):
+                    g[jump] = tentative
+                    parent[jump] = current
+                    h = octile(jr - goal_r, jc - goal_c)
+                    heappush(open_heap, (tentative + h, h, jump))
+
+        return None
+
+    def _expand_jump_path(self, parent, goal_id: int) -> List[Cell]:
+        """Turn jump points into a contiguous cell path"""
+        jumps = []
+        node = goal_id
+        while node != -1:
+            jumps.append(self._cell(node))
+            node = parent[node]
+        jumps.reverse()
+
+        path = [jumps[0]]
+        for (r0, c0), (r1, c1) in zip(jumps, jumps[1:]):
+            dr = (r1 > r0) - (r1 < r0)
+            dc = (c1 > c0) - (c1 < c0)
+            r, c = r0, c0
+            # Consecutive jump points are joined by a pure straight or diagonal run
+            while (r, c) != (r1, c1):
+                r += dr if r != r1 else 0
+                c += dc if c != c1 else 0
+                path.append((r, c))
+        return path
+
+
+def find_path(grid: np.ndarray, start: Cell, goal: Cell,
+              jump_points: bool = False) -> Optional[List[Cell]]:
+    """Shortest 8-connected path on an occupancy grid (non-zero = blocked)"""
+    return GridSearch(grid).find_path(start, goal, jump_points=jump_points)
@@ -0,0 +1,277 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.map_cache import MapCache, resolve_map_path
+from app.services.path_arrays import PathArrays
+
+
+# Bump when renderer output changes so stale cached images are not served
+RENDER_CACHE_VERSION = 1
+
+
+def _path_digest(path: PathArrays) -> str:
+    """Digest of a PathArrays' columns (binary uploads skip PathPoint models)"""
+    digest = hashlib.sha256()
+    for column in (path.x, path.y, path.t, path.speed, path.state):
+        digest.update(column.tobytes())
+    digest.update(json.dumps([path.state_names, sorted(path.state_colors.items())]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def map_cache_key(map_filename: Optional[str], canvas_size=(800, 800)) -> tuple:
+    """MapCache key of the map file the renderer will actually load"""
+    map_path = map_filename or settings.MAP_IMAGE_PATH
+    return MapCache.make_key(resolve_map_path(map_path) or map_path, canvas_size)
+
+
+def render_cache_key(request: Any, canvas_size=(800, 800), path: Optional[PathArrays] = None,
+                     **extra: Any) -> str:
+    """Content address of a normalized PathRenderRequest
+
+    Covers everything that affects the rendered pixels: method, points,
+    style, coordinate system, obstacles, robot radius, viewport and the map
+    file (path + mtime).
+    ``path`` replaces ``request.points`` for binary uploads.
+    """
+    map_key = map_cache_key(request.map_filename, canvas_size)
+    style = request.style.dict() if request.style is not None else None
+    payload = {
+        "v": RENDER_CACHE_VERSION,
+        "method": request.method.lower(),
+        "points": (_path_digest(path) if path is not None
+                   else [p.dict(exclude_none=True) for p in request.points]),
+        "style": style,
+        "coordinate_system": request.coordinate_system,
+        "obstacles": request.obstacles or None,
+        "robot_radius": getattr(request, "robot_radius", None),
+        "viewport": request.viewport.dict() if getattr(request, "viewport", None) else None,
+        "map": [map_key[0], map_key[1]],
+        "canvas_size": list(map_key[2]),
+        "extra": extra,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def batch_render_cache_key(request: Any, canvas_size=(800, 800), **extra: Any) -> str:
+    """Content address of a PathBatchRenderRequest (every path, in order, plus the map)"""
+    map_key = map_cache_key(request.map_filename, canvas_size)
+    payload = {
+        "v": RENDER_CACHE_VERSION,
+        "batch": [
+            {
+                "name": item.name,
+                "method": item.method.lower(),
+                "points": [p.dict(exclude_none=True) for p in item.points],
+                "style": item.style.dict() if item.style is not None else None,
+                "robot_radius": item.robot_radius,
+            }
+            for item in request.paths
+        ],
+        "coordinate_system": request.coordinate_system,
+        "obstacles": request.obstacles or None,
+        "map": [map_key[0], map_key[1]],
+        "canvas_size": list(map_key[2]),
+        "extra": extra,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def heatmap_cache_key(map_filename: Optional[str], scope: Dict[str, Any], version: str,
+                      canvas_size=(800, 800), **extra: Any) -> str:
+    """Content address of a field heatmap: its scope, accumulated grid version and the map"""
+    map_key = map_cache_key(map_filename, canvas_size)
+    payload = {
+        "v": RENDER_CACHE_VERSION,
+        "heatmap": scope,
+        "version": version,
+        "map": [map_key[0], map_key[1]],
+        "canvas_size": list(map_key[2]),
+        "extra": extra,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def make_etag(key: str) -> str:
+    """Strong ETag for a cache key"""
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class RenderCache:
+    """Two-tier cache of rendered paths keyed by render_cache_key
+
+    The memory tier is an LRU bounded by the bytes of its images and
+    overlays plus a fixed cost per entry, so image-less entries still count
+    towards the bound; the disk tier keeps
+    entries across restarts and is pruned to a maximum number of entries.
+    Entries are dicts with ``image`` (encoded bytes) and ``overlay_json``.
+    """
+
+    PRUNE_EVERY = 64
+    # Memory charged per entry on top of its image and overlay (key, dicts)
+    ENTRY_BYTES = 256
+
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_bytes: Optional[int] = None,
+                 max_disk_entries: Optional[int] = None):
+        self.cache_dir = cache_dir if cache_dir is not None else settings.RENDER_CACHE_DIR
+        self.max_memory_bytes = (max_memory_bytes if max_memory_bytes is not None
+                                 else settings.RENDER_CACHE_MEMORY_BYTES)
+        self.max_disk_entries = (max_disk_entries if max_disk_entries is not None
+                                 else settings.RENDER_CACHE_DISK_ENTRIES)
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._memory_sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._put_memory(key, entry)
+            with self._lock:
+                self.disk_hits += 1
+            return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, image: Optional[bytes], overlay_json: Any = None):
+        entry = {"image": image, "overlay_json": overlay_json}
+        self._put_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def _entry_bytes(self, entry: Dict[str, Any]) -> int:
+        overlay = entry.get("overlay_json")
+        overlay_bytes = len(json.dumps(overlay, default=str)) if overlay is not None else 0
+        return len(entry.get("image") or b"") + overlay_bytes + self.ENTRY_BYTES
+
+    def _put_memory(self, key: str, entry: Dict[str, Any]):
+        nbytes = self._entry_bytes(entry)
+        with self._lock:
+            if self._memory.pop(key, None) is not None:
+                self._memory_bytes -= self._memory_sizes.pop(key)
+            if nbytes > self.max_memory_bytes:
+                return
+            self._memory[key] = entry
+            self._memory_sizes[key] = nbytes
+            self._memory_bytes += nbytes
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                evicted_key, _ = self._memory.popitem(last=False)
+                self._memory_bytes -= self._memory_sizes.pop(evicted_key)
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + ".img", base + ".json"
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        image_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            image = None
+            if meta.get("has_image"):
+                with open(image_path, "rb") as f:
+                    image = f.read()
+            return {"image": image, "overlay_json": meta.get("overlay_json")}
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        if not self.cache_dir:
+            return
+        image_path, meta_path = self._paths(key)
+        try:
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            if entry["image"] is not None:
+                self._atomic_write(image_path, entry["image"])
+            meta = {"has_image": entry["image"] is not None, "overlay_json": entry["overlay_json"]}
+            # Metadata is written last so readers never see a half-written entry
+            self._atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError as e:
+            print(f"⚠️  渲染缓存写入失败: {e}")
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            should_prune = self._disk_writes % self.PRUNE_EVERY == 0
+        if should_prune:
+            self._prune_disk()
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _prune_disk(self):
+        """Drop the oldest disk entries beyond max_disk_entries"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        continue
+        if len(entries) <= self.max_disk_entries:
+            return
+        entries.sort()
+        for _, meta_path in entries[:len(entries) - self.max_disk_entries]:
+            for path in (meta_path, meta_path[:-len(".json")] + ".img"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_sizes.clear()
+            self._memory_bytes = 0
+
+
+# Global cache instance
+render_cache = RenderCache()
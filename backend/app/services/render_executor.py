@@ -0,0 +1,147 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue has no free slots"""
+    pass
+
+
+def _warm_worker():
+    """Process pool initializer: warm this worker's renderer registry"""
+    from app.services.renderer_registry import renderer_registry
+
+    renderer_registry.warmup()
+
+
+def render_job(map_filename: Optional[str], render_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Run PathRenderer.render inside a worker"""
+    from app.services.renderer_registry import get_renderer
+
+    return get_renderer(map_filename).render(**render_kwargs)
+
+
+def render_thumbnail_job(map_filename: Optional[str], render_kwargs: Dict[str, Any]) -> bytes:
+    """Run PathRenderer.render_thumbnail inside a worker"""
+    from app.services.renderer_registry import get_renderer
+
+    return get_renderer(map_filename).render_thumbnail(**render_kwargs)
+
+
+def render_batch_job(map_filename: Optional[str], render_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Run PathRenderer.render_batch inside a worker"""
+    from app.services.renderer_registry import get_renderer
+
+    return get_renderer(map_filename).render_batch(**render_kwargs)
+
+
+def render_replay_job(map_filename: Optional[str], render_kwargs: Dict[str, Any]) -> bytes:
+    """Run PathRenderer.render_replay inside a worker"""
+    from app.services.renderer_registry import get_renderer
+
+    return get_renderer(map_filename).render_replay(**render_kwargs)
+
+
+def render_heatmap_job(map_filename: Optional[str], render_kwargs: Dict[str, Any]) -> bytes:
+    """Run PathRenderer.render_heatmap inside a worker"""
+    from app.services.renderer_registry import get_renderer
+
+    return get_renderer(map_filename).render_heatmap(**render_kwargs)
+
+
+def interference_job(map_filename: Optional[str], render_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Run PathRenderer.analyze_interference inside a worker"""
+    from app.services.renderer_registry import get_renderer
+
+    return get_renderer(map_filename).analyze_interference(**render_kwargs)
+
+
+class RenderExecutor:
+    """Bounded worker pool for CPU-bound path rendering
+
+    Keeps PIL/scipy/cv2 work off the event loop. ``mode`` selects a thread
+    pool (cheap, shares the map cache) or a process pool with pre-warmed
+    renderers (scales with cores). At most ``max_workers + max_queue`` jobs
+    are accepted at once; further submissions raise RenderQueueFull.
+    """
+
+    def __init__(self, mode: Optional[str] = None, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None):
+        self.mode = (mode or settings.RENDER_EXECUTOR).lower()
+        if self.mode not in ("thread", "process"):
+            raise ValueError(f"Unknown render executor mode: {self.mode}")
+        self.max_workers = max_workers or settings.RENDER_WORKERS or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else settings.RENDER_QUEUE_SIZE
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_warm_worker
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="render"
+                )
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs accepted but still waiting for a free worker"""
+        return max(0, self._in_flight - self.max_workers)
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise RenderQueueFull(
+                    f"Render queue is full ({self.max_queue} jobs waiting)"
+                )
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on the pool without blocking the event loop"""
+        self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": self.queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global executor instance (pool is created lazily on first render)
+render_executor = RenderExecutor()
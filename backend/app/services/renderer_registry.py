@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.map_cache import resolve_map_path
+from app.services.path_renderer import PathRenderer
+from app.services.occupancy import occupancy_cache
+
+
+class RendererRegistry:
+    """One warm PathRenderer per map for the current process
+
+    Renderers hold fonts, the sprite atlas and resolved color tables, so
+    they are built once and shared by every request (and every thread of
+    the render pool) instead of being constructed per request. Map names
+    come from requests, so renderers are keyed by the map file they
+    actually load (a missing file shares the fallback map's renderer) and
+    at most ``max_entries`` are kept, least recently used first out.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.RENDERER_REGISTRY_SIZE
+        self._renderers: "OrderedDict[Optional[str], PathRenderer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, map_filename: Optional[str] = None) -> PathRenderer:
+        """Get the renderer for a map, creating it on first use"""
+        map_path = resolve_map_path(map_filename or settings.MAP_IMAGE_PATH)
+        with self._lock:
+            renderer = self._renderers.get(map_path)
+            if renderer is None:
+                renderer = self._renderers[map_path] = PathRenderer(map_path or map_filename)
+            self._renderers.move_to_end(map_path)
+            while len(self._renderers) > self.max_entries:
+                self._renderers.popitem(last=False)
+        return renderer
+
+    def warmup(self, map_filenames: Iterable[Optional[str]] = (None,),
+               canvas_sizes: Iterable[Tuple[int, int]] = ((800, 800),),
+               obstacle_sets: Iterable[List[Any]] = (), tiles: bool = False) -> Dict[str, Any]:
+        """Resolve fonts, map canvases, state sprites and occupancy grids ahead of traffic
+        
+        With ``tiles`` the map tile pyramid is built on disk as well (a no-op
+        once it exists for the current map file).
+        """
+        canvas_sizes = list(canvas_sizes)
+        for map_filename in map_filenames:
+            renderer = self.get(map_filename)
+            for canvas_size in canvas_sizes:
+                renderer.load_canvas(canvas_size)
+            renderer.warm_sprites()
+            if tiles:
+                renderer.tile_pyramid().build()
+        for obstacles in obstacle_sets:
+            for canvas_size in canvas_sizes:
+                occupancy_cache.get(obstacles, canvas_size, settings.OCCUPANCY_GRID_RESOLUTION)
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "maps": [name or "default" for name in self._renderers],
+                "sprites": sum(len(r.sprites) for r in self._renderers.values()),
+                "occupancy_grids": occupancy_cache.stats()["entries"],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._renderers.clear()
+
+
+# Global registry for this process
+renderer_registry = RendererRegistry()
+
+
+def get_renderer(map_filename: Optional[str] = None) -> PathRenderer:
+    """Get the warm PathRenderer for a map"""
+    return renderer_registry.get(map_filename)
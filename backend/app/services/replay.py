@@ -0,0 +1,357 @@
+import io
+import json
+import zipfile
+import numpy as np
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from PIL import Image, GifImagePlugin
+
+from app.core.config import settings
+from app.services.layers import Layer
+from app.services.state_sprites import Sprite, stamp
+
+
+REPLAY_MEDIA_TYPES = {
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "zip": "application/zip",  # PNG keyframe plus changed-box patches
+}
+
+# The last frame is held this long before an animation loops
+END_HOLD_SECONDS = 1.0
+
+Box = Tuple[int, int, int, int]
+
+
+def normalize_replay_format(replay_format: Optional[str]) -> str:
+    """Canonical replay output format (gif, webp or zip)"""
+    fmt = (replay_format or "gif").lower()
+    if fmt not in REPLAY_MEDIA_TYPES:
+        raise ValueError(f"Unsupported replay format: {replay_format}")
+    return fmt
+
+
+def point_times(t: np.ndarray, duration: float) -> np.ndarray:
+    """Timestamps of path points in seconds
+
+    Uses ``t`` when every point has one and they never decrease; otherwise
+    the points are spread evenly over ``duration``.
+    """
+    n = len(t)
+    if n and not np.isnan(t).any() and (n == 1 or (np.diff(t) >= 0).all()):
+        return t - t[0]
+    return np.linspace(0.0, duration, n) if n > 1 else np.zeros(n)
+
+
+def curve_times(curve: np.ndarray, points: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Timestamps for a smoothed or routed curve through timed points
+
+    Distance along the curve is matched, proportionally, to distance along
+    the input polyline, whose points carry the times.
+    """
+    def arc_length(p: np.ndarray) -> np.ndarray:
+        return np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(p, axis=0).T))))
+
+    along_points = arc_length(points)
+    along_curve = arc_length(curve)
+    if along_curve[-1] <= 0 or along_points[-1] <= 0:
+        return np.linspace(times[0], times[-1], len(curve))
+    return np.interp(along_curve * (along_points[-1] / along_curve[-1]), along_points, times)
+
+
+def frame_times(times: np.ndarray, fps: float, speed: float, max_frames: int) -> np.ndarray:
+    """Path time shown by each frame, ``speed`` path seconds per playback second"""
+    end = float(times[-1]) if len(times) else 0.0
+    count = int(np.ceil(end * fps / speed)) + 1
+    if count > max_frames:
+        raise ValueError(f"Replay needs {count} frames (max {max_frames}); lower fps or raise speed")
+    return np.minimum(np.arange(count) * speed / fps, end)
+
+
+def _union(a: Optional[Box], b: Optional[Box]) -> Optional[Box]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+class ReplayCanvas:
+    """Map, path-so-far and markers of a replay, updated one box at a time
+
+    The path and the reached state markers are kept as full-canvas RGBA
+    layers. Each frame replaces the path pixels inside the new piece's
+    bounding box and re-composites only that box, so a frame costs what its
+    new segment covers rather than the whole path. ``frame()`` reports the
+    box that changed since the previous frame.
+    """
+
+    def __init__(self, base: Image.Image):
+        self.base = base.convert("RGB")
+        self.trail = self.base.copy()
+        self.path = Image.new("RGBA", self.base.size, (0, 0, 0, 0))
+        self.markers = Image.new("RGBA", self.base.size, (0, 0, 0, 0))
+        self.dirty: Optional[Box] = None
+        self._head_box: Optional[Box] = None
+
+    def clip(self, box: Tuple[float, float, float, float]) -> Optional[Box]:
+        """Integer box covering ``box``, clipped to the canvas; None when off-canvas"""
+        w, h = self.base.size
+        x0, y0 = max(int(np.floor(box[0])), 0), max(int(np.floor(box[1])), 0)
+        x1, y1 = min(int(np.ceil(box[2])) + 1, w), min(int(np.ceil(box[3])) + 1, h)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        return x0, y0, x1, y1
+
+    def _refresh(self, box: Optional[Box]):
+        """Re-composite map, path and markers inside box onto the trail"""
+        if box is None:
+            return
+        region = self.base.crop(box)
+        for layer in (self.path.crop(box), self.markers.crop(box)):
+            region.paste(layer, (0, 0), layer)
+        self.trail.paste(region, box[:2])
+        self.dirty = _union(self.dirty, box)
+
+    def draw_path(self, box: Box, layer: Optional[Layer]):
+        """Replace the path pixels inside box with a layer rasterized around it"""
+        patch = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), (0, 0, 0, 0))
+        if layer is not None:
+            img, (x, y) = layer
+            patch.paste(img, (x - box[0], y - box[1]))
+        self.path.paste(patch, box[:2])
+        self._refresh(box)
+
+    def _sprite_box(self, sprite: Sprite, x: int, y: int) -> Optional[Box]:
+        img, (ax, ay) = sprite
+        return self.clip((x - ax, y - ay, x - ax + img.width - 1, y - ay + img.height - 1))
+
+    def mark(self, sprite: Sprite, x: int, y: int):
+        """Add a permanent marker (e.g. a reached robot state)"""
+        stamp(self.markers, sprite, x, y)
+        self._refresh(self._sprite_box(sprite, x, y))
+
+    def frame(self, head: Optional[Tuple[Sprite, int, int]] = None) -> Tuple[Image.Image, Optional[Box]]:
+        """Current frame, with an optional moving head marker, and the box changed since the last one"""
+        img = self.trail
+        head_box = None
+        if head is not None:
+            sprite, x, y = head
+            img = self.trail.copy()
+            stamp(img, sprite, x, y)
+            head_box = self._sprite_box(sprite, x, y)
+        dirty = self.dirty
+        if head_box != self._head_box:
+            dirty = _union(_union(dirty, head_box), self._head_box)
+        self._head_box = head_box
+        self.dirty = None
+        return img, dirty
+
+
+class GifStream:
+    """Animated GIF written frame by frame
+
+    One global palette is fixed up front, so each frame after the first
+    is just the quantized changed box. Frames that change nothing extend
+    the previous frame's delay instead of adding a frame.
+    """
+
+    def __init__(self, fp, palette: Image.Image, fps: float):
+        self.fp = fp
+        self.palette = palette
+        self.fps = fps
+        self._pending: Optional[Tuple[Image.Image, Tuple[int, int], int]] = None
+        self._count = 0
+
+    def _quantize(self, img: Image.Image) -> Image.Image:
+        return img.quantize(palette=self.palette, dither=Image.Dither.NONE)
+
+    def _centiseconds(self, index: float) -> int:
+        return int(round(index * 100.0 / self.fps))
+
+    def _flush(self, end: float):
+        if self._pending is None:
+            return
+        img, offset, start = self._pending
+        delay = max(self._centiseconds(end) - self._centiseconds(start), 2)
+        for chunk in GifImagePlugin.getdata(img, offset, duration=delay * 10, disposal=1):
+            self.fp.write(chunk)
+        self._pending = None
+
+    def add(self, frame: Image.Image, dirty: Optional[Box]):
+        index = self._count
+        self._count += 1
+        if index == 0:
+            first = self._quantize(frame)
+            header, _ = GifImagePlugin.getheader(first, None, {"loop": 0, "optimize": False})
+            for chunk in header:
+                self.fp.write(chunk)
+            self._pending = (first, (0, 0), index)
+            return
+        if dirty is None:
+            return
+        self._flush(index)
+        self._pending = (self._quantize(frame.crop(dirty)), dirty[:2], index)
+
+    def close(self):
+        self._flush(self._count + END_HOLD_SECONDS * self.fps)
+        self.fp.write(b";")
+
+
+class WebPStream:
+    """Animated WebP fed to libwebp's animation encoder one frame at a time
+
+    Pillow's ``save_all`` collects every frame before encoding, so the
+    encoder it wraps is driven directly; only compressed output is kept.
+    That encoder is private to Pillow, so when it is missing or its
+    signature differs, changed frames are kept and written through the
+    public ``save_all`` path instead.
+    """
+
+    def __init__(self, fp, size: Tuple[int, int], fps: float, quality: Optional[int] = None):
+        self.fp = fp
+        self.fps = fps
+        self.quality = quality if quality is not None else 80
+        self._count = 0
+        self._encoder = self._native_encoder(size)
+        self._frames: List[Tuple[Image.Image, int]] = []  # (frame, timestamp) without the encoder
+
+    @staticmethod
+    def _native_encoder(size: Tuple[int, int]):
+        try:
+            from PIL import _webp
+
+            # White opaque background, loop forever, keyframe spacing as in gif2webp
+            return _webp.WebPAnimEncoder(size, 0xFFFFFFFF, 0, False, 3, 5, False, False)
+        except (ImportError, AttributeError, TypeError):
+            return None
+
+    def _timestamp(self, index: float) -> int:
+        return int(round(index * 1000.0 / self.fps))
+
+    def add(self, frame: Image.Image, dirty: Optional[Box]):
+        index = self._count
+        self._count += 1
+        if index and dirty is None:
+            return
+        if self._encoder is not None:
+            try:
+                self._encoder.add(frame.getim(), self._timestamp(index), False, self.quality, 100, 0)
+                return
+            except (AttributeError, TypeError):
+                if index:
+                    raise
+                self._encoder = None
+        self._frames.append((frame.copy(), self._timestamp(index)))
+
+    def close(self):
+        end = self._timestamp(self._count + END_HOLD_SECONDS * self.fps)
+        if self._encoder is None:
+            self._save_frames(end)
+            return
+        self._encoder.add(None, end, False, self.quality, 100, 0)
+        data = self._encoder.assemble("", "", "")
+        if data is None:
+            raise OSError("WebP animation encoder returned no data")
+        self.fp.write(data)
+
+    def _save_frames(self, end: int):
+        images = [img for img, _ in self._frames]
+        starts = [timestamp for _, timestamp in self._frames] + [end]
+        images[0].save(self.fp, format="WEBP", save_all=True, append_images=images[1:],
+                       duration=[b - a for a, b in zip(starts, starts[1:])], loop=0,
+                       quality=self.quality, background=(255, 255, 255, 255))
+
+
+class FrameZipStream:
+    """Frame sequence as a zip: the first frame, then PNG patches of what changed
+
+    ``replay.json`` lists every frame with its patch file and offset (no
+    file when nothing changed), so a player draws each patch over the
+    previous frame. Patches cover a few segments instead of the whole map,
+    which keeps the sequence small and fast to write.
+    """
+
+    def __init__(self, fp, fps: float):
+        self.archive = zipfile.ZipFile(fp, "w", zipfile.ZIP_STORED)
+        self.fps = fps
+        self.size: Optional[Tuple[int, int]] = None
+        self.frames: List[dict] = []
+
+    def add(self, frame: Image.Image, dirty: Optional[Box]):
+        index = len(self.frames)
+        entry = {"t": round(index / self.fps, 4)}
+        if index == 0:
+            self.size = frame.size
+            dirty = (0, 0) + frame.size
+        if dirty is not None:
+            buffer = io.BytesIO()
+            frame.crop(dirty).save(buffer, format="PNG", compress_level=settings.PNG_COMPRESS_LEVEL)
+            entry.update(file=f"frame_{index:05d}.png", x=dirty[0], y=dirty[1])
+            self.archive.writestr(entry["file"], buffer.getvalue())
+        self.frames.append(entry)
+
+    def close(self):
+        width, height = self.size or (0, 0)
+        meta = {"fps": self.fps, "width": width, "height": height, "frames": self.frames}
+        self.archive.writestr("replay.json", json.dumps(meta))
+        self.archive.close()
+
+
+def encode_replay(frames: Iterable[Tuple[Image.Image, Optional[Box]]], replay_format: str,
+                  fps: float, size: Tuple[int, int], palette: Optional[Image.Image] = None,
+                  quality: Optional[int] = None) -> bytes:
+    """Encode (frame, changed box) pairs as they are produced
+
+    Frames are consumed one at a time, so memory holds the current frame
+    and the compressed output, never the whole sequence.
+    """
+    fmt = normalize_replay_format(replay_format)
+    buffer = io.BytesIO()
+    if fmt == "gif":
+        stream = GifStream(buffer, palette, fps)
+    elif fmt == "webp":
+        stream = WebPStream(buffer, size, fps, quality)
+    else:
+        stream = FrameZipStream(buffer, fps)
+    for frame, dirty in frames:
+        stream.add(frame, dirty)
+    stream.close()
+    return buffer.getvalue()
+
+
+def gif_palette(preview: Image.Image, colors: Sequence[Tuple[int, int, int]] = ()) -> Image.Image:
+    """256-color palette from a preview of the finished replay plus exact stroke colors"""
+    colors = list(dict.fromkeys(tuple(c) for c in colors))[:128]
+    quantized = preview.convert("RGB").quantize(colors=256 - len(colors))
+    palette = quantized.getpalette()[:3 * (256 - len(colors))]
+    palette += [0] * (3 * (256 - len(colors)) - len(palette))
+    for color in colors:
+        palette.extend(int(c) for c in color)
+    img = Image.new("P", (1, 1))
+    img.putpalette(palette)
+    return img
+
+
+def replay_pieces(curve: np.ndarray, times: np.ndarray,
+                  frames: np.ndarray) -> Iterator[Tuple[np.ndarray, int, np.ndarray]]:
+    """Per frame, the newly reached piece of the curve
+
+    Yields (piece points, number of curve vertices reached, head position).
+    A piece starts where the previous frame's ended and the head is
+    interpolated inside its segment, so the path so far is always
+    ``curve[:reached]`` followed by the head.
+    """
+    n = len(curve)
+    last = curve[0]
+    cursor = 1  # next curve vertex not yet reached
+    for t in frames.tolist():
+        reached = min(max(int(np.searchsorted(times, t, side="right")), 1), n)
+        head = curve[reached - 1]
+        if reached < n:
+            t0, t1 = times[reached - 1], times[reached]
+            if t1 > t0:
+                head = head + (t - t0) / (t1 - t0) * (curve[reached] - head)
+        piece = np.vstack(([last], curve[cursor:reached], [head]))
+        cursor = max(cursor, reached)
+        last = head
+        yield piece, reached, head
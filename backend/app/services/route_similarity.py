@@ -0,0 +1,167 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.models.models import PathRecord
+from app.services.field_heatmap import load_record_points
+
+
+def arc_length_signature(xy: np.ndarray, samples: int) -> np.ndarray:
+    """``samples`` points evenly spaced by distance along a polyline
+
+    Routes driven with different point densities or speeds resample to
+    the same shape, so signatures compare point for point.
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    step = np.hypot(*np.diff(xy, axis=0).T)
+    xy = xy[np.concatenate(([True], step > 0))]
+    along = np.concatenate(([0.0], np.cumsum(step[step > 0])))
+    if len(xy) < 2:
+        return np.repeat(xy[:1], samples, axis=0)
+    u = np.linspace(0.0, along[-1], samples)
+    return np.column_stack((np.interp(u, along, xy[:, 0]), np.interp(u, along, xy[:, 1])))
+
+
+def mirror_signature(signature: np.ndarray) -> np.ndarray:
+    """The same route driven from the other alliance's side of the field"""
+    mirrored = signature.copy()
+    mirrored[..., 0] = settings.FIELD_WIDTH_MM - mirrored[..., 0]
+    return mirrored
+
+
+def dtw_distances(query: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """Dynamic time warping distance from one signature to each of a stack
+
+    ``query`` is (n, 2) and ``candidates`` (K, m, 2); every candidate is
+    aligned at once, one anti-diagonal of the cost matrix per step.
+    Returns the aligned distance per query point (millimetres).
+    """
+    k, m = candidates.shape[:2]
+    n = len(query)
+    cost = np.hypot(*(candidates[:, None, :, :] - query[None, :, None, :]).transpose(3, 0, 1, 2))
+    total = np.full((k, n + 1, m + 1), np.inf)
+    total[:, 0, 0] = 0.0
+    for d in range(2, n + m + 1):
+        i = np.arange(max(1, d - m), min(n, d - 1) + 1)
+        j = d - i
+        best = np.minimum(np.minimum(total[:, i - 1, j], total[:, i, j - 1]), total[:, i - 1, j - 1])
+        total[:, i, j] = cost[:, i - 1, j - 1] + best
+    return total[:, n, m] / n
+
+
+class RouteIndex:
+    """Arc-length signatures of every stored PathRecord, searchable by shape
+
+    Signatures live in one growing (N, samples, 2) matrix, so a query is a
+    single batched distance over all routes; the closest ``shortlist`` are
+    then re-ranked by DTW, which forgives a detour or a pause that shifts
+    one route against the other. Like the heatmap store, the index
+    remembers the highest record id it holds and only reads newer rows,
+    rebuilding when rows it holds disappear. Only route shape is compared;
+    timing is ignored.
+    """
+
+    def __init__(self, samples: Optional[int] = None, shortlist: Optional[int] = None):
+        self.samples = samples or settings.ROUTE_SIGNATURE_POINTS
+        self.shortlist = shortlist or settings.ROUTE_SHORTLIST
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self.records = 0  # rows seen, including unreadable ones
+        self.last_id = 0  # highest PathRecord id seen
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.team_ids = np.zeros(0, dtype=np.int64)
+        self.signatures = np.zeros((0, self.samples, 2), dtype=np.float32)
+
+    def _append(self, record: PathRecord, signature: np.ndarray):
+        if self.size == len(self.ids):
+            capacity = max(64, 2 * self.size)
+            self.ids = np.resize(self.ids, capacity)
+            self.team_ids = np.resize(self.team_ids, capacity)
+            self.signatures = np.resize(self.signatures, (capacity, self.samples, 2))
+        self.ids[self.size] = record.id
+        self.team_ids[self.size] = record.team_id
+        self.signatures[self.size] = signature
+        self.size += 1
+
+    def add_record(self, record: PathRecord):
+        self.records += 1
+        self.last_id = max(self.last_id, record.id)
+        try:
+            xy, _ = load_record_points(record.points_json)
+        except (ValueError, KeyError, TypeError):
+            return
+        if len(xy):
+            self._append(record, arc_length_signature(xy, self.samples))
+
+    def update(self, session: Session) -> int:
+        """Index PathRecords stored since the last update; returns how many were read"""
+        with self._lock:
+            if self.records:
+                counted = session.exec(
+                    select(func.count(PathRecord.id)).where(PathRecord.id <= self.last_id)
+                ).one()
+                if counted != self.records:
+                    self.reset()
+                    self.rebuilds += 1
+            added = 0
+            statement = select(PathRecord).where(PathRecord.id > self.last_id).order_by(PathRecord.id)
+            for record in session.exec(statement):
+                self.add_record(record)
+                added += 1
+            return added
+
+    def signature(self, record_id: int) -> Optional[np.ndarray]:
+        with self._lock:
+            found = np.flatnonzero(self.ids[:self.size] == record_id)
+            return self.signatures[found[0]].astype(np.float64) if len(found) else None
+
+    def search(self, signature: np.ndarray, k: int = 10, include_mirrored: bool = True,
+               exclude_ids: Tuple[int, ...] = (), exclude_team: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The ``k`` routes closest in shape to a signature, closest first
+
+        Each result has ``record_id``, ``team_id``, ``distance`` (DTW,
+        millimetres per point) and ``mirrored`` (matched against the
+        signature reflected to the other alliance).
+        """
+        with self._lock:
+            ids = self.ids[:self.size].copy()
+            team_ids = self.team_ids[:self.size].copy()
+            signatures = self.signatures[:self.size]
+            queries = [signature] + ([mirror_signature(signature)] if include_mirrored else [])
+
+            # Mean point-to-point distance to every route, for each query orientation
+            coarse = np.min([np.hypot(*(signatures - q.astype(np.float32)).transpose(2, 0, 1)).mean(axis=1)
+                             for q in queries], axis=0)
+            keep = ~np.isin(ids, exclude_ids)
+            if exclude_team is not None:
+                keep &= team_ids != exclude_team
+            candidates = np.flatnonzero(keep)
+            if not len(candidates):
+                return []
+            limit = min(len(candidates), max(self.shortlist, k))
+            if limit < len(candidates):
+                candidates = candidates[np.argpartition(coarse[candidates], limit - 1)[:limit]]
+            shortlisted = signatures[candidates].astype(np.float64)
+
+        refined = np.stack([dtw_distances(query, shortlisted) for query in queries])
+        mirrored = refined.argmin(axis=0)
+        distance = refined.min(axis=0)
+        order = np.argsort(distance, kind="stable")[:k]
+        return [{"record_id": int(ids[candidates[i]]), "team_id": int(team_ids[candidates[i]]),
+                 "distance": float(distance[i]), "mirrored": bool(mirrored[i])}
+                for i in order]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"routes": self.size, "records": self.records, "rebuilds": self.rebuilds}
+
+
+# Global route index for this process
+route_index = RouteIndex()
@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.core.config import settings
+
+
+# Pre-rendered marker image and the offset of the marker center inside it
+Sprite = Tuple[Image.Image, Tuple[int, int]]
+
+
+class SpriteAtlas:
+    """Lazily built, cached state-marker sprites
+
+    One sprite per (icon, color, icon size, label) holds the marker circle,
+    centered icon and optional label box. Each element is drawn on its own
+    transparent layer and alpha-composited, so stamping a sprite over the
+    map matches drawing the elements directly. Stamping is a single
+    composite whose cost depends only on the sprite size. Colors, sizes
+    and labels come from requests, so the atlas is an LRU of at most
+    ``max_entries`` sprites.
+    """
+
+    def __init__(self, font: ImageFont.ImageFont, font_large: ImageFont.ImageFont,
+                 max_entries: Optional[int] = None):
+        self.font = font
+        self.font_large = font_large
+        self.max_entries = max_entries or settings.SPRITE_ATLAS_SIZE
+        self._sprites: "OrderedDict[tuple, Sprite]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, icon: str, rgba: Tuple[int, int, int, int], marker_size: int,
+            label: Optional[str] = None) -> Sprite:
+        key = (icon, tuple(rgba), marker_size, label)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                return sprite
+        sprite = self._build(icon, rgba, marker_size, label)
+        with self._lock:
+            self._sprites[key] = sprite
+            while len(self._sprites) > self.max_entries:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+    def _build(self, icon: str, rgba: Tuple[int, int, int, int], marker_size: int,
+               label: Optional[str]) -> Sprite:
+        measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        label_box = measure.textbbox((0, 0), label, font=self.font) if label else (0, 0, 0, 0)
+        label_width = label_box[2] - label_box[0]
+        label_height = label_box[3] - label_box[1]
+        padding = 3
+
+        # Draw around a center just far enough from every edge, then crop:
+        # the marker circle, the icon (offset by half its box) and the label
+        # box above the marker. Only the width grows with the label.
+        icon_box = measure.textbbox((0, 0), icon, font=self.font_large)
+        icon_extent = max(icon_box[2], icon_box[3], icon_box[2] - icon_box[0], icon_box[3] - icon_box[1])
+        extent = max(marker_size + 1, icon_extent)
+        cx = max(extent, (label_width + 1) // 2 + padding + abs(label_box[0]) if label else 0) + 2
+        cy = max(extent, marker_size + label_height + 5 + padding + abs(label_box[1]) if label else 0) + 2
+        size = (2 * cx, 2 * cy)
+        sprite = Image.new("RGBA", size, (0, 0, 0, 0))
+
+        def element() -> Tuple[Image.Image, ImageDraw.ImageDraw]:
+            layer = Image.new("RGBA", size, (0, 0, 0, 0))
+            return layer, ImageDraw.Draw(layer)
+
+        # Marker circle with border
+        layer, draw = element()
+        draw.ellipse([cx - marker_size, cy - marker_size, cx + marker_size, cy + marker_size],
+                     fill=rgba, outline=(255, 255, 255, 255), width=2)
+        sprite.alpha_composite(layer)
+
+        # Icon centered on the marker
+        layer, draw = element()
+        bbox = draw.textbbox((cx, cy), icon, font=self.font_large)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        draw.text((cx - text_width // 2, cy - text_height // 2), icon,
+                  fill=(255, 255, 255, 255), font=self.font_large)
+        sprite.alpha_composite(layer)
+
+        # Label above the marker on a translucent background
+        if label:
+            label_x = cx - label_width // 2
+            label_y = cy - marker_size - label_height - 5
+            layer, draw = element()
+            draw.rectangle([label_x - padding, label_y - padding,
+                            label_x + label_width + padding, label_y + label_height + padding],
+                           fill=(0, 0, 0, 180))
+            sprite.alpha_composite(layer)
+            layer, draw = element()
+            draw.text((label_x, label_y), label, fill=(255, 255, 255, 255), font=self.font)
+            sprite.alpha_composite(layer)
+
+        bbox = sprite.getchannel("A").getbbox()
+        return sprite.crop(bbox), (cx - bbox[0], cy - bbox[1])
+
+
+def stamp(img: Image.Image, sprite: Sprite, x: int, y: int):
+    """Composite a sprite centered at (x, y) onto an RGB or RGBA image in place"""
+    sprite_img, (ax, ay) = sprite
+    left, top = x - ax, y - ay
+    if img.mode != "RGBA":
+        img.paste(sprite_img, (left, top), sprite_img)
+        return
+
+    # alpha_composite needs the source clipped to the destination
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + sprite_img.width, img.width), min(top + sprite_img.height, img.height)
+    if x0 >= x1 or y0 >= y1:
+        return
+    img.alpha_composite(sprite_img, (x0, y0), (x0 - left, y0 - top, x1 - left, y1 - top))
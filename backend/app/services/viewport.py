@@ -0,0 +1,103 @@
+import math
+import numpy as np
+from typing import List, NamedTuple, Optional, Tuple
+
+
+# Largest edge of a viewport image when its size is derived from the box
+MAX_OUTPUT_EDGE = 4096
+
+
+def visible_segments(points: np.ndarray, box: Tuple[float, float, float, float]) -> np.ndarray:
+    """Mask of polyline segments whose bounding box overlaps ``box`` (x0, y0, x1, y1)"""
+    points = np.asarray(points, dtype=np.float64)
+    a, b = points[:-1], points[1:]
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    return ((lo[:, 0] <= box[2]) & (hi[:, 0] >= box[0]) &
+            (lo[:, 1] <= box[3]) & (hi[:, 1] >= box[1]))
+
+
+def segment_runs(visible: np.ndarray) -> List[Tuple[int, int]]:
+    """(first, last) point indices of each run of consecutive visible segments"""
+    edges = np.diff(np.concatenate(([0], visible.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+class ViewportFrame(NamedTuple):
+    """A canvas-pixel rectangle rendered to an output image of its own size
+
+    Geometry is computed on the full canvas (so smoothing, routing and
+    obstacles behave exactly as in a full render), then clipped to the box
+    and mapped to output pixels. Stroke widths and markers keep their pixel
+    size, like zooming a map.
+    """
+    box: Tuple[float, float, float, float]  # x0, y0, x1, y1 in canvas pixels
+    size: Tuple[int, int]  # output width, height
+
+    @classmethod
+    def fit(cls, box: Tuple[float, float, float, float], output_width: Optional[int] = None,
+            output_height: Optional[int] = None) -> "ViewportFrame":
+        """Frame for a box, deriving a missing output edge from the box aspect ratio
+
+        A derived size is scaled down, keeping its aspect, until neither edge
+        exceeds ``MAX_OUTPUT_EDGE``.
+        """
+        width, height = box[2] - box[0], box[3] - box[1]
+        if width <= 0 or height <= 0:
+            raise ValueError("Viewport must have a positive width and height")
+        if output_width and output_height:
+            size = (output_width, output_height)
+        elif output_width:
+            size = (output_width, output_width * height / width)
+        elif output_height:
+            size = (output_height * width / height, output_height)
+        else:
+            size = (width, height)
+        if not (output_width and output_height):
+            fit = min(1.0, MAX_OUTPUT_EDGE / max(size))
+            size = (size[0] * fit, size[1] * fit)
+        return cls(tuple(float(v) for v in box), (max(int(round(size[0])), 1), max(int(round(size[1])), 1)))
+
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """Output pixels per canvas pixel along x and y"""
+        return (self.size[0] / (self.box[2] - self.box[0]),
+                self.size[1] / (self.box[3] - self.box[1]))
+
+    def key(self) -> List[float]:
+        """Stable layer-key component"""
+        return [round(v, 4) for v in self.box] + list(self.size)
+
+    def to_output(self, points: np.ndarray) -> np.ndarray:
+        """Map canvas-pixel points to output pixels"""
+        return (np.asarray(points, dtype=np.float64) - self.box[:2]) * self.scale
+
+    def padded_box(self, pad: float) -> Tuple[float, float, float, float]:
+        """The box grown by ``pad`` output pixels on every side, in canvas pixels"""
+        sx, sy = self.scale
+        return (self.box[0] - pad / sx, self.box[1] - pad / sy,
+                self.box[2] + pad / sx, self.box[3] + pad / sy)
+
+    def visible(self, points: np.ndarray, pad: float = 0.0) -> np.ndarray:
+        """Mask of segments that can touch the output, strokes ``pad`` pixels wide"""
+        return visible_segments(points, self.padded_box(pad))
+
+    def clip(self, points: np.ndarray, pad: float = 0.0) -> List[np.ndarray]:
+        """Runs of a polyline that can touch the output, in output pixels"""
+        points = np.asarray(points, dtype=np.float64)
+        if len(points) < 2:
+            return []
+        runs = segment_runs(self.visible(points, pad))
+        return [self.to_output(points[a:b + 1]) for a, b in runs]
+
+    def source_box(self, width: float, height: float,
+                   canvas_size: Tuple[int, int]) -> Tuple[float, float, float, float]:
+        """The box in pixels of a (width, height) image stretched over the canvas"""
+        kx, ky = width / canvas_size[0], height / canvas_size[1]
+        return (self.box[0] * kx, self.box[1] * ky, self.box[2] * kx, self.box[3] * ky)
+
+
+def integer_box(box: Tuple[float, float, float, float]) -> Tuple[int, int, int, int]:
+    """Smallest integer box containing a float box"""
+    return (math.floor(box[0]), math.floor(box[1]), math.ceil(box[2]), math.ceil(box[3]))
@@ -0,0 +1,118 @@
+"""
+寻路性能对比: 旧版 dict A* vs 数组 A* (八方向启发式) vs 跳点搜索 (JPS)
+使用近似 Pushback 场地障碍布局 (800x800 画布像素坐标)
+"""
+import sys
+sys.path.insert(0, '.')
+
+import time
+from heapq import heappush, heappop
+import numpy as np
+
+from app.services.pathfinding import GridSearch, path_cost
+
+
+def pushback_obstacles():
+    """Approximate Pushback field elements on an 800x800 canvas"""
+    obstacles = [
+        # Long goals
+        {'x': 200, 'y': 120, 'w': 400, 'h': 20},
+        {'x': 200, 'y': 660, 'w': 400, 'h': 20},
+        # Park zone barriers (open toward the field)
+        {'x': 0, 'y': 330, 'w': 90, 'h': 10},
+        {'x': 0, 'y': 460, 'w': 90, 'h': 10},
+        {'x': 710, 'y': 330, 'w': 90, 'h': 10},
+        {'x': 710, 'y': 460, 'w': 90, 'h': 10},
+        # Match loaders
+        {'x': 0, 'y': 120, 'w': 30, 'h': 30},
+        {'x': 0, 'y': 650, 'w': 30, 'h': 30},
+        {'x': 770, 'y': 120, 'w': 30, 'h': 30},
+        {'x': 770, 'y': 650, 'w': 30, 'h': 30},
+    ]
+    # Center goals cross in an X
+    for k in range(-5, 6):
+        obstacles.append({'x': 390 + k * 16, 'y': 390 + k * 16, 'w': 20, 'h': 20})
+        obstacles.append({'x': 390 + k * 16, 'y': 390 - k * 16, 'w': 20, 'h': 20})
+    return obstacles
+
+
+def build_grid(obstacles, resolution, size=800):
+    grid = np.zeros((size // resolution, size // resolution), dtype=int)
+    for o in obstacles:
+        gx1, gy1 = int(o['x'] / resolution), int(o['y'] / resolution)
+        gx2 = max(int((o['x'] + o['w']) / resolution), gx1 + 1)
+        gy2 = max(int((o['y'] + o['h']) / resolution), gy1 + 1)
+        grid[gy1:gy2, gx1:gx2] = 1
+    return grid
+
+
+def legacy_astar(grid, start, end):
+    """Previous PathRenderer._astar_path (dict scores, Manhattan, no closed set)"""
+    rows, cols = grid.shape
+    if grid[start] == 1 or grid[end] == 1:
+        return None
+    directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+    open_set = []
+    heappush(open_set, (0, start))
+    came_from = {}
+    g_score = {start: 0}
+    while open_set:
+        current = heappop(open_set)[1]
+        if current == end:
+            path = []
+            while current in came_from:
+                path.append(current)
+                current = came_from[current]
+            path.append(start)
+            return path[::-1]
+        for d in directions:
+            neighbor = (current[0] + d[0], current[1] + d[1])
+            if not (0 <= neighbor[0] < rows and 0 <= neighbor[1] < cols):
+                continue
+            if grid[neighbor] == 1:
+                continue
+            tentative_g = g_score[current] + 1
+            if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g
+                f_score = tentative_g + abs(neighbor[0] - end[0]) + abs(neighbor[1] - end[1])
+                heappush(open_set, (f_score, neighbor))
+    return None
+
+
+def sample_queries(grid, count, rng):
+    free = np.argwhere(grid == 0)
+    queries = []
+    while len(queries) < count:
+        a, b = free[rng.integers(len(free), size=2)]
+        if abs(a - b).sum() > grid.shape[0] // 2:
+            queries.append((tuple(int(v) for v in a), tuple(int(v) for v in b)))
+    return queries
+
+
+def run(label, fn, queries):
+    start = time.perf_counter()
+    costs = []
+    for s, g in queries:
+        path = fn(s, g)
+        costs.append(path_cost(path) if path else float('nan'))
+    elapsed = (time.perf_counter() - start) / len(queries) * 1000
+    return label, elapsed, np.nanmean(costs)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(2025)
+    obstacles = pushback_obstacles()
+    print(f"{'分辨率':>6} {'网格':>9} {'算法':>10} {'平均耗时(ms)':>14} {'平均路径代价':>14}")
+    for resolution in (20, 10, 5, 2):
+        grid = build_grid(obstacles, resolution)
+        queries = sample_queries(grid, 20, rng)
+        search = GridSearch(grid)
+        results = [
+            run('legacy', lambda s, g: legacy_astar(grid, s, g), queries),
+            run('astar', lambda s, g: search.find_path(s, g), queries),
+            run('jps', lambda s, g: search.find_path(s, g, jump_points=True), queries),
+        ]
+        for label, elapsed, cost in results:
+            shape = f"{grid.shape[0]}x{grid.shape[1]}"
+            print(f"{resolution:>6} {shape:>9} {label:>10} {elapsed:>14.2f} {cost:>14.2f}")
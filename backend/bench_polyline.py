@@ -0,0 +1,61 @@
+"""
+折线绘制性能对比: 逐段 ImageDraw.line vs 批量 cv2.polylines
+"""
+import sys
+sys.path.insert(0, '.')
+
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.services.path_drawing import draw_polyline_image
+
+
+def legacy_polyline(img, points, color, width, arrow):
+    """Previous implementation: one draw.line per segment and per arrow wing"""
+    draw = ImageDraw.Draw(img, 'RGBA')
+    for i in range(len(points) - 1):
+        draw.line([points[i], points[i + 1]], fill=color, width=width)
+    if arrow:
+        for i in range(len(points) - 1):
+            start, end = points[i], points[i + 1]
+            angle = np.arctan2(end[1] - start[1], end[0] - start[0])
+            length = width * 3
+            p1 = (end[0] - length * np.cos(angle - np.pi / 6), end[1] - length * np.sin(angle - np.pi / 6))
+            p2 = (end[0] - length * np.cos(angle + np.pi / 6), end[1] - length * np.sin(angle + np.pi / 6))
+            draw.line([end, p1], fill=color, width=width)
+            draw.line([end, p2], fill=color, width=width)
+    return img
+
+
+def batched_polyline(img, points, color, width, arrow):
+    return draw_polyline_image(img, np.asarray(points), color, width, arrow=arrow)
+
+
+def make_path(n):
+    """Smooth wandering path like a 20x upsampled telemetry route"""
+    t = np.linspace(0, 1, n)
+    x = 400 + 300 * np.sin(2 * np.pi * t) * np.cos(3 * np.pi * t)
+    y = 400 + 300 * np.sin(5 * np.pi * t) * t
+    return list(zip(x, y))
+
+
+def bench(fn, base, points, arrow, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        img = base.copy()
+        start = time.perf_counter()
+        fn(img, points, (255, 0, 0, 204), 3, arrow)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == '__main__':
+    base = Image.new('RGB', (800, 800), 'white')
+    print(f"{'段数':>8} {'箭头':>6} {'逐段(ms)':>12} {'批量(ms)':>12} {'加速':>8}")
+    for n in (100, 1000, 4000, 20000):
+        points = make_path(n)
+        for arrow in (False, True):
+            legacy = bench(legacy_polyline, base, points, arrow)
+            batched = bench(batched_polyline, base, points, arrow)
+            print(f"{n:>8} {str(arrow):>6} {legacy:>12.2f} {batched:>12.2f} {legacy / batched:>7.1f}x")
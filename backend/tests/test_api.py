@@ -1,4 +1,5 @@
 import pytest
+import base64
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
 from sqlmodel.pool import StaticPool
@@ -22,15 +23,22 @@ def session_fixture():
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
-    """Create a test client"""
+def client_fixture(session: Session, tmp_path, monkeypatch):
+    """Create a test client with render and tile caches under tmp_path"""
+    from app.core.config import settings
+    from app.services.render_cache import render_cache
+    
     def get_session_override():
         return session
 
+    monkeypatch.setattr(render_cache, "cache_dir", str(tmp_path / "render_cache"))
+    monkeypatch.setattr(settings, "TILE_CACHE_DIR", str(tmp_path / "tile_cache"))
+    render_cache.clear()
     app.dependency_overrides[get_session] = get_session_override
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
+    render_cache.clear()
 
 
 def test_create_team(client: TestClient):
@@ -103,3 +111,361 @@ def test_health_check(client: TestClient):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
+
+
+def test_render_queue_status(client: TestClient):
+    """Test render queue depth reporting"""
+    response = client.get("/api/path/render/queue")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["queue_depth"] == 0
+    assert data["workers"] >= 1
+
+
+def test_path_render_etag(client: TestClient):
+    """Test repeated renders carry a stable ETag and honour If-None-Match"""
+    payload = {
+        "method": "spline",
+        "points": [
+            {"x": 120, "y": 80},
+            {"x": 260, "y": 300},
+            {"x": 420, "y": 180}
+        ],
+        "style": {"color": "#00AAFF", "width": 4}
+    }
+    first = client.post("/api/path/render/image", json=payload)
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/png"
+    etag = first.headers["etag"]
+    
+    second = client.post("/api/path/render/image", json=payload)
+    assert second.headers["etag"] == etag
+    assert second.content == first.content
+    
+    cached = client.post("/api/path/render/image", json=payload, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    
+    payload["style"]["width"] = 5
+    changed = client.post("/api/path/render/image", json=payload, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+    
+    # JSON renders revalidate per response shape, not just per image
+    overlay_only = client.post("/api/path/render", json=dict(payload, return_image=False))
+    assert overlay_only.json()["image_base64"] is None
+    etag = overlay_only.headers["etag"]
+    with_image = client.post("/api/path/render", json=dict(payload, return_image=True),
+                             headers={"If-None-Match": etag})
+    assert with_image.status_code == 200 and with_image.json()["image_base64"]
+    with_overlay = client.post("/api/path/render", json=dict(payload, return_image=False, return_overlay=True),
+                               headers={"If-None-Match": etag})
+    assert with_overlay.status_code == 200 and with_overlay.json()["overlay_json"]
+    assert client.post("/api/path/render", json=dict(payload, return_image=False),
+                       headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_path_render_binary_body(client: TestClient):
+    """Test rendering from a compact binary point upload"""
+    import numpy as np
+    from app.services.path_arrays import PathArrays
+    from app.services.path_binary import encode_path_body, PATH_BINARY_MEDIA_TYPE
+    
+    t = np.linspace(0, 1, 2000)
+    path = PathArrays(100 + 600 * t, 400 + 200 * np.sin(6 * t))
+    body = encode_path_body(path, {"method": "polyline", "style": {"color": "#00FF00"}})
+    
+    response = client.post(
+        "/api/path/render/image",
+        content=body,
+        headers={"Content-Type": PATH_BINARY_MEDIA_TYPE}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    
+    bad = client.post(
+        "/api/path/render",
+        content=body[:-4],
+        headers={"Content-Type": PATH_BINARY_MEDIA_TYPE}
+    )
+    assert bad.status_code == 400
+    
+    import json
+    import struct
+    header = json.dumps({"method": "polyline", "count": {}}).encode("utf-8")
+    malformed = b"RSXP" + struct.pack("<I", len(header)) + header
+    nan = encode_path_body(PathArrays(np.array([100.0, np.nan]), np.array([100.0, 200.0])), {"method": "polyline"})
+    for bad_body in (malformed, nan):
+        response = client.post("/api/path/render", content=bad_body,
+                               headers={"Content-Type": PATH_BINARY_MEDIA_TYPE})
+        assert response.status_code == 400
+
+
+def test_path_render_image_formats(client: TestClient):
+    """Test binary image output in PNG, lossless WebP and JPEG"""
+    payload = {
+        "method": "polyline",
+        "points": [{"x": 100, "y": 100}, {"x": 500, "y": 600}]
+    }
+    signatures = {
+        "png": (b"\x89PNG", "image/png"),
+        "webp": (b"RIFF", "image/webp"),
+        "jpeg": (b"\xff\xd8", "image/jpeg"),
+    }
+    for image_format, (magic, media_type) in signatures.items():
+        response = client.post("/api/path/render/image", json={**payload, "image_format": image_format})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == media_type
+        assert response.content.startswith(magic)
+    
+    response = client.post("/api/path/render/image", json={**payload, "image_format": "gif"})
+    assert response.status_code == 400
+
+
+def test_path_render_vector_output(client: TestClient):
+    """Test vector output through the JSON and binary endpoints"""
+    payload = {
+        "method": "bezier",
+        "points": [{"x": 100, "y": 100}, {"x": 300, "y": 400}, {"x": 600, "y": 200}],
+        "output": "vector"
+    }
+    response = client.post("/api/path/render", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["svg"].startswith("<svg")
+    assert data["image_base64"] is None
+    
+    image = client.post("/api/path/render/image", json=payload)
+    assert image.headers["content-type"] == "image/svg+xml"
+    assert image.content == data["svg"].encode("utf-8")
+
+
+def test_path_render_batch(client: TestClient):
+    """Test several robots render onto one canvas with per-path overlays"""
+    payload = {
+        "paths": [
+            {"name": "red1", "method": "polyline", "style": {"color": "#FF0000"},
+             "points": [{"x": 100, "y": 100}, {"x": 300, "y": 200}]},
+            {"name": "red2", "method": "spline", "style": {"color": "#FF8800"},
+             "points": [{"x": 100, "y": 700}, {"x": 300, "y": 500}, {"x": 400, "y": 650}]},
+            {"name": "blue1", "method": "heatline",
+             "points": [{"x": 700, "y": 100, "speed": 2}, {"x": 500, "y": 300, "speed": 8}]},
+        ],
+        "return_overlay": True
+    }
+    response = client.post("/api/path/render/batch", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["image_base64"]
+    assert set(data["overlay_json"]) == {"red1", "red2", "blue1"}
+    assert data["overlay_json"]["red2"]["method"] == "spline"
+    
+    cached = client.post("/api/path/render/batch", json=payload,
+                         headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    
+    # The ETag covers which parts the JSON response includes
+    payload["return_overlay"] = False
+    assert client.post("/api/path/render/batch", json=payload,
+                       headers={"If-None-Match": response.headers["etag"]}).status_code == 200
+    
+    payload["paths"][1]["name"] = "red1"
+    assert client.post("/api/path/render/batch", json=payload).status_code == 400
+
+
+def test_path_render_bulk_thumbnails(client: TestClient):
+    """Test bulk thumbnails come back as JSON or a zip archive"""
+    import io
+    import zipfile
+    from PIL import Image
+    
+    items = [
+        {"name": f"team{i}", "method": "spline",
+         "points": [{"x": 100 + i * 50, "y": 100}, {"x": 400, "y": 400}, {"x": 700, "y": 200 + i * 50}]}
+        for i in range(3)
+    ]
+    items.append({"name": "broken", "method": "zigzag", "points": [{"x": 1, "y": 1}, {"x": 2, "y": 2}]})
+    payload = {"items": items, "thumbnail_size": 160, "image_format": "jpeg"}
+    
+    response = client.post("/api/path/render/bulk", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is False and data["media_type"] == "image/jpeg"
+    assert [t["name"] for t in data["thumbnails"]] == ["team0", "team1", "team2", "broken"]
+    assert "zigzag" in data["thumbnails"][3]["error"]
+    image = Image.open(io.BytesIO(base64.b64decode(data["thumbnails"][0]["image_base64"])))
+    assert image.format == "JPEG" and image.size == (160, 160)
+    
+    payload["archive"] = True
+    archive = client.post("/api/path/render/bulk", json=payload)
+    assert archive.headers["content-type"] == "application/zip"
+    names = zipfile.ZipFile(io.BytesIO(archive.content)).namelist()
+    assert sorted(names) == ["errors.json", "team0.jpg", "team1.jpg", "team2.jpg"]
+
+
+def test_path_tiles(client: TestClient):
+    """Test map tiles are served with long-lived, versioned cache headers"""
+    meta = client.get("/api/path/tiles/meta")
+    assert meta.status_code == 200
+    data = meta.json()
+    assert data["levels"][0]["cols"] == 1 and f"v={data['version']}" in data["url"]
+    
+    z = data["max_zoom"]
+    response = client.get(f"/api/path/tiles/{z}/0/0", params={"v": data["version"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    
+    cached = client.get(f"/api/path/tiles/{z}/0/0", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert client.get(f"/api/path/tiles/{z + 1}/0/0").status_code == 404
+
+
+
+def test_path_tiles_url_encodes_map_filename(client: TestClient, tmp_path):
+    """Test the tile URL template survives map filenames with query characters"""
+    import os
+    import shutil
+    
+    map_path = tmp_path / "map & field #1.png"
+    shutil.copy(os.path.join(os.path.dirname(__file__), "..", "..", "pushback_map.png"), map_path)
+    data = client.get("/api/path/tiles/meta", params={"map_filename": str(map_path)}).json()
+    assert "&map_filename=" in data["url"] and " " not in data["url"] and "#" not in data["url"]
+    
+    url = data["url"].format(z=data["max_zoom"], x=0, y=0)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_path_render_viewport(client: TestClient):
+    """Test viewport renders encode only the requested region"""
+    import io
+    from PIL import Image
+    
+    payload = {
+        "method": "polyline",
+        "points": [{"x": 100, "y": 100}, {"x": 300, "y": 200}],
+        "viewport": {"x": 100, "y": 100, "width": 200, "height": 100, "output_width": 400},
+    }
+    response = client.post("/api/path/render/image", json=payload)
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.content)).size == (400, 200)
+    
+    payload["output"] = "vector"
+    assert client.post("/api/path/render", json=payload).status_code == 400
+
+
+def test_path_render_replay(client: TestClient):
+    """Test replay renders stream back as animations"""
+    import io
+    from PIL import Image
+    
+    payload = {
+        "method": "polyline",
+        "points": [{"x": 100, "y": 100}, {"x": 400, "y": 300}, {"x": 700, "y": 200}],
+        "duration": 2, "fps": 5, "replay_format": "webp",
+    }
+    response = client.post("/api/path/render/replay", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert Image.open(io.BytesIO(response.content)).n_frames == 11
+    
+    cached = client.post("/api/path/render/replay", json=payload,
+                         headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    
+    payload["replay_format"] = "mp4"
+    assert client.post("/api/path/render/replay", json=payload).status_code == 400
+
+
+def test_path_records_heatmap(client: TestClient):
+    """Test the team heatmap picks up newly stored paths"""
+    from app.services.field_heatmap import field_heatmap_store
+    
+    field_heatmap_store.clear()
+    team = client.post("/api/teams/", json={"team_number": "1234A", "team_name": "Heat"}).json()
+    assert client.get("/api/path/heatmap").status_code == 400
+    
+    record = {
+        "team_id": team["id"], "path_name": "auton", "method": "polyline",
+        "points": [{"x": 100, "y": 100, "t": 0}, {"x": 700, "y": 700, "t": 15}],
+    }
+    response = client.post("/api/path/records", json=record)
+    assert response.status_code == 200
+    assert response.json()["path_name"] == "auton"
+    
+    first = client.get(f"/api/path/heatmap?team_id={team['id']}")
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "image/png"
+    assert first.headers["x-heatmap-paths"] == "1"
+    assert float(first.headers["x-heatmap-seconds"]) == pytest.approx(15.0)
+    
+    cached = client.get(f"/api/path/heatmap?team_id={team['id']}",
+                        headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+    
+    record["points"] = [{"x": 400, "y": 100}, {"x": 400, "y": 700}]
+    client.post("/api/path/records", json=record)
+    second = client.get(f"/api/path/heatmap?team_id={team['id']}",
+                        headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert second.headers["x-heatmap-paths"] == "2"
+    assert field_heatmap_store.stats()["records_added"] == 2
+    
+    record["team_id"] = team["id"] + 1
+    assert client.post("/api/path/records", json=record).status_code == 404
+
+
+def test_path_records_similar(client: TestClient):
+    """Test similar routes are found across teams, nearest first"""
+    teams = [client.post("/api/teams/", json={"team_number": f"55{i}A", "team_name": f"T{i}"}).json()
+             for i in range(3)]
+    shapes = [
+        [{"x": 100, "y": 100}, {"x": 300, "y": 100}, {"x": 300, "y": 300}],
+        [{"x": 105, "y": 102}, {"x": 298, "y": 104}, {"x": 302, "y": 296}],
+        [{"x": 100, "y": 700}, {"x": 700, "y": 700}],
+    ]
+    ids = []
+    for team, points in zip(teams, shapes):
+        response = client.post("/api/path/records", json={
+            "team_id": team["id"], "path_name": "auton", "method": "polyline", "points": points
+        })
+        ids.append(response.json()["id"])
+    
+    response = client.get(f"/api/path/records/{ids[0]}/similar?k=2")
+    assert response.status_code == 200
+    routes = response.json()["routes"]
+    assert [r["record_id"] for r in routes] == [ids[1], ids[2]]
+    assert routes[0]["team_id"] == teams[1]["id"]
+    assert routes[0]["distance"] < routes[1]["distance"]
+    
+    assert client.get("/api/path/records/9999/similar").status_code == 404
+
+
+def test_path_interference(client: TestClient):
+    """Test pairwise robot conflicts are reported and cached"""
+    payload = {
+        "paths": [
+            {"name": "ours", "method": "polyline",
+             "points": [{"x": 100, "y": 400, "t": 0}, {"x": 700, "y": 400, "t": 6}]},
+            {"name": "partner", "method": "spline",
+             "points": [{"x": 700, "y": 420, "t": 0}, {"x": 400, "y": 400, "t": 3}, {"x": 100, "y": 380, "t": 6}]},
+        ],
+        "return_image": True,
+    }
+    response = client.post("/api/path/interference", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["image_base64"]
+    pair = data["pairs"][0]
+    assert (pair["a"], pair["b"]) == ("ours", "partner")
+    assert 2.0 < pair["first_conflict_time"] < 3.0
+    assert pair["min_separation"] < 20
+    
+    cached = client.post("/api/path/interference", json=payload,
+                         headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    
+    del payload["paths"][1]["points"][1]["t"]
+    assert client.post("/api/path/interference", json=payload).status_code == 400
@@ -63,3 +63,705 @@ def test_coordinate_conversion():
     # Center should map to ~300, 300 in pixels
     assert abs(converted[0][0] - 300) < 10
     assert abs(converted[0][1] - 300) < 10
+
+
+def test_map_cache_reuses_resized_canvas():
+    """Test that repeated renders share one decoded map per canvas size"""
+    from app.services.map_cache import MapCache
+    from PIL import Image
+    
+    cache = MapCache(max_bytes=400)
+    loads = []
+    
+    def loader():
+        loads.append(1)
+        return Image.new('RGB', (40, 40), 'white')
+    
+    first = cache.get("missing_map.png", (10, 10), loader)
+    second = cache.get("missing_map.png", (10, 10), loader)
+    assert first is second
+    assert first.size == (10, 10)
+    assert len(loads) == 1
+    
+    # Third size exceeds the byte budget and evicts the least recently used
+    cache.get("missing_map.png", (5, 5), loader)
+    cache.get("missing_map.png", (8, 8), loader)
+    assert cache.stats()["entries"] == 2
+    cache.get("missing_map.png", (10, 10), loader)
+    assert len(loads) == 4
+
+
+def test_render_executor_rejects_when_queue_full():
+    """Test that the render executor enforces its bounded queue"""
+    import asyncio
+    import threading
+    from app.services.render_executor import RenderExecutor, RenderQueueFull
+    
+    executor = RenderExecutor(mode="thread", max_workers=1, max_queue=0)
+    release = threading.Event()
+    
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(RenderQueueFull):
+            await executor.run(lambda: None)
+        release.set()
+        assert await running is True
+    
+    asyncio.run(scenario())
+    assert executor.stats()["rejected"] == 1
+    executor.shutdown()
+
+
+def test_render_cache_disk_tier(tmp_path):
+    """Test rendered images survive a memory-tier miss via the disk tier"""
+    from app.services.render_cache import RenderCache
+    
+    cache = RenderCache(cache_dir=str(tmp_path), max_memory_bytes=1024, max_disk_entries=10)
+    cache.set("ab" * 32, b"png-bytes", {"method": "polyline"})
+    assert cache.get("ab" * 32)["image"] == b"png-bytes"
+    
+    fresh = RenderCache(cache_dir=str(tmp_path), max_memory_bytes=1024, max_disk_entries=10)
+    entry = fresh.get("ab" * 32)
+    assert entry["image"] == b"png-bytes"
+    assert entry["overlay_json"] == {"method": "polyline"}
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.get("cd" * 32) is None
+
+
+
+def test_caches_bound_entries_without_images():
+    """Test image-less render entries and empty layers still get evicted"""
+    from app.services.layers import LayerCache
+    from app.services.render_cache import RenderCache
+    
+    cache = RenderCache(cache_dir="", max_memory_bytes=4096, max_disk_entries=10)
+    for i in range(50):
+        cache.set(f"{i:064x}", None, {"pairs": [i]})
+    assert 0 < cache.stats()["memory_entries"] < 50
+    assert cache.stats()["memory_bytes"] <= 4096
+    
+    layers = LayerCache(max_bytes=10 * LayerCache.ENTRY_BYTES)
+    for i in range(50):
+        layers.get(str(i), lambda: None)
+    assert layers.stats()["entries"] == 10
+
+
+
+def test_render_cache_key_tracks_resolved_map(tmp_path, monkeypatch):
+    """Test cache keys follow the map the renderer falls back to"""
+    import os
+    import shutil
+    from app.services.render_cache import map_cache_key, render_cache_key
+    from app.schemas.schemas import PathRenderRequest
+    
+    shutil.copy(os.path.join(os.path.dirname(__file__), "..", "..", "pushback_map.png"), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    request = PathRenderRequest(
+        method="polyline",
+        points=[PathPoint(x=10, y=10), PathPoint(x=50, y=50)],
+        map_filename=str(tmp_path / "missing" / "pushback_map.png")
+    )
+    map_key = map_cache_key(request.map_filename)
+    assert map_key[0] == str(tmp_path / "pushback_map.png")
+    assert map_key[1] is not None
+    
+    key = render_cache_key(request)
+    os.utime(tmp_path / "pushback_map.png", (map_key[1] + 10, map_key[1] + 10))
+    assert render_cache_key(request) != key
+
+
+def test_batched_polyline_drawing():
+    """Test the batched polyline backend draws segments and arrow heads"""
+    import numpy as np
+    from PIL import Image
+    from app.services.path_drawing import arrow_heads
+    
+    renderer = PathRenderer()
+    img = Image.new('RGB', (200, 200), 'white')
+    style = PathStyle(color="#FF0000", width=4, opacity=1.0, arrow=True)
+    img = renderer.render_polyline(img, [(20.0, 100.0), (180.0, 100.0)], style)
+    
+    assert img.getpixel((100, 100)) == (255, 0, 0)
+    assert img.getpixel((100, 20)) == (255, 255, 255)
+    
+    heads = arrow_heads(np.array([[0.0, 0.0], [10.0, 0.0], [10.0, 10.0]]), 3.0)
+    assert heads.shape == (2, 3, 2)
+    assert np.allclose(heads[:, 1], [[10.0, 0.0], [10.0, 10.0]])
+    # Arrow wings trail behind the tip of a rightward segment
+    assert heads[0, 0, 0] < 10.0 and heads[0, 2, 0] < 10.0
+
+
+@pytest.mark.parametrize("width", [1, 2, 3, 4, 8])
+def test_polyline_stroke_width_matches_style(width):
+    """Test a width-N stroke covers N pixels across the line, like PIL and SVG"""
+    import numpy as np
+    from app.services.path_drawing import polyline_mask
+    
+    for y in (50.0, 50.3, 50.5):
+        mask, (x0, y0) = polyline_mask(np.array([[10.0, y], [90.0, y]]), width, (100, 100))
+        column = mask[:, 50 - x0].astype(np.float64) / 255
+        assert column.sum() == pytest.approx(width, abs=0.3)
+        assert (column >= 0.5).sum() in (width, width + 1)
+    
+    diagonal, _ = polyline_mask(np.array([[10.0, 10.0], [90.0, 90.0]]), width, (100, 100))
+    # Ink per unit of length along a 45 degree stroke, less its round caps
+    ink = diagonal.sum() / 255 - np.pi * width ** 2 / 4
+    assert ink / (80 * np.sqrt(2)) == pytest.approx(width, abs=0.4)
+
+
+
+def test_polyline_supersampling_is_bounded(monkeypatch):
+    """Test large masks fall back to a lower supersampling factor"""
+    import numpy as np
+    from app.services import path_drawing
+    
+    allocated = []
+    zeros = np.zeros
+    monkeypatch.setattr(path_drawing.np, "zeros", lambda shape, **kw: allocated.append(shape) or zeros(shape, **kw))
+    monkeypatch.setattr(path_drawing, "MAX_SUPERSAMPLED_PIXELS", 4 * 100 * 100)
+    mask, (x0, _) = path_drawing.polyline_mask(np.array([[10.0, 50.0], [90.0, 50.0]]), 4, (100, 100))
+    (rows, cols), = allocated
+    assert rows * cols <= 4 * 100 * 100 < rows * cols * 16 / 9  # 3x instead of 4x
+    assert mask[:, 50 - x0].sum() / 255 == pytest.approx(4, abs=0.6)
+
+
+def test_path_arrays_from_points():
+    """Test columnar path construction and robot state codes"""
+    import numpy as np
+    from app.services.path_arrays import PathArrays
+    from app.schemas.schemas import RobotState
+    
+    path = PathArrays.from_points([
+        PathPoint(x=1, y=2, t=0.5),
+        PathPoint(x=3, y=4, speed=2.0, robot_state=RobotState(state='Intaking')),
+        PathPoint(x=5, y=6, robot_state=RobotState(state='moving', color='#123456')),
+    ])
+    
+    assert len(path) == 3
+    assert path.x.flags['C_CONTIGUOUS'] and path.x.dtype == np.float64
+    assert np.allclose(path.xy, [[1, 2], [3, 4], [5, 6]])
+    assert path.state_indices().tolist() == [1, 2]
+    assert path.state_name(1) == 'intaking'
+    assert path.state_colors == {2: '#123456'}
+    assert path.speed_or_time().tolist() == [0.5, 2.0, 1.0]
+
+
+def test_binary_path_body_roundtrip():
+    """Test packed float32 and npy binary path bodies decode to PathArrays"""
+    import numpy as np
+    from app.services.path_arrays import PathArrays
+    import struct
+    from app.services.path_binary import encode_path_body, decode_path_body
+    
+    n = 5000
+    path = PathArrays(np.linspace(0, 3600, n), np.linspace(3600, 0, n),
+                      t=np.linspace(0, 15, n),
+                      state=np.where(np.arange(n) % 1000 == 0, 0, -1),
+                      state_names=['intaking'])
+    
+    for encoding in ("f32le", "npy"):
+        body = encode_path_body(path, {"method": "spline", "coordinate_system": "field"},
+                                columns=["x", "y", "t", "state"], encoding=encoding)
+        fields, decoded = decode_path_body(body)
+        assert fields == {"method": "spline", "coordinate_system": "field"}
+        assert len(decoded) == n
+        assert np.allclose(decoded.x, path.x, atol=0.5)
+        assert np.isnan(decoded.speed).all()
+        assert decoded.state_indices().tolist() == list(range(0, n, 1000))
+        assert decoded.state_name(1000) == 'intaking'
+    
+    with pytest.raises(ValueError):
+        decode_path_body(b"NOPE" + body[4:])
+    with pytest.raises(ValueError):
+        decode_path_body(b"RSXP" + struct.pack("<I", 2) + b"[]")
+    long_name = PathArrays(path.x[:2], path.y[:2], state=[0, -1], state_names=["w" * 65])
+    with pytest.raises(ValueError):
+        decode_path_body(encode_path_body(long_name, columns=["x", "y", "state"]))
+
+
+def test_vector_output_skips_raster():
+    """Test SVG output contains curve, arrows and state markers"""
+    from app.schemas.schemas import RobotState
+    
+    renderer = PathRenderer()
+    
+    def fail_load(*args, **kwargs):
+        raise AssertionError("vector output must not load the map")
+    renderer.load_canvas = fail_load
+    
+    points = [
+        PathPoint(x=100, y=100, robot_state=RobotState(state='intaking')),
+        PathPoint(x=300, y=250),
+        PathPoint(x=500, y=150, robot_state=RobotState(state='releasing')),
+    ]
+    style = PathStyle(color="#00FF00", width=4, arrow=True)
+    result = renderer.render("spline", points, style, output="vector", return_overlay=True)
+    
+    svg = result["svg"]
+    assert svg.startswith("<svg") and svg.endswith("</svg>")
+    assert "<polyline" in svg and 'stroke="#00FF00"' in svg
+    assert svg.count('<g class="state">') == 2
+    assert ">Intaking</text>" in svg
+    assert "image_base64" not in result
+    curve = result["overlay_json"]["curve"]
+    assert 3 < len(curve) < 60
+    assert curve[0] == [100.0, 100.0] and curve[-1] == [500.0, 150.0]
+    assert result["overlay_json"]["states"][1]["state"] == "releasing"
+
+
+def test_rdp_simplification_keeps_state_points():
+    """Test RDP drops near-collinear telemetry but keeps corners and state points"""
+    import numpy as np
+    from app.schemas.schemas import RobotState
+    from app.services.path_simplify import rdp_mask
+    
+    # L-shaped route with 1px jitter, 101 samples per leg
+    rng = np.random.default_rng(3)
+    leg = np.linspace(0, 400, 101)
+    xy = np.vstack([np.column_stack((leg, np.full(101, 100.0))),
+                    np.column_stack((np.full(100, 400.0), 100 + leg[1:]))])
+    xy += rng.uniform(-1, 1, xy.shape)
+    
+    keep = rdp_mask(xy, 3.0)
+    assert keep[[0, 100, 200]].all() and keep.sum() == 3
+    assert rdp_mask(xy, 3.0, anchors=np.array([50]))[50]
+    assert rdp_mask(xy, 0).all()
+    
+    points = [PathPoint(x=x, y=y) for x, y in xy.tolist()]
+    points[42] = PathPoint(x=points[42].x, y=points[42].y, robot_state=RobotState(state='intaking'))
+    result = PathRenderer().render("polyline", points, PathStyle(simplify_tolerance=3.0),
+                                   return_image=False, return_overlay=True)
+    assert result["points_removed"] == 197
+    assert result["overlay_json"]["points_removed"] == 197
+    assert [round(p["x"]) for p in result["overlay_json"]["points"]][:2] == [round(xy[0, 0]), round(xy[42, 0])]
+
+
+def test_adaptive_curve_sampling():
+    """Test curve samples are sparse on straight runs and refined on tight turns"""
+    import numpy as np
+    from app.services.path_simplify import segment_distances
+    
+    renderer = PathRenderer()
+    straight = np.column_stack((np.linspace(0, 700, 8), np.full(8, 100.0)))
+    assert len(renderer.smooth_spline(straight)) == 8
+    
+    hairpin = np.array([[100, 100], [700, 110], [720, 140], [700, 170], [100, 180]], dtype=float)
+    for smooth in (renderer.smooth_spline, renderer.smooth_bezier):
+        coarse = smooth(hairpin, tolerance=2.0)
+        fine = smooth(hairpin, tolerance=0.1)
+        assert len(hairpin) < len(coarse) < len(fine) < len(hairpin) * 20 * 4
+        assert np.allclose(fine[[0, -1]], hairpin[[0, -1]])
+        # Every fine sample lies within the tolerance of some coarse chord
+        gaps = [segment_distances(np.repeat(p[None], len(coarse) - 1, axis=0),
+                                  coarse[:-1], coarse[1:]).min() for p in fine]
+        assert max(gaps) <= 2.0
+    
+    # A* routes are smoothed with the same tolerance
+    obstacles = [{"x": 350, "y": 250, "w": 100, "h": 300}]
+    ends = np.array([[100, 400], [700, 400]], dtype=float)
+    routes = [renderer.path_geometry("astar", ends, (800, 800), obstacles, 20, tolerance)
+              for tolerance in (2.0, 0.1)]
+    assert len(routes[0]) < len(routes[1])
+
+
+def test_layer_cache_rerasterizes_only_changed_layer():
+    """Test a state-label tweak reuses the cached path layer"""
+    from app.schemas.schemas import RobotState
+    from app.services.layers import layer_cache
+    
+    renderer = PathRenderer()
+    points = [
+        PathPoint(x=100, y=100, robot_state=RobotState(state='intaking')),
+        PathPoint(x=300, y=250),
+        PathPoint(x=500, y=150),
+    ]
+    layer_cache.clear()
+    
+    def counts():
+        stats = layer_cache.stats()
+        return stats["hits"], stats["misses"]
+    
+    hits, misses = counts()
+    first = renderer.render("spline", points, PathStyle(color="#00FF00"), return_bytes=True)
+    assert counts() == (hits, misses + 2)
+    
+    second = renderer.render("spline", points, PathStyle(color="#00FF00", show_state_labels=False),
+                             return_bytes=True)
+    assert counts() == (hits + 1, misses + 3)
+    assert first["image_bytes"] != second["image_bytes"]
+    
+    renderer.render("spline", points, PathStyle(color="#0000FF"), return_bytes=True)
+    assert counts() == (hits + 2, misses + 4)
+
+
+def test_state_sprites_are_reused_and_clipped():
+    """Test state markers are stamped from cached sprites, including at canvas edges"""
+    import numpy as np
+    from PIL import Image
+    from app.services.path_arrays import PathArrays
+    from app.schemas.schemas import RobotState
+    
+    renderer = PathRenderer()
+    states = ['intaking', 'moving', 'intaking', 'moving']
+    points = [PathPoint(x=x, y=y, robot_state=RobotState(state=state))
+              for (x, y), state in zip([(0, 0), (400, 400), (790, 10), (200, 795)], states)]
+    path = PathArrays.from_points(points)
+    
+    layer = Image.new("RGBA", (800, 800), (0, 0, 0, 0))
+    renderer.draw_robot_states(layer, path, path.xy, PathStyle())
+    assert len(renderer.sprites) == 2
+    
+    alpha = np.array(layer.getchannel("A"))
+    assert alpha[0, 0] > 0 and alpha[400, 400] > 0 and alpha[10, 790] > 0 and alpha[795, 200] > 0
+    # Labels sit above the marker
+    assert alpha[400 - 20 - 8, 400] > 0 and alpha[400 + 20 + 8, 400] == 0
+    
+    renderer.draw_robot_states(layer, path, path.xy, PathStyle(show_state_labels=False))
+    assert len(renderer.sprites) == 4
+
+
+def test_sprite_atlas_is_bounded():
+    """Test the atlas evicts least recently used sprites and sizes stay bounded"""
+    from pydantic import ValidationError
+    from app.services.state_sprites import SpriteAtlas
+    
+    renderer = PathRenderer()
+    atlas = SpriteAtlas(renderer.font, renderer.font_large, max_entries=3)
+    first = atlas.get('●', (255, 0, 0, 230), 20)
+    for size in (21, 22):
+        atlas.get('●', (255, 0, 0, 230), size)
+    assert atlas.get('●', (255, 0, 0, 230), 20) is first  # refreshed, so 21 is evicted next
+    atlas.get('●', (255, 0, 0, 230), 23)
+    assert len(atlas) == 3
+    assert atlas.get('●', (255, 0, 0, 230), 20) is first
+    
+    # The sprite is cropped to the marker, not the scratch canvas
+    img, _ = atlas.get('●', (255, 0, 0, 230), 100, "label")
+    assert img.width <= 2 * 100 + 2 and img.height <= 2 * 100 + 40
+    
+    with pytest.raises(ValidationError):
+        PathStyle(state_icon_size=100000)
+    with pytest.raises(ValidationError):
+        PathStyle(width=0)
+    
+    # Long labels widen the sprite without making it taller
+    from app.schemas.schemas import MAX_STATE_NAME_LENGTH, RobotState
+    short, _ = atlas.get('●', (255, 0, 0, 230), 20, "Idle")
+    wide, _ = atlas.get('●', (255, 0, 0, 230), 20, "W" * MAX_STATE_NAME_LENGTH)
+    assert wide.width > 10 * short.width and wide.height == short.height
+    with pytest.raises(ValidationError):
+        RobotState(state="W" * (MAX_STATE_NAME_LENGTH + 1))
+
+
+def test_renderer_registry_warmup(tmp_path):
+    """Test the registry shares one warm renderer per map"""
+    import os
+    import shutil
+    from app.services.renderer_registry import RendererRegistry
+    
+    registry = RendererRegistry(max_entries=2)
+    renderer = registry.get(None)
+    assert registry.get(None) is renderer
+    # A missing map falls back to the default, like rendering does
+    assert registry.get("other_map.png") is renderer
+    
+    default_map = os.path.join(os.path.dirname(__file__), "..", "..", "pushback_map.png")
+    for name in ("a.png", "b.png"):
+        shutil.copy(default_map, tmp_path / name)
+    other = registry.get(str(tmp_path / "a.png"))
+    assert other is not renderer and other.font is renderer.font
+    registry.get(str(tmp_path / "b.png"))
+    assert len(registry.stats()["maps"]) == 2
+    assert registry.get(None) is not renderer  # least recently used, evicted
+    
+    stats = registry.warmup(obstacle_sets=[[{'x': 100, 'y': 100, 'w': 40, 'h': 40}]])
+    assert stats["sprites"] >= 2 * len(PathRenderer.STATE_COLORS)
+    assert stats["occupancy_grids"] >= 1
+
+
+def test_heatline_uses_pixel_coordinates_and_lut():
+    """Test heatlines honor field coordinates and color runs from the LUT"""
+    import numpy as np
+    from app.services.path_arrays import PathArrays
+    
+    renderer = PathRenderer()
+    assert renderer.heat_lut.shape == (256, 3)
+    assert tuple(renderer.heat_lut[0]) == (0, 0, 255) and tuple(renderer.heat_lut[255]) == (255, 0, 0)
+    
+    # Field millimeters: 1800mm is the center of an 800px canvas
+    path = PathArrays(np.array([900.0, 1800.0, 2700.0]), np.array([1800.0, 1800.0, 1800.0]),
+                      speed=np.array([2.0, 10.0, 10.0]))
+    pixel_points = renderer.convert_coordinates(path, "field", (800, 800))
+    
+    runs = renderer.heatline_runs(path, pixel_points, PathStyle(width=4))
+    assert [(level, thickness) for _, level, thickness in runs] == [(51, 2), (255, 6)]
+    assert runs[0][0].tolist() == [[200, 400], [400, 400]]
+    
+    img, (x, y) = renderer.heatline_layer(path, pixel_points, PathStyle(width=4), (800, 800))
+    assert 190 <= x <= 200 and 390 <= y <= 400 and x + img.width <= 610
+    rgba = np.array(img)
+    assert tuple(rgba[400 - y, 300 - x]) == tuple(renderer.heat_lut[51]) + (255,)
+    assert tuple(rgba[400 - y, 500 - x]) == (255, 0, 0, 255)
+
+
+def test_tile_pyramid_levels_and_region(tmp_path):
+    """Test the map tile pyramid layout, edge tiles and region compositing"""
+    import io
+    from PIL import Image
+    from app.services.map_tiles import TilePyramid
+    
+    map_path = tmp_path / "map.png"
+    source = Image.new("RGB", (600, 300), "white")
+    source.paste((255, 0, 0), (256, 0, 600, 300))
+    source.save(map_path)
+    
+    pyramid = TilePyramid(str(map_path), lambda: Image.open(map_path), tile_size=256,
+                          cache_dir=str(tmp_path / "tiles"))
+    assert not pyramid.is_built()
+    meta = pyramid.build()
+    assert meta["max_zoom"] == 2
+    assert [(level["cols"], level["rows"]) for level in meta["levels"]] == [(1, 1), (2, 1), (3, 2)]
+    assert Image.open(io.BytesIO(pyramid.tile(2, 2, 1))).size == (88, 44)
+    with pytest.raises(KeyError):
+        pyramid.tile(2, 3, 0)
+    
+    # A fresh instance reuses the tiles already on disk
+    again = TilePyramid(str(map_path), lambda: None, tile_size=256, cache_dir=str(tmp_path / "tiles"))
+    assert again.is_built() and again.meta == meta
+    assert pyramid.zoom_for_scale(1.0) == 2 and pyramid.zoom_for_scale(0.3) == 1
+    
+    region = pyramid.region(2, (200, 100, 320, 160))
+    assert region.size == (120, 60)
+    assert region.getpixel((10, 10)) == (255, 255, 255) and region.getpixel((100, 10)) == (255, 0, 0)
+
+
+def test_viewport_render_matches_full_render_crop(tmp_path, monkeypatch):
+    """Test a viewport render equals the same region of a full render"""
+    import io
+    import numpy as np
+    from PIL import Image
+    from app.core.config import settings
+    from app.schemas.schemas import RobotState, Viewport
+    
+    monkeypatch.setattr(settings, "TILE_CACHE_DIR", str(tmp_path))
+    renderer = PathRenderer()
+    points = [PathPoint(x=50, y=50), PathPoint(x=250, y=150, robot_state=RobotState(state="intaking")),
+              PathPoint(x=700, y=700), PathPoint(x=750, y=100)]
+    style = PathStyle(width=4, arrow=True)
+    
+    full = renderer.render("polyline", points, style, return_bytes=True)
+    full_img = np.asarray(Image.open(io.BytesIO(full["image_bytes"])).convert("RGB"), dtype=int)
+    result = renderer.render("polyline", points, style, return_bytes=True, return_overlay=True,
+                             viewport=Viewport(x=150, y=100, width=200, height=120))
+    img = Image.open(io.BytesIO(result["image_bytes"])).convert("RGB")
+    assert img.size == (200, 120)
+    # cv2 clips strokes at the image border, so edge pixels may differ slightly
+    diff = np.abs(np.asarray(img, dtype=int) - full_img[100:220, 150:350])
+    assert diff[1:-1, 1:-1].max() <= 8 and np.percentile(diff, 99.9) <= 8
+    assert result["overlay_json"]["points"][1] == {"x": 100.0, "y": 50.0}
+    
+    # Field millimeters, magnified to a fixed output width
+    zoomed = renderer.render("heatline", points, style, coordinate_system="field", return_bytes=True,
+                             viewport=Viewport(x=0, y=0, width=1800, height=900, output_width=600))
+    assert Image.open(io.BytesIO(zoomed["image_bytes"])).size == (600, 300)
+    
+    with pytest.raises(ValueError):
+        renderer.render("polyline", points, style, output="vector",
+                        viewport=Viewport(x=0, y=0, width=10, height=10))
+
+
+def test_viewport_clips_to_visible_runs():
+    """Test clipping keeps only segments that reach the viewport"""
+    import numpy as np
+    from app.services.viewport import ViewportFrame
+    
+    frame = ViewportFrame.fit((100, 100, 200, 200), output_width=200)
+    assert frame.size == (200, 200) and frame.scale == (2.0, 2.0)
+    points = np.array([[0, 0], [50, 0], [150, 150], [400, 400], [500, 0], [150, 120], [0, 120]])
+    runs = frame.clip(points)
+    assert [len(run) for run in runs] == [3, 3]
+    assert runs[0][1].tolist() == [100.0, 100.0]
+    
+    # A derived edge never exceeds the output limit; the aspect is kept
+    tall = ViewportFrame.fit((0, 0, 1, 800), output_width=4096)
+    assert tall.size == (5, 4096)
+    assert ViewportFrame.fit((0, 0, 800, 1), output_height=4096).size == (4096, 5)
+
+
+def test_replay_frames_build_up_to_full_render():
+    """Test replay frames draw incrementally and end on the full render"""
+    import io
+    import json
+    import zipfile
+    import numpy as np
+    from PIL import Image
+    from app.schemas.schemas import RobotState
+    
+    renderer = PathRenderer()
+    points = [PathPoint(x=100 + 60 * i, y=400 + (40 if i % 2 else -40), t=i * 0.5, speed=2 + i,
+                        robot_state=RobotState(state="intaking") if i == 4 else None)
+              for i in range(10)]
+    style = PathStyle(width=4)
+    
+    for method in ("polyline", "heatline"):
+        archive = renderer.render_replay(method, points, style, fps=4, replay_format="zip")
+        with zipfile.ZipFile(io.BytesIO(archive)) as z:
+            meta = json.loads(z.read("replay.json"))
+            assert len(meta["frames"]) == 19 and meta["width"] == 800
+            img = None
+            for frame in meta["frames"]:
+                patch = Image.open(io.BytesIO(z.read(frame["file"]))).convert("RGB")
+                if img is None:
+                    img = patch
+                else:
+                    # Later frames only carry the box around the newly drawn piece
+                    assert patch.width < 200
+                    img.paste(patch, (frame["x"], frame["y"]))
+        
+        full = renderer.render(method, points, style, return_bytes=True)["image_bytes"]
+        diff = np.abs(np.asarray(img, dtype=int) - np.asarray(Image.open(io.BytesIO(full)).convert("RGB"), dtype=int))
+        # Only the head marker sitting on the last point differs
+        diff[420:460, 620:660] = 0
+        assert diff.max() == 0
+    
+    gif = Image.open(io.BytesIO(renderer.render_replay("spline", points, style, fps=4, speed=2.0)))
+    assert gif.format == "GIF" and gif.n_frames == 10
+    
+    with pytest.raises(ValueError):
+        renderer.render_replay("polyline", points, style, fps=50, speed=0.001)
+
+
+def test_webp_replay_without_native_encoder(monkeypatch):
+    """Test WebP replays fall back to Pillow's public save_all path"""
+    import io
+    from PIL import Image
+    from app.services.replay import WebPStream, encode_replay
+    
+    frames = []
+    for i in range(5):
+        frame = Image.new("RGB", (64, 64), "white")
+        frame.paste((255, 0, 0), (0, 0, 10 * (i + 1), 10))
+        frames.append((frame, None if i == 2 else (0, 0, 64, 10)))
+    native = encode_replay(frames, "webp", 5, (64, 64))
+    
+    monkeypatch.setattr(WebPStream, "_native_encoder", staticmethod(lambda size: None))
+    fallback = encode_replay(frames, "webp", 5, (64, 64))
+    # Unchanged frames are skipped either way
+    assert Image.open(io.BytesIO(fallback)).n_frames == 4
+    assert fallback == native
+
+
+def test_field_heatmap_accumulates_dwell_time():
+    """Test paths add the seconds spent in each field cell"""
+    import numpy as np
+    from app.services.field_heatmap import FieldHeatmap
+    
+    heatmap = FieldHeatmap(grid_size=36)  # 100 mm cells
+    # 10 s along y = 550 from x = 0 to x = 1000, then 5 s standing still
+    xy = np.array([[0, 550], [1000, 550], [1000, 550]], dtype=float)
+    heatmap.add_path(xy, np.array([0.0, 10.0, 15.0]))
+    
+    assert heatmap.grid.sum() == pytest.approx(15.0)
+    assert np.allclose(heatmap.grid[5, :10], 1.0)
+    assert heatmap.grid[5, 10] == pytest.approx(5.0)
+    assert heatmap.grid[:5].sum() == 0 and heatmap.grid[6:].sum() == 0
+    
+    # Untimed paths are spread over the default duration; a second path adds on top
+    heatmap.add_path(xy, np.full(3, np.nan))
+    assert heatmap.paths == 2
+    assert heatmap.grid.sum() == pytest.approx(30.0)
+    
+    # The version follows the grid contents, not just the rows seen
+    version = heatmap.version
+    heatmap.add_path(xy + [0, 200], np.array([0.0, 10.0, 15.0]))
+    assert heatmap.version != version
+    
+    # Stored points keep speed and robot state next to field-millimetre positions
+    import json
+    from app.services.field_heatmap import record_points_json
+    from app.services.path_arrays import PathArrays
+    from app.schemas.schemas import RobotState
+    points = [PathPoint(x=400, y=400, t=0, speed=1.5, robot_state=RobotState(state="Intaking", color="#00FF00")),
+              PathPoint(x=800, y=400, t=2)]
+    stored = json.loads(record_points_json(PathArrays.from_points(points), "pixel"))
+    assert stored[0] == {"x": 1800.0, "y": 1800.0, "t": 0.0, "speed": 1.5,
+                         "robot_state": {"state": "intaking", "color": "#00FF00"}}
+    assert stored[1] == {"x": 3600.0, "y": 1800.0, "t": 2.0}
+
+
+def test_route_index_ranks_by_shape():
+    """Test similarity search resamples by arc length and matches mirrored routes"""
+    import numpy as np
+    from types import SimpleNamespace
+    from app.services.route_similarity import RouteIndex, arc_length_signature, dtw_distances
+    
+    # Point density does not change the signature
+    sparse = arc_length_signature(np.array([[0, 0], [1000, 0]]), 5)
+    dense = arc_length_signature(np.column_stack((np.linspace(0, 1000, 37), np.zeros(37))), 5)
+    assert np.allclose(sparse, dense)
+    assert np.allclose(sparse[:, 0], [0, 250, 500, 750, 1000])
+    
+    # A constant offset costs its size per point
+    line = arc_length_signature(np.array([[0, 0], [1000, 0]]), 16)
+    assert dtw_distances(line, np.stack([line, line + [0, 30]])) == pytest.approx([0, 30])
+    
+    index = RouteIndex(samples=16, shortlist=2)
+    routes = {
+        1: [[500, 500], [1500, 500], [1500, 1500]],
+        2: [[520, 510], [1490, 520], [1510, 1480]],  # same routine, another team
+        3: [[3100, 500], [2100, 500], [2100, 1500]],  # mirrored to the other alliance
+        4: [[500, 3000], [3000, 3000]],
+    }
+    for record_id, xy in routes.items():
+        index._append(SimpleNamespace(id=record_id, team_id=record_id), arc_length_signature(np.array(xy), 16))
+    
+    found = index.search(index.signature(1), k=3, exclude_ids=(1,))
+    assert [r["record_id"] for r in found] == [3, 2, 4]
+    assert found[0]["mirrored"] and found[0]["distance"] == pytest.approx(0, abs=1e-3)
+    assert not found[1]["mirrored"] and found[1]["distance"] < 30
+    
+    found = index.search(index.signature(1), k=3, include_mirrored=False, exclude_ids=(1,))
+    assert [r["record_id"] for r in found][:1] == [2]
+
+
+def test_interference_between_crossing_robots():
+    """Test robots driving head-on conflict around where they meet"""
+    import io
+    import base64
+    import numpy as np
+    from PIL import Image
+    
+    renderer = PathRenderer()
+    head_on = [
+        {"name": "ours", "method": "polyline",
+         "points": [PathPoint(x=100, y=400, t=0), PathPoint(x=700, y=400, t=6)]},
+        {"name": "partner", "method": "polyline",
+         "points": [PathPoint(x=700, y=400, t=0), PathPoint(x=100, y=400, t=6)]},
+        {"name": "opponent", "method": "polyline",
+         "points": [PathPoint(x=100, y=700, t=1), PathPoint(x=700, y=700, t=4)]},
+    ]
+    result = renderer.analyze_interference(head_on, robot_radius=50, time_step=0.1, return_image=True)
+    pairs = {(p["a"], p["b"]): p for p in result["pairs"]}
+    
+    # Centers close at 200 px/s, so they are within 100 px from t=2.5 to t=3.5
+    crossing = pairs[("ours", "partner")]
+    assert crossing["first_conflict_time"] == pytest.approx(2.6)
+    assert crossing["min_separation"] == pytest.approx(0, abs=1e-6)
+    assert crossing["min_separation_time"] == pytest.approx(3.0)
+    assert crossing["conflicts"][0]["end"] == pytest.approx(3.4)
+    # Nine conflicting samples, 0.1 s each
+    assert crossing["conflict_seconds"] == pytest.approx(0.9)
+    assert {"x": 400, "y": 400, "w": 20, "h": 20} in crossing["contested_cells"]
+    
+    # The opponent stays 300 px away, waiting at its ends outside t=1..4
+    clear = pairs[("ours", "opponent")]
+    assert clear["first_conflict_time"] is None and clear["contested_cells"] == []
+    assert clear["min_separation"] == pytest.approx(300)
+    
+    img = np.asarray(Image.open(io.BytesIO(result["image_bytes"])).convert("RGB"))
+    assert img.shape == (800, 800, 3)
+    
+    untimed = [dict(item, points=[PathPoint(x=p.x, y=p.y) for p in item["points"]]) for item in head_on]
+    with pytest.raises(ValueError):
+        renderer.analyze_interference(untimed)
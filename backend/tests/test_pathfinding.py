@@ -0,0 +1,106 @@
+import math
+import numpy as np
+import pytest
+
+from app.services.pathfinding import GridSearch, find_path, path_cost
+from app.services.occupancy import OccupancyGridCache, route_leg_cache
+
+
+@pytest.mark.parametrize("jump_points", [False, True])
+def test_find_path_around_wall(jump_points):
+    """Test shortest path detours around a wall with octile cost"""
+    grid = np.zeros((10, 10), dtype=int)
+    grid[1:10, 5] = 1  # Wall with a gap in row 0
+    
+    path = find_path(grid, (9, 0), (9, 9), jump_points=jump_points)
+    
+    assert path[0] == (9, 0) and path[-1] == (9, 9)
+    assert (0, 5) in path
+    # Up to (0, 4), straight through the gap (no corner cut), back down
+    assert math.isclose(path_cost(path), 13 + 7 * math.sqrt(2))
+
+
+def test_find_path_does_not_cut_corners():
+    """Test diagonal moves are not allowed between two blocked orthogonals"""
+    grid = np.array([
+        [0, 1],
+        [1, 0],
+    ])
+    assert find_path(grid, (0, 0), (1, 1)) is None
+    assert find_path(grid, (0, 0), (1, 1), jump_points=True) is None
+
+
+def test_jump_point_search_matches_astar_cost():
+    """Test JPS finds paths as short as plain A* on random grids"""
+    rng = np.random.default_rng(7)
+    for _ in range(50):
+        grid = (rng.random((25, 25)) < 0.25).astype(int)
+        free = np.argwhere(grid == 0)
+        start, goal = free[rng.integers(len(free), size=2)]
+        search = GridSearch(grid)
+        astar = search.find_path(tuple(start), tuple(goal))
+        jps = search.find_path(tuple(start), tuple(goal), jump_points=True)
+        assert (astar is None) == (jps is None)
+        if astar:
+            assert math.isclose(path_cost(astar), path_cost(jps))
+            assert all(grid[cell] == 0 for cell in jps)
+
+
+def test_find_path_blocked_endpoints():
+    """Test blocked or out-of-grid endpoints return None"""
+    grid = np.zeros((5, 5), dtype=int)
+    grid[2, 2] = 1
+    assert find_path(grid, (2, 2), (0, 0)) is None
+    assert find_path(grid, (0, 0), (7, 7)) is None
+    assert find_path(grid, (1, 1), (1, 1)) == [(1, 1)]
+
+
+def test_occupancy_cache_and_inflation():
+    """Test occupancy grids are shared per obstacle set and inflate by robot radius"""
+    cache = OccupancyGridCache(max_entries=2)
+    obstacles = [{'x': 200, 'y': 0, 'w': 20, 'h': 300}]
+    
+    grid = cache.get(obstacles, (400, 400), 20)
+    assert cache.get(list(obstacles), (400, 400), 20) is grid
+    assert cache.get(obstacles, (400, 400), 10) is not grid
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 2}
+    
+    assert grid.grid.sum() == 15  # One column, rows 0-14
+    assert grid.inflated(0) is grid
+    inflated = grid.inflated(25)
+    assert grid.inflated(25) is inflated
+    # Radii are rounded up to whole cells, so nearby radii share one grid
+    assert grid.inflated(40) is inflated and grid.inflated(40.5) is not inflated
+    assert grid.inflated(1e12) is grid.inflated(1e15)
+    # 25px rounds up to two cells: the wall's sides and diagonals are blocked, 40px away is not
+    assert inflated.grid[:15, 9:12].all() and inflated.grid[15, 10]
+    assert not inflated.grid[:15, 8].any() and not inflated.grid[17, 10]
+    
+    route = inflated.find_path((20, 20), (380, 20))
+    assert route is not None and route[:, 1].max() >= 320
+    assert not any(inflated.grid[int(y) // 20, int(x) // 20] for x, y in route)
+
+
+def test_route_through_waypoints_memoizes_legs():
+    """Test multi-waypoint routes visit every waypoint and only recompute edited legs"""
+    grid = OccupancyGridCache().get([{'x': 200, 'y': 0, 'w': 20, 'h': 300}], (400, 400), 20)
+    route_leg_cache.clear()
+    waypoints = np.array([[20, 20], [100, 300], [380, 20], [380, 380]], dtype=float)
+    
+    misses = route_leg_cache.misses
+    route = grid.route(waypoints)
+    cells = [(int(y) // 20, int(x) // 20) for x, y in route]
+    for waypoint in waypoints:
+        assert grid.to_cell(waypoint) in cells
+    assert not any(grid.grid[cell] for cell in cells)
+    assert route_leg_cache.misses == misses + 3
+    misses = route_leg_cache.misses
+    
+    # Moving the last waypoint only recomputes the leg ending there
+    waypoints[3] = [300, 380]
+    grid.route(waypoints)
+    assert route_leg_cache.misses == misses + 1
+    # Moving an inner waypoint recomputes the two legs around it
+    waypoints[1] = [120, 320]
+    grid.route(waypoints)
+    assert route_leg_cache.misses == misses + 3